@@ -0,0 +1,133 @@
+"""连续对话窗口渲染基准：流式输出与长聊天记录
+
+在 offscreen 平台上创建 ChatWindow：
+1. 流式输出：按 --rate 个/秒的速度模拟输出 --tokens 个令牌，令牌交给 RenderScheduler，每帧（--fps）最多追加一次。
+   输出进程 CPU 时间、实际耗时、写入帧数和实际达到的令牌速率。
+2. 长聊天记录：分别添加 --history 条消息，测量添加耗时、改变窗口宽度后第一次事件处理的耗时
+   （其余行由视图分批布局）以及布局完成后每次滚动并重绘的耗时，这两项不应随消息数增长。
+
+用法: QT_QPA_PLATFORM=offscreen python -m benchmarks.bench_chat_render [--tokens 10000] [--rate 1000] [--fps 30]
+      [--history 1000 10000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import QApplication
+
+from ui.chat_window import ChatWindow
+
+WORDS = ("事件循环", "协程", "调度", "任务", "the", "event", "loop", "await", "阻塞", "线程池", "，", "。")
+
+
+def make_tokens(count, seed=0):
+    rnd = random.Random(seed)
+    tokens = []
+    line = 0
+    for _ in range(count):
+        token = rnd.choice(WORDS)
+        line += len(token)
+        if line > 60:
+            token += "\n"
+            line = 0
+        tokens.append(token)
+    return tokens
+
+
+def run_stream(app, tokens, rate, fps):
+    window = ChatWindow(None, render_fps=fps)
+    window.show()
+    row = window.append_message("assistant", "")
+    state = {"sent": 0}
+    start = time.monotonic()
+    cpu_start = time.process_time()
+
+    def tick():
+        due = min(len(tokens), int((time.monotonic() - start) * rate) + 1)
+        while state["sent"] < due:
+            token = tokens[state["sent"]]
+            state["sent"] += 1
+            window.render_scheduler.append(row, token)
+        if state["sent"] >= len(tokens):
+            timer.stop()
+            window.render_scheduler.flush()
+            app.quit()
+
+    timer = QTimer()
+    timer.timeout.connect(tick)
+    timer.start(1)
+    app.exec()
+
+    cpu = time.process_time() - cpu_start
+    wall = time.monotonic() - start
+    assert window.messages[row]["content"] == "".join(tokens)
+    window.close()
+    return cpu, wall, window.render_scheduler.frames
+
+
+def process_events_for(app, seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        app.processEvents()
+
+
+def run_history(app, count, settle, seed=0):
+    rnd = random.Random(seed)
+    window = ChatWindow(None)
+    window.show()
+    start = time.perf_counter()
+    for i in range(count):
+        role = "user" if i % 2 == 0 else "assistant"
+        window.append_message(role, "".join(rnd.choice(WORDS) for _ in range(rnd.randint(5, 200))))
+    build = time.perf_counter() - start
+    process_events_for(app, settle)
+
+    resize = []
+    for width in (700, 600, 800, 650):
+        start = time.perf_counter()
+        window.resize(width, 550)
+        app.processEvents()
+        resize.append(time.perf_counter() - start)
+        process_events_for(app, settle)
+
+    scrollbar = window.chat_history.verticalScrollBar()
+    start = time.perf_counter()
+    steps = 50
+    for i in range(steps):
+        scrollbar.setValue(scrollbar.maximum() * i // steps)
+        window.chat_history.viewport().repaint()
+    scroll = (time.perf_counter() - start) / steps
+    window.close()
+    return build, statistics.mean(resize), scroll
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=10000)
+    parser.add_argument("--rate", type=float, default=1000, help="模拟的令牌到达速率（个/秒）")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--history", type=int, nargs="*", default=[1000, 10000], help="长聊天记录的消息条数")
+    parser.add_argument("--settle", type=float, default=5.0, help="等待分批布局完成的秒数")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    tokens = make_tokens(args.tokens)
+    print(f"{args.tokens} 个令牌, {len(''.join(tokens))} 字符, 到达速率 {args.rate:.0f} 个/秒", flush=True)
+    cpu, wall, frames = run_stream(app, tokens, args.rate, args.fps)
+    print(f"流式输出 CPU={cpu:8.2f} s  耗时={wall:8.2f} s  写入={frames:6d} 帧  "
+          f"速率={args.tokens / wall:8.0f} 个/秒", flush=True)
+
+    for count in args.history:
+        build, resize, scroll = run_history(app, count, args.settle)
+        print(f"{count:6d} 条消息 添加={build:7.2f} s  改变宽度={resize * 1000:7.1f} ms  "
+              f"滚动={scroll * 1000:6.2f} ms", flush=True)
+
+
+if __name__ == "__main__":
+    main()
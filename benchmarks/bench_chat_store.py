@@ -0,0 +1,58 @@
+"""聊天记录存储基准：打开耗时与历史条数无关
+
+对每个 --sizes 中的消息条数，在临时目录中写入一个对话的全部消息，然后测量：
+  - 写入：界面线程调用 add_message 的总耗时（只是入队）和后台线程全部提交完成的耗时
+  - 打开：新建 ChatStore、找到最近的对话并读取最后一页的耗时
+  - 翻页：从最新往前连续读取 --pages 页，每页的平均耗时
+
+用法: python -m benchmarks.bench_chat_store [--sizes 1000 100000 1000000] [--page-size 50] [--pages 20]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from services.chat_store import ChatStore
+
+
+def run(directory, count, page_size, pages):
+    path = os.path.join(directory, f"chat_{count}.db")
+    store = ChatStore(path)
+    start = time.perf_counter()
+    for i in range(count):
+        store.add_message("bench", "user" if i % 2 == 0 else "assistant", f"第 {i} 条消息 " + "内容" * (i % 40))
+    enqueue = time.perf_counter() - start
+    store.flush(timeout=600)
+    written = time.perf_counter() - start
+    store.close()
+
+    start = time.perf_counter()
+    store = ChatStore(path)
+    conversation_id = store.latest_conversation()
+    rows = store.load_page(conversation_id, limit=page_size)
+    opened = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(pages):
+        rows = store.load_page(conversation_id, rows[0][0], page_size)
+    paging = (time.perf_counter() - start) / pages
+    store.close()
+    return enqueue, written, opened, paging
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 100000, 1000000])
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for count in args.sizes:
+            enqueue, written, opened, paging = run(directory, count, args.page_size, args.pages)
+            print(f"{count:8d} 条消息 入队={enqueue * 1000:8.1f} ms  写入完成={written:6.2f} s  "
+                  f"打开={opened * 1000:6.2f} ms  翻页={paging * 1000:6.3f} ms/页", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""AIImageClient 单次请求延迟基准：每次新建会话（旧实现）与复用会话对比
+
+在本地启动一个模拟 /chat/completions 的 aiohttp 服务，分别测量：
+  - 每次请求都新建 AIImageClient（等价于旧实现中每次调用创建 ClientSession）
+  - 复用同一个 AIImageClient 的持久会话
+
+用法: python -m benchmarks.bench_image_client [--requests 200] [--stream]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from aiohttp import web
+
+from services.ai_image_client import AIImageClient
+
+IMAGE_DATA = b"\x89PNG\r\n\x1a\n" + b"\x00" * 2048
+
+
+async def handle_completions(request):
+    body = await request.json()
+    if body.get("stream"):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for word in ("这是", "一张", "测试", "图片"):
+            chunk = {"choices": [{"delta": {"content": word}}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+    return web.json_response({"choices": [{"message": {"content": "这是一张测试图片"}}]})
+
+
+async def start_server():
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", handle_completions)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/v1"
+
+
+async def one_request(client, stream):
+    start = time.perf_counter()
+    if stream:
+        async for _ in client.get_response_stream("描述图片", IMAGE_DATA):
+            pass
+    else:
+        await client.get_response("描述图片", IMAGE_DATA)
+    return time.perf_counter() - start
+
+
+async def bench_fresh_session(base_url, requests, stream):
+    timings = []
+    for _ in range(requests):
+        client = AIImageClient("test-key", base_url=base_url)
+        timings.append(await one_request(client, stream))
+        await client.close()
+    return timings
+
+
+async def bench_persistent_session(base_url, requests, stream):
+    client = AIImageClient("test-key", base_url=base_url)
+    try:
+        return [await one_request(client, stream) for _ in range(requests)]
+    finally:
+        await client.close()
+
+
+def report(name, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{name:<12} mean={statistics.mean(timings) * 1000:7.3f}ms "
+          f"p50={statistics.median(timings) * 1000:7.3f}ms p95={p95 * 1000:7.3f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--stream", action="store_true", help="测试流式接口")
+    args = parser.parse_args()
+
+    runner, base_url = await start_server()
+    try:
+        # 预热一次，避免首次导入和JIT开销计入结果
+        await bench_persistent_session(base_url, 5, args.stream)
+        report("新建会话", await bench_fresh_session(base_url, args.requests, args.stream))
+        report("复用会话", await bench_persistent_session(base_url, args.requests, args.stream))
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+"""流式响应吞吐量基准：关闭日志、队列日志与同步 print 对比
+
+在本地启动一个模拟 /chat/completions 的 aiohttp 服务，一次返回大量小块，
+消费端对每个响应块记录一条日志（模拟界面逐块输出调试信息），分别测量：
+  - 关闭日志：日志级别高于 DEBUG，logger.debug 直接返回，不做格式化
+  - 队列日志：setup_logging(DEBUG)，调用方只入队，由后台线程写入轮转文件
+  - 同步print：旧实现的方式，每块都同步写到标准输出
+
+用法: python -m benchmarks.bench_logging [--chunks 5000] [--rounds 5] [--with-print]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import tempfile
+import time
+
+from aiohttp import web
+
+from services.ai_client import AIClient
+from utils.logging_setup import setup_logging, stop_logging
+
+logger = logging.getLogger("benchmarks.bench_logging")
+
+
+def make_handler(chunks):
+    async def handle_completions(request):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        payload = b""
+        for i in range(chunks):
+            chunk = {"id": "bench", "object": "chat.completion.chunk", "created": 0, "model": "bench",
+                     "choices": [{"index": 0, "delta": {"content": f"块{i} "}, "finish_reason": None}]}
+            payload += f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+        await response.write(payload)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+    return handle_completions
+
+
+async def start_server(chunks):
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", make_handler(chunks))
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/v1"
+
+
+async def one_stream(client, mode):
+    start = time.perf_counter()
+    count = 0
+    async for text in client.get_response_stream("测试", stream=True):
+        count += 1
+        if mode == "print":
+            print(f"收到响应块: {text}")
+        else:
+            logger.debug("收到响应块: %s", text)
+    return count, time.perf_counter() - start
+
+
+async def bench(client, mode, rounds):
+    rates = []
+    for _ in range(rounds):
+        count, elapsed = await one_stream(client, mode)
+        rates.append(count / elapsed)
+    return rates
+
+
+def report(name, rates):
+    print(f"{name:<10} mean={statistics.mean(rates):10.0f} 块/秒 "
+          f"min={min(rates):10.0f} max={max(rates):10.0f}", flush=True)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--with-print", action="store_true", help="同时测试同步 print（会刷屏）")
+    args = parser.parse_args()
+
+    runner, base_url = await start_server(args.chunks)
+    client = AIClient("test-key", base_url=base_url, coalesce_requests=False)
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as log_dir:
+            # 预热一次，避免首次建立连接计入结果
+            setup_logging(level="WARNING", log_dir=log_dir)
+            await bench(client, "off", 1)
+            results["关闭日志"] = await bench(client, "off", args.rounds)
+
+            setup_logging(level="DEBUG", log_dir=log_dir)
+            results["队列日志"] = await bench(client, "queue", args.rounds)
+            stop_logging()
+
+            if args.with_print:
+                results["同步print"] = await bench(client, "print", args.rounds)
+    finally:
+        stop_logging()
+        await runner.cleanup()
+
+    for name, rates in results.items():
+        report(name, rates)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""Markdown 过滤基准：原正则实现与 MarkdownStripper 对比
+
+1. 正确性：tests/markdown_corpus 下每篇样本 NAME.md 的期望输出保存在 NAME.expected.txt
+   （由原正则实现生成），remove_markdown 一次处理和 MarkdownStripper 按随机大小分块处理都必须与之完全相同。
+2. 整段处理：样本重复到 1KB、100KB、5MB，比较原正则实现与 remove_markdown 的耗时。
+3. 对抗输入：大量空行、未闭合的 [、长空白等，原正则实现会出现平方级回溯，新实现应保持线性。
+4. 流式处理：按 --chunk 字符一块模拟流式输出，比较逐块调用原实现与 MarkdownStripper 的每块耗时。
+
+用法: python -m benchmarks.bench_markdown [--rounds 5] [--splits 50] [--chunk 4] [--adversarial 20000]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from tests.markdown_oracle import adversarial_inputs, legacy_remove_markdown, load_corpus, random_chunks
+from utils.markdown_stripper import MarkdownStripper
+from utils.utils import remove_markdown
+
+SIZES = (("1KB", 1_000), ("100KB", 100_000), ("5MB", 5_000_000))
+
+
+def run_stripper(chunks):
+    stripper = MarkdownStripper()
+    parts = [stripper.feed(chunk) for chunk in chunks]
+    parts.append(stripper.flush())
+    return "".join(parts)
+
+
+def check(corpus, splits):
+    rnd = random.Random(0)
+    failures = 0
+    for name, (text, expected) in corpus.items():
+        if remove_markdown(text) != expected:
+            failures += 1
+            print(f"不一致（整段）: {name}", flush=True)
+            continue
+        for _ in range(splits):
+            if run_stripper(random_chunks(text, rnd)) != expected:
+                failures += 1
+                print(f"不一致（流式）: {name}", flush=True)
+                break
+    print(f"样本 {len(corpus)} 篇, 每篇 {splits} 种切分: 不一致 {failures} 篇", flush=True)
+    return failures == 0
+
+
+def measure(func, arg, rounds):
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(arg)
+        times.append(time.perf_counter() - start)
+    return statistics.mean(times)
+
+
+def report(name, legacy, current, unit="ms", scale=1000):
+    print(f"{name:<14} 原实现={legacy * scale:10.2f} {unit}  新实现={current * scale:10.2f} {unit}  "
+          f"x{legacy / current:6.1f}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--splits", type=int, default=50, help="正确性检查时每篇样本的随机切分次数")
+    parser.add_argument("--chunk", type=int, default=4, help="流式处理时每个响应块的字符数")
+    parser.add_argument("--adversarial", type=int, default=20000, help="对抗输入的长度，原实现耗时随其平方增长")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    if not check(corpus, args.splits):
+        raise SystemExit(1)
+
+    sample = "\n\n".join(text for text, _ in corpus.values())
+    print("整段处理:", flush=True)
+    for name, size in SIZES:
+        text = (sample * (size // len(sample) + 1))[:size]
+        rounds = args.rounds if size < 1_000_000 else max(1, args.rounds // 2)
+        report(name, measure(legacy_remove_markdown, text, rounds), measure(remove_markdown, text, rounds))
+
+    print(f"对抗输入（{args.adversarial} 字符）:", flush=True)
+    for name, text in adversarial_inputs(args.adversarial).items():
+        assert remove_markdown(text) == legacy_remove_markdown(text)
+        report(name, measure(legacy_remove_markdown, text, 1), measure(remove_markdown, text, args.rounds))
+
+    text = (sample * (100_000 // len(sample) + 1))[:100_000]
+    chunks = [text[i:i + args.chunk] for i in range(0, len(text), args.chunk)]
+    print(f"流式处理（{len(chunks)} 块）:", flush=True)
+    report("每块", measure(lambda c: [legacy_remove_markdown(chunk) for chunk in c], chunks, args.rounds) / len(chunks),
+           measure(run_stripper, chunks, args.rounds) / len(chunks), unit="µs", scale=1e6)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,77 @@
+import logging
+import json
+import os
 from services.ai_client import AIClient
 from services.ai_image_client import AIImageClient
+from services.context_window import ContextWindow
+from services.hedged_client import HedgedClient
+from services.provider_router import ProviderRouter
+from services.http_pool import get_http_pool
+from services.rate_limiter import get_rate_limiter
+from services.response_cache import get_response_cache
+from services.retry import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+def configure_http_pool(cfg: dict):
+    """根据配置调整共享连接池参数"""
+    get_http_pool().configure(
+        max_connections=int(cfg.get("http_max_connections", 20)),
+        max_keepalive_connections=int(cfg.get("http_max_keepalive_connections", 10)),
+        keepalive_expiry=float(cfg.get("http_keepalive_expiry", 120.0)),
+        http2=bool(cfg.get("http2_enabled", True)),
+    )
+
+def configure_response_cache(cfg: dict):
+    """根据配置调整响应缓存，未启用时返回 None"""
+    cache = get_response_cache()
+    cache.configure(
+        enabled=bool(cfg.get("response_cache_enabled", False)),
+        max_entries=int(cfg.get("response_cache_max_entries", 256)),
+        ttl=float(cfg.get("response_cache_ttl", 3600)),
+        db_path=cfg.get("response_cache_path", "tmp/response_cache.db") if cfg.get("response_cache_persist", False) else None,
+        cache_nonzero_temperature=bool(cfg.get("response_cache_nonzero_temperature", False)),
+    )
+    return cache if cache.enabled else None
+
+def configure_rate_limiter(cfg: dict, base_url: str):
+    """按服务地址获取限流器：rate_limits.default 为默认值，可按 base_url 单独覆盖"""
+    limits = cfg.get("rate_limits", {})
+    merged = dict(limits.get("default", {}))
+    merged.update(limits.get(base_url or "", {}))
+    return get_rate_limiter(
+        base_url or "default",
+        max_concurrent=int(merged.get("max_concurrent", 0)),
+        requests_per_minute=int(merged.get("requests_per_minute", 0)),
+        tokens_per_minute=int(merged.get("tokens_per_minute", 0)),
+    )
+
+def configure_retry_policy(cfg: dict) -> RetryPolicy:
+    """根据配置创建重试策略"""
+    return RetryPolicy(
+        max_retries=int(cfg.get("retry_max_retries", 2)),
+        base_delay=float(cfg.get("retry_base_delay", 0.5)),
+        max_delay=float(cfg.get("retry_max_delay", 8.0)),
+        max_retry_after=float(cfg.get("retry_max_retry_after", 30.0)),
+    )
+
+def configure_context_window(cfg: dict, context_window: ContextWindow = None) -> ContextWindow:
+    """根据配置创建或更新连续对话的上下文预算
+
+    context_budgets.default 为默认预算（令牌数），可按模型名单独覆盖。
+    """
+    context_window = context_window or ContextWindow()
+    context_window.configure(
+        budgets={key: int(value) for key, value in cfg.get("context_budgets", {}).items()},
+        summary_enabled=bool(cfg.get("context_summary_enabled", False)),
+        summary_max_tokens=int(cfg.get("context_summary_max_tokens", 300)),
+    )
+    return context_window
 
 class AIService(AIClient):
     @classmethod
     def from_config(cls, cfg: dict) -> "AIService":
+        configure_http_pool(cfg)
         return cls(
             api_key=cfg.get("api_key", ""),
             base_url=cfg.get("base_url"),
@@ -11,6 +79,10 @@ class AIService(AIClient):
             api_type=cfg.get("api_type", "OpenAI"),
             proxy=cfg.get("proxy", "127.0.0.1:1090"),
             proxy_enabled=cfg.get("proxy_enabled", False),
+            response_cache=configure_response_cache(cfg),
+            coalesce_requests=bool(cfg.get("request_coalescing_enabled", True)),
+            rate_limiter=configure_rate_limiter(cfg, cfg.get("base_url")),
+            retry_policy=configure_retry_policy(cfg),
         )
 
 class AIImageService(AIImageClient):
@@ -22,4 +94,69 @@ class AIImageService(AIImageClient):
             model=cfg.get("image_model", "yi-vision"),
             proxy=cfg.get("image_proxy", "127.0.0.1:1090"),
             proxy_enabled=cfg.get("image_proxy_enabled", False),
+            connection_limit=int(cfg.get("image_connection_limit", 10)),
+            dns_cache_ttl=int(cfg.get("image_dns_cache_ttl", 300)),
+            keepalive_timeout=float(cfg.get("image_keepalive_timeout", 60)),
+            rate_limiter=configure_rate_limiter(cfg, cfg.get("image_base_url")),
         )
+
+def load_presets(path: str = 'config/presets.json') -> dict:
+    """读取预设列表，文件不存在或格式错误时返回空字典"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error("读取预设失败: %s", e)
+        return {}
+
+def create_ai_client(cfg: dict):
+    """创建文本客户端；启用 router_enabled 时返回覆盖多个预设的 ProviderRouter
+
+    当前配置始终排在第一位，router_presets 中列出的预设按顺序排在后面，
+    预设只覆盖服务相关的字段，缓存、限流和重试等设置沿用当前配置。
+    """
+    primary = AIService.from_config(cfg)
+    if not cfg.get("router_enabled", False):
+        return primary
+
+    presets = load_presets()
+    providers = [("当前配置", primary)]
+    for name in cfg.get("router_presets", []):
+        preset = presets.get(name)
+        if preset is None:
+            logger.warning("预设不存在，已跳过: %s", name)
+            continue
+        merged = dict(cfg)
+        merged.update(preset)
+        providers.append((name, AIService.from_config(merged)))
+    if len(providers) == 1:
+        return primary
+    return ProviderRouter(
+        providers,
+        strategy=cfg.get("router_strategy", "failover"),
+        ttft_timeout=float(cfg.get("router_ttft_timeout", 8.0)),
+        cooldown=float(cfg.get("router_cooldown", 30.0)),
+    )
+
+def create_hedged_client(cfg: dict, client):
+    """启用 hedge_enabled 时为首字延迟敏感的场景包装对冲请求，否则原样返回
+
+    hedge_preset 指定第二路请求使用的预设，不指定时向同一服务再发一次。
+    """
+    if not cfg.get("hedge_enabled", False):
+        return client
+    alternate = None
+    preset = load_presets().get(cfg.get("hedge_preset", ""))
+    if preset is not None:
+        merged = dict(cfg)
+        merged.update(preset)
+        alternate = AIService.from_config(merged)
+    return HedgedClient(
+        client,
+        alternate=alternate,
+        percentile=float(cfg.get("hedge_percentile", 90)),
+        min_delay=float(cfg.get("hedge_min_delay", 0.3)),
+        max_delay=float(cfg.get("hedge_max_delay", 3.0)),
+    )
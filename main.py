@@ -1,10 +1,10 @@
+import logging
 import sys
 import time
 import os
 import asyncio
 import ctypes
 import json
-import traceback
 
 # PySide6 imports
 from PySide6.QtWidgets import (
@@ -18,38 +18,42 @@ from PySide6.QtGui import QCursor, QIcon, QDoubleValidator, QIntValidator
 import keyboard
 import pyautogui
 import pyperclip
-import psutil
 import qasync
 
 # Windows API imports
-from win32con import WM_CHAR, WM_COPY
-import win32clipboard
-from win32api import PostMessage
 from win32gui import GetForegroundWindow, SetForegroundWindow, GetClassName
-from win32com import client as win32com_client
 import win32con
 import win32gui
-import win32api
-from win32process import GetWindowThreadProcessId, AttachThreadInput
-import win32process
 
 # Local imports
-from services.ai_client import AIClient
+from core.ai_service import AIImageService, configure_context_window, create_ai_client, create_hedged_client
+from services.http_pool import get_http_pool
+from services.response_cache import get_response_cache
+from system.selection_capture import SelectionCapture
+from system.text_injection import InsertionWorker, Win32TextInjection
 from ui.tray_icon import SystemTrayIcon
 from ui.settings_window import SettingsWindow
 from ui.prompts_window import PromptsWindow
 from ui.selection_search import SelectionSearchDialog
 from utils.hotkey_manager import GlobalHotkey
+from utils.keyword_usage import get_keyword_usage
+from utils.logging_setup import setup_logging, stop_logging
+from utils.loop_monitor import get_loop_monitor
+from utils.metrics_exporter import get_metrics_exporter
+from utils.tracing import get_tracer, traced
 from ui.floating_button import FloatingStopButton
+from utils.markdown_stripper import MarkdownStripper
 from utils.utils import remove_markdown
 from ui.styles import MAIN_STYLE, CHECKBOX_STYLE
 from utils.screenshot import ScreenshotOverlay
-from services.ai_image_client import AIImageClient
 from ui.image_analysis_dialog import ImageAnalysisDialog
 from ui.selection_keywords_window import SelectionKeywordsWindow
+from ui.trace_viewer_window import TraceViewerWindow
 from ui.command_window import CommandWindow
 from ui.prompt_input_window import PromptInputWindow
 
+logger = logging.getLogger(__name__)
+
 # 在程序开始时设置 DPI 感知
 ctypes.windll.user32.SetProcessDPIAware()
 
@@ -72,6 +76,7 @@ class InputWindow(QMainWindow):
         self.init_prompt_input_window()
         self.is_window_visible = False
         self.drag_position = None
+        self._closing_network = None
         app = QApplication.instance()
         app.aboutToQuit.connect(self.cleanup)
 
@@ -128,6 +133,7 @@ class InputWindow(QMainWindow):
         # 悬浮停止按钮
         self.floating_stop_button = FloatingStopButton()
         self.floating_stop_button.stop_button.clicked.connect(self.stop_response)
+        self.text_injection = Win32TextInjection()
         # 设置窗口大小
         self.resize(300, 200)
         # 更新样式表
@@ -161,21 +167,39 @@ class InputWindow(QMainWindow):
         # 提示词功能已移到独立的提示词输入窗口
 
     def init_ai_clients(self):
-        self.ai_client = AIClient(
-            api_key=self.config.get('api_key', ''),
-            base_url=self.config.get('base_url', None),
-            model=self.config.get('model', 'gpt-4o'),
-            api_type=self.config.get('api_type', 'OpenAI'),
-            proxy=self.config.get('proxy', '127.0.0.1:1090'),
-            proxy_enabled=self.config.get('proxy_enabled', False)
+        get_tracer().configure(
+            enabled=self.config.get("tracing_enabled", True),
+            capacity=int(self.config.get("tracing_capacity", 500)),
+            jsonl_path=self.config.get("tracing_jsonl_path") or None,
         )
-        self.ai_image_client = AIImageClient(
-            api_key=self.config.get('image_api_key', ''),
-            base_url=self.config.get('image_base_url', None),
-            model=self.config.get('image_model', 'yi-vision'),
-            proxy=self.config.get('image_proxy', '127.0.0.1:1090'),
-            proxy_enabled=self.config.get('image_proxy_enabled', False)
+        # 指标导出默认关闭：metrics_port 只监听 127.0.0.1，textfile 供 node_exporter 采集
+        get_metrics_exporter().configure(
+            port=int(self.config.get("metrics_port", 0)),
+            textfile_path=self.config.get("metrics_textfile_path") or None,
+            interval=float(self.config.get("metrics_textfile_interval", 15)),
         )
+        # 换行默认作为字符输入；按回车键在聊天软件里会把回答提前发送出去，需要时在配置中开启
+        self.text_injection.newline = self.config.get("text_injection_newline", "unicode")
+        # 文本客户端共享进程级连接池，重新保存设置不会丢弃已建立的连接
+        self.ai_client = create_ai_client(self.config)
+        # 划词弹窗最在意首字速度，按配置使用对冲请求
+        self.selection_ai_client = create_hedged_client(self.config, self.ai_client)
+        # 图像客户端持有自己的会话，旧客户端上的分析结束后再关闭它的会话
+        old_image_client = getattr(self, 'ai_image_client', None)
+        self.ai_image_client = AIImageService.from_config(self.config)
+        if old_image_client is not None:
+            old_image_client.retire()
+
+    async def close_network_clients(self):
+        """关闭共享连接池和图像客户端会话"""
+        await self.ai_image_client.close()
+        await get_http_pool().close()
+
+    def start_closing_network_clients(self) -> asyncio.Future:
+        """退出时开始关闭网络连接，返回的任务需要在事件循环结束前等待完成"""
+        if self._closing_network is None:
+            self._closing_network = asyncio.ensure_future(self.close_network_clients())
+        return self._closing_network
 
     def init_tray_icon(self):
         self.tray_icon = SystemTrayIcon(self)
@@ -184,10 +208,13 @@ class InputWindow(QMainWindow):
         self.tray_icon.quit_signal.connect(lambda: QApplication.instance().quit())
         self.tray_icon.reset_hotkeys_signal.connect(self.reset_hotkeys)
         self.tray_icon.show_selection_keywords_signal.connect(lambda: self.selection_keywords_window.show())
+        self.tray_icon.show_trace_viewer_signal.connect(self.show_trace_viewer)
 
     def init_selection_dialog(self):
+        self.selection_capture = SelectionCapture()
         self.selection_dialog = SelectionSearchDialog()
-        self.selection_dialog.set_ai_client(self.ai_client)
+        self.selection_dialog.set_ai_client(self.selection_ai_client)
+        self.selection_dialog.set_speculative_prefetch(self.config.get("speculative_prefetch_enabled", False))
         self.selection_timer = QTimer()
         self.selection_timer.setSingleShot(True)
         self.selection_timer.timeout.connect(self._handle_selection_search_in_main_thread)
@@ -197,11 +224,16 @@ class InputWindow(QMainWindow):
         self.hotkey = GlobalHotkey()
         self.hotkey.triggered.connect(self.show_window)
         self.hotkey.selection_triggered.connect(self._handle_selection_search_in_main_thread)
+        # 取选中文本要花几百毫秒，趁这段时间把到AI服务的连接建好
+        self.hotkey.selection_triggered.connect(self.warm_up_ai_connection)
+        self.hotkey.selection_to_input_triggered.connect(self.warm_up_ai_connection)
         self.hotkey.screenshot_triggered.connect(self.show_screenshot_overlay)
         self.hotkey.chat_triggered.connect(self.show_chat_window)
         self.hotkey.command_triggered.connect(self.show_command_window)
         self.hotkey.hotkey_failed.connect(self.handle_hotkey_failure)
-        self.hotkey.selection_to_input_triggered.connect(self.handle_selection_to_input)
+        self.hotkey.selection_to_input_triggered.connect(
+            lambda: asyncio.ensure_future(self.handle_selection_to_input())
+        )
 
     def init_timers(self):
         self.responsiveness_timer = QTimer()
@@ -223,6 +255,13 @@ class InputWindow(QMainWindow):
             lambda prompt, path: asyncio.create_task(self.handle_image_analysis(prompt, path))
         )
 
+    def show_trace_viewer(self):
+        """显示请求耗时统计窗口，第一次打开时创建"""
+        if not hasattr(self, 'trace_viewer_window'):
+            self.trace_viewer_window = TraceViewerWindow()
+        self.trace_viewer_window.show()
+        self.trace_viewer_window.raise_()
+
     def init_selection_keywords_window(self):
         self.selection_keywords_window = SelectionKeywordsWindow()
         self.selection_keywords_window.keywords_updated.connect(self.refresh_selection_menu)
@@ -256,47 +295,73 @@ class InputWindow(QMainWindow):
             else:
                 await self._get_non_stream_response_with_filter(prompt, temperature, max_tokens, filter_markdown)
         except Exception as e:
-            print(f"处理提示词时发生错误: {e}")
-            traceback.print_exc()
+            logger.exception("处理提示词时发生错误: %s", e)
     
     async def get_ai_response_with_filter(self, prompt: str, temperature: float = None, max_tokens: int = None, filter_markdown: bool = None):
-        """处理流式响应（带过滤选项）"""
-        response_text = ""
+        """处理流式响应（带过滤选项）
+
+        网络读取放在单独的任务中，停止按钮只取消这个任务；调用方自身被取消时清理后继续向上抛出。
+        """
+        parts = []
         self.should_stop = False
         self.floating_stop_button.show_at_cursor()
-        
+        # 输入在后台线程进行，网络读取不必等待目标程序
+        worker = self.insertion_worker = InsertionWorker(self.text_injection)
+        # 如果明确指定了filter_markdown参数，使用该参数；否则使用界面复选框状态
+        should_filter = filter_markdown if filter_markdown is not None else self.filter_markdown.isChecked()
+        # 格式标记可能被拆在两个响应块中，逐块过滤需要保留上下文
+        stripper = MarkdownStripper() if should_filter else None
+        worker.start()
+        reply = self.response_task = asyncio.create_task(
+            self._stream_reply(prompt, temperature, max_tokens, stripper, worker, parts)
+        )
+
         try:
-            async for text in self.ai_client.get_response_stream(
-                prompt, 
-                stream=True,
-                temperature=temperature,
-                max_tokens=max_tokens
-            ):
-                if self.should_stop:
-                    print("用户停止了响应")
-                    break
-                    
-                # 如果明确指定了filter_markdown参数，使用该参数；否则使用界面复选框状态
-                should_filter = filter_markdown if filter_markdown is not None else self.filter_markdown.isChecked()
-                if should_filter:
-                    text = remove_markdown(text)
-                    
-                response_text += text
-                self.insert_text_to_cursor(text)
-                
+            await reply
+            response_text = "".join(parts)
         except asyncio.CancelledError:
-            print("AI响应被取消")
+            logger.info("AI响应被取消")
+            if asyncio.current_task().cancelling():
+                raise
+            response_text = "".join(parts)
         except ConnectionError as e:
-            print(f"网络连接错误: {e}")
+            logger.error("网络连接错误: %s", e)
             response_text = f"网络连接失败: {str(e)}"
         except Exception as e:
-            print(f"获取AI响应时发生错误: {e}")
-            traceback.print_exc()
+            logger.exception("获取AI响应时发生错误: %s", e)
             response_text = f"获取响应失败: {str(e)}"
         finally:
+            await worker.close()
+            if self.insertion_worker is worker:
+                self.insertion_worker = None
+                self.response_task = None
             self.floating_stop_button.hide()
             
         return response_text
+
+    async def _stream_reply(self, prompt, temperature, max_tokens, stripper, worker, parts):
+        """读取流式响应并交给输入线程，已输出的文本追加到 parts"""
+        async for text in traced("input", self.ai_client.get_response_stream(
+            prompt, 
+            stream=True,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )):
+            if self.should_stop:
+                logger.info("用户停止了响应")
+                worker.cancel()
+                return
+                
+            if stripper:
+                text = stripper.feed(text)
+                
+            parts.append(text)
+            await worker.put(text)
+        
+        if stripper and not self.should_stop:
+            text = stripper.flush()
+            parts.append(text)
+            await worker.put(text)
     
     async def _get_non_stream_response_with_filter(self, prompt, temperature, max_tokens, filter_markdown=None):
         """获取非流式响应（带过滤选项）"""
@@ -313,7 +378,7 @@ class InputWindow(QMainWindow):
             self.insert_text_to_cursor(response, stream_mode=False)
             return response
         except Exception as e:
-            print(f"获取非流式响应失败: {e}")
+            logger.error("获取非流式响应失败: %s", e)
             error_msg = f"获取响应失败: {str(e)}"
             self.insert_text_to_cursor(error_msg, stream_mode=False)
             return error_msg
@@ -323,70 +388,16 @@ class InputWindow(QMainWindow):
         return await self.get_ai_response_with_filter(prompt, temperature, max_tokens, filter_markdown=None)
 
     def insert_text_to_cursor(self, text, stream_mode=True):
-        """插入文本到光标位置，支持流式和非流式模式，结合多种方法"""
+        """插入文本到光标位置：流式模式直接输入，非流式模式通过剪贴板粘贴"""
         try:
-            hwnd = GetForegroundWindow()
-            _, pid = GetWindowThreadProcessId(hwnd)
-            process_name = psutil.Process(pid).name().lower()
-            
-            # 获取当前线程ID和目标窗口线程ID
-            current_thread = win32api.GetCurrentThreadId()
-            target_thread = GetWindowThreadProcessId(hwnd)[0]
-            
-            # 附加输入线程，这样可以保持输入焦点
-            AttachThreadInput(current_thread, target_thread, True)
-            try:
-                SetForegroundWindow(hwnd)
-            finally:
-                AttachThreadInput(current_thread, target_thread, False)
-            
-            success = False
-
-            # 特殊处理 Microsoft Word
-            if 'winword' in process_name:
-                try:
-                    word = win32com_client.Dispatch("Word.Application")
-                    if word.Documents.Count > 0:
-                        word.Selection.TypeText(text)
-                        success = True
-                except Exception as e:
-                    print(f"使用 Word 自动化接口失败: {e}")
-
-            # 使用 PostMessage 发送 WM_CHAR
-            if not success:
-                try:
-                    if not stream_mode:
-                        # 非流式模式使用剪贴板
-                        old_clipboard = pyperclip.paste()
-                        pyperclip.copy(text)
-                        keyboard.press_and_release('ctrl+v')
-                        time.sleep(0.01)
-                        pyperclip.copy(old_clipboard)
-                    else:
-                        # 流式模式使用PostMessage
-                        for char in text:
-                            PostMessage(hwnd, WM_CHAR, ord(char), 0)
-                    success = True
-                except Exception as e:
-                    print(f"PostMessage 方法失败: {e}")
-
-            # 使用 keyboard 模块作为备选方案
-            if not success:
-                try:
-                    if stream_mode:
-                        keyboard.write(text, delay=0.001)
-                    else:
-                        keyboard.write(text)
-                    success = True
-                except Exception as e:
-                    print(f"keyboard 模块输入失败: {e}")
-
-            if not success:
-                print("所有插入方法均失败")
-                
+            target = self.text_injection.resolve_target()
+            self.text_injection.focus(target)
+            if stream_mode:
+                self.text_injection.inject(target, text)
+            else:
+                self.text_injection.paste(target, text)
         except Exception as e:
-            print(f"插入文本到光标失败: {e}")
-            traceback.print_exc()
+            logger.exception("插入文本到光标失败: %s", e)
 
 
 
@@ -407,15 +418,15 @@ class InputWindow(QMainWindow):
                 if 'proxy_enabled' in self.config:
                     self.config['proxy_enabled'] = bool(self.config['proxy_enabled'])
         except FileNotFoundError:
-            print("配置文件不存在，创建默认配置")
+            logger.warning("配置文件不存在，创建默认配置")
             self.config = default_config
             self._save_config()
         except json.JSONDecodeError as e:
-            print(f"配置文件格式错误: {e}，使用默认配置")
+            logger.warning("配置文件格式错误: %s，使用默认配置", e)
             self.config = default_config
             self._save_config()
         except (OSError, IOError) as e:
-            print(f"读取配置文件失败: {e}，使用默认配置")
+            logger.error("读取配置文件失败: %s，使用默认配置", e)
             self.config = default_config
     
     def _save_config(self):
@@ -424,7 +435,7 @@ class InputWindow(QMainWindow):
             with open('config/config.json', 'w', encoding='utf-8') as f:
                 json.dump(self.config, f, indent=4, ensure_ascii=False)
         except (OSError, IOError) as e:
-            print(f"保存配置文件失败: {e}")
+            logger.error("保存配置文件失败: %s", e)
 
     def show_window(self):
         """显示或隐藏窗口的方法"""
@@ -446,10 +457,9 @@ class InputWindow(QMainWindow):
                 self.activateWindow()
                 # 输入框已移到独立的提示词输入窗口
         except KeyboardInterrupt:
-            print("收到键盘中断信号")
+            logger.info("收到键盘中断信号")
         except Exception as e:
-            print(f"事件循环发生错误: {e}")
-            traceback.print_exc()
+            logger.exception("事件循环发生错误: %s", e)
 
     def hide(self):
         """重写hide方法以更新状态"""
@@ -486,15 +496,21 @@ class InputWindow(QMainWindow):
                     return True
             return super().eventFilter(obj, event)
         except KeyboardInterrupt:
-            print("收到键盘中断信号")
+            logger.info("收到键盘中断信号")
         except Exception as e:
-            print(f"事件循环发生错误: {e}")
-            traceback.print_exc()
+            logger.exception("事件循环发生错误: %s", e)
             return False
 
     def stop_response(self):
+        """停止按钮：同时停止网络读取和尚未完成的输入"""
         self.should_stop = True
         self.floating_stop_button.hide()
+        worker = getattr(self, 'insertion_worker', None)
+        if worker is not None:
+            worker.cancel()
+        task = getattr(self, 'response_task', None)
+        if task is not None and not task.done():
+            task.cancel()
 
     def on_settings_saved(self, settings_data):
         """当设置被保存时更新配置和AI客户端"""
@@ -502,12 +518,15 @@ class InputWindow(QMainWindow):
             config = settings_data["config"]
             self.config = config
             self.init_ai_clients()
+            self.selection_dialog.set_ai_client(self.selection_ai_client)
+            self.selection_dialog.set_speculative_prefetch(config.get("speculative_prefetch_enabled", False))
+            if hasattr(self, 'chat_window'):
+                configure_context_window(config, self.chat_window.context_window)
             self.reset_hotkeys()
         except KeyboardInterrupt:
-            print("收到键盘中断信号")
+            logger.info("收到键盘中断信号")
         except Exception as e:
-            print(f"事件循环发生错误: {e}")
-            traceback.print_exc()
+            logger.exception("事件循环发生错误: %s", e)
 
 
 
@@ -519,10 +538,9 @@ class InputWindow(QMainWindow):
             if hasattr(self, 'hotkey'):
                 self.hotkey._cleanup_keyboard_state()
         except KeyboardInterrupt:
-            print("收到键盘中断信号")
+            logger.info("收到键盘中断信号")
         except Exception as e:
-            print(f"事件循环发生错误: {e}")
-            traceback.print_exc()
+            logger.exception("事件循环发生错误: %s", e)
 
     def closeEvent(self, event):
         """窗口关闭时清理热键"""
@@ -544,47 +562,61 @@ class InputWindow(QMainWindow):
             QApplication.processEvents()
             if hasattr(self, 'cleanup_timer') and self.cleanup_timer.isActive():
                 self.cleanup_timer.stop()
+            # 写完尚未提交的聊天记录
+            chat_window = getattr(self, 'chat_window', None)
+            if chat_window is not None and chat_window.chat_store is not None:
+                chat_window.chat_store.close()
+            get_response_cache().close()
+            get_keyword_usage().flush()
+            # 事件循环停止前开始关闭图像会话和共享连接
+            self.start_closing_network_clients()
         except KeyboardInterrupt:
-            print("收到键盘中断信号")
+            logger.info("收到键盘中断信号")
         except Exception as e:
-            print(f"事件循环发生错误: {e}")
-            traceback.print_exc()
+            logger.exception("事件循环发生错误: %s", e)
 
     def _process_events(self):
         """定期处理累积的事件"""
         try:
             QApplication.processEvents()
         except KeyboardInterrupt:
-            print("收到键盘中断信号")
+            logger.info("收到键盘中断信号")
+        except Exception as e:
+            logger.exception("事件循环发生错误: %s", e)
+
+    def warm_up_ai_connection(self):
+        """热键按下时在后台预热连接"""
+        if not self.config.get("connection_warmup_enabled", True):
+            return
+        try:
+            asyncio.ensure_future(self.selection_ai_client.warm_up())
         except Exception as e:
-            print(f"事件循环发生错误: {e}")
-            traceback.print_exc()
+            logger.error("预热连接失败: %s", e)
 
     def _handle_selection_search_in_main_thread(self):
         """在主线程中创建异步任务"""
+        get_tracer().mark_pending("selection", "hotkey_received")
         try:
             loop = asyncio.get_event_loop()
             loop.create_task(self.handle_selection_search())
         except KeyboardInterrupt:
-            print("收到键盘中断信号")
+            logger.info("收到键盘中断信号")
         except Exception as e:
-            print(f"事件循环发生错误: {e}")
-            traceback.print_exc()
+            logger.exception("事件循环发生错误: %s", e)
 
     async def handle_selection_search(self):
         """理划词搜索"""
         try:
-            # 先等待一下让热键释放
-            await asyncio.sleep(0.1)
-            
-            selected_text = self.get_selected_text()
-            if not selected_text:
-                print("未获取到选中文本，重试一次")
-                # 如果第一次获取失败，稍等后重试一次
-                await asyncio.sleep(0.2)
-                selected_text = self.get_selected_text()
+            selected_text = None
+            try:
+                selected_text = await self.selection_capture.capture()
+            finally:
                 if not selected_text:
-                    return
+                    # 没取到文本、出错或被取消时丢弃热键时间点，免得下一次划词请求接收到过期的时间点
+                    get_tracer().clear_pending("selection")
+            if not selected_text:
+                return
+            get_tracer().mark_pending("selection", "selection_captured")
                 
             old_clipboard = pyperclip.paste()
             pyperclip.copy(selected_text)
@@ -593,10 +625,9 @@ class InputWindow(QMainWindow):
             finally:
                 pyperclip.copy(old_clipboard)
         except KeyboardInterrupt:
-            print("收到键盘中断信号")
+            logger.info("收到键盘中断信号")
         except Exception as e:
-            print(f"事件循环发生错误: {e}")
-            traceback.print_exc()
+            logger.exception("事件循环发生错误: %s", e)
 
     def handle_screenshot(self, image_path):
         """处理截图"""
@@ -606,10 +637,9 @@ class InputWindow(QMainWindow):
                 self.image_analysis_dialog.clear_response()
                 self.image_analysis_dialog.show()
         except KeyboardInterrupt:
-            print("收到键盘中断信号")
+            logger.info("收到键盘中断信号")
         except Exception as e:
-            print(f"事件循环发生错误: {e}")
-            traceback.print_exc()
+            logger.exception("事件循环发生错误: %s", e)
 
     async def handle_image_analysis(self, prompt: str, image_path: str):
         """处理图片分析请求"""
@@ -620,12 +650,15 @@ class InputWindow(QMainWindow):
                 image_data = f.read()
             self.image_analysis_dialog.clear_response()
             if self.image_analysis_dialog.stream_mode.isChecked():
-                async for text in self.ai_image_client.get_response_stream(prompt, image_data):
+                stripper = MarkdownStripper() if self.image_analysis_dialog.filter_markdown.isChecked() else None
+                async for text in traced("image", self.ai_image_client.get_response_stream(prompt, image_data)):
                     if not self.image_analysis_dialog.isVisible():
                         break
-                    if self.image_analysis_dialog.filter_markdown.isChecked():
-                        text = remove_markdown(text)
+                    if stripper:
+                        text = stripper.feed(text)
                     self.image_analysis_dialog.append_response(text)
+                if stripper and self.image_analysis_dialog.isVisible():
+                    self.image_analysis_dialog.append_response(stripper.flush())
             else:
                 response = await self.ai_image_client.get_response(prompt, image_data)
                 if not self.image_analysis_dialog.isVisible():
@@ -637,7 +670,7 @@ class InputWindow(QMainWindow):
             if self.image_analysis_dialog.isVisible():
                 error_msg = f"分析图片失败: {str(e)}"
                 self.image_analysis_dialog.append_response(f"错误: {error_msg}")
-                traceback.print_exc()
+                logger.exception("分析图片失败")
 
     def show_screenshot_overlay(self):
         """显示截图覆盖层"""
@@ -646,18 +679,15 @@ class InputWindow(QMainWindow):
             return
         self.screenshot_overlay.show()
 
-    def handle_selection_to_input(self):
+    async def handle_selection_to_input(self):
         """处理将选中文本添加到输入框的功能"""
         try:
-            # 移除延迟，改为更短的延迟
-            time.sleep(0.05)
-            
+            # 获取选中文本（会先等热键松开）
+            selected_text = await self.selection_capture.capture()
+
             # 保存当前焦点窗口
             current_hwnd = GetForegroundWindow()
             
-            # 获取选中文本
-            selected_text = self.get_selected_text()
-            
             # 显示提示词输入窗口并传入选中的文本
             if selected_text and selected_text.strip():
                 self.prompt_input_window.set_input_text(selected_text)
@@ -669,99 +699,16 @@ class InputWindow(QMainWindow):
             if current_hwnd and win32gui.IsWindow(current_hwnd):
                 try:
                     SetForegroundWindow(current_hwnd)
-                    time.sleep(0.05)
+                    await asyncio.sleep(0.05)
                     self.prompt_input_window.raise_()
                     self.prompt_input_window.activateWindow()
                 except:
                     pass
                     
         except KeyboardInterrupt:
-            print("收到键盘中断信号")
-        except Exception as e:
-            print(f"事件循环发生错误: {e}")
-            traceback.print_exc()
-
-    def get_selected_text(self):
-        """获取选中��文本"""
-        try:
-            hwnd = GetForegroundWindow()
-            if not hwnd:
-                print("无法获取活动窗口")
-                return None
-
-            _, pid = win32process.GetWindowThreadProcessId(hwnd)
-            process_name = psutil.Process(pid).name().lower()
-            print(f"当前活动窗口进程：{process_name}")
-
-            # 保存原始剪贴板内容
-            old_clipboard = pyperclip.paste()
-            
-            # 清空剪贴板
-            win32clipboard.OpenClipboard()
-            win32clipboard.EmptyClipboard()
-            win32clipboard.CloseClipboard()
-
-            # 针对Chrome等浏览器的特殊处理
-            chromium_browsers = [
-                'chrome.exe', 'msedge.exe', 'firefox.exe', 'opera.exe', 
-                'brave.exe', 'vivaldi.exe', 'edge.exe'
-            ]
-            
-            if process_name in chromium_browsers:
-                # 确保窗口处于前台
-                SetForegroundWindow(hwnd)
-                time.sleep(0.01)  # 给窗口切换更多时间
-                
-                # 尝试使用不同的复制方法
-                try:
-                    # 方法1：使用ctrl+c
-                    keyboard.press_and_release('ctrl+c')
-                    time.sleep(0.3)  # 给复制操作更多时间
-                    
-                    selected_text = pyperclip.paste()
-                    if not selected_text:
-                        # 方法2：使用ctrl+insert
-                        keyboard.press_and_release('ctrl+insert')
-                        time.sleep(0.3)
-                        selected_text = pyperclip.paste()
-                        
-                    if not selected_text:
-                        # 方法3：发送复制消息
-                        PostMessage(hwnd, WM_COPY, 0, 0)
-                        time.sleep(0.3)
-                        selected_text = pyperclip.paste()
-                except Exception as e:
-                    print(f"复制操作失败: {str(e)}")
-                    selected_text = None
-            else:
-                # 其他程序的常规处理
-                SetForegroundWindow(hwnd)
-                time.sleep(0.1)
-                keyboard.press_and_release('ctrl+c')
-                time.sleep(0.2)
-                selected_text = pyperclip.paste()
-
-            # 恢复原始剪贴板内容
-            try:
-                if old_clipboard:
-                    pyperclip.copy(old_clipboard)
-            except:
-                pass
-
-            if selected_text:
-                selected_text = selected_text.strip()
-                if selected_text:
-                    print(f"成功获取选中文本: {selected_text[:50]}...")
-                    return selected_text
-
-            print("未能获取选中文本")
-            return None
-        
+            logger.info("收到键盘中断信号")
         except Exception as e:
-            print(f"获取选中文本失败: {str(e)}")
-            traceback.print_exc()
-            return None
-
+            logger.exception("事件循环发生错误: %s", e)
 
     def _periodic_cleanup(self):
         """定期清理系统资源"""
@@ -770,9 +717,18 @@ class InputWindow(QMainWindow):
     def show_chat_window(self):
         """显示连续对话窗口"""
         try:
-            from chat_window import ChatWindow
+            from services.chat_store import ChatStore
+            from ui.chat_window import ChatWindow
             if not hasattr(self, 'chat_window'):
-                self.chat_window = ChatWindow(self.ai_client)
+                chat_store = None
+                if self.config.get("chat_history_enabled", True):
+                    chat_store = ChatStore(self.config.get("chat_history_path", "tmp/chat_history.db"))
+                self.chat_window = ChatWindow(
+                    self.ai_client, render_fps=int(self.config.get("chat_render_fps", 30)),
+                    context_window=configure_context_window(self.config),
+                    chat_store=chat_store,
+                    page_size=int(self.config.get("chat_history_page_size", 50))
+                )
             if self.chat_window.isVisible():
                 self.chat_window.hide()
             else:
@@ -789,10 +745,9 @@ class InputWindow(QMainWindow):
                 self.chat_window.raise_()
                 self.chat_window.activateWindow()
         except KeyboardInterrupt:
-            print("收到键盘中断信号")
+            logger.info("收到键盘中断信号")
         except Exception as e:
-            print(f"事件循环发生错误: {e}")
-            traceback.print_exc()
+            logger.exception("事件循环发生错误: %s", e)
 
     def refresh_selection_menu(self):
         """刷新划词菜单"""
@@ -802,10 +757,9 @@ class InputWindow(QMainWindow):
                     self.selection_dialog.show_menu("")
                 self.selection_dialog.selection_menu.refresh_menu()
         except KeyboardInterrupt:
-            print("收到键盘中断信号")
+            logger.info("收到键盘中断信号")
         except Exception as e:
-            print(f"事件循环发生错误: {e}")
-            traceback.print_exc()
+            logger.exception("事件循环发生错误: %s", e)
 
     def reset_hotkeys(self):
         """重置热键的方法"""
@@ -845,7 +799,7 @@ class InputWindow(QMainWindow):
                 time.sleep(0.2)
                 self.init_hotkeys()
             except Exception:
-                traceback.print_exc()
+                logger.exception("重新注册热键失败")
 
     def show_command_window(self):
         """显示命令窗口"""
@@ -863,10 +817,9 @@ class InputWindow(QMainWindow):
             else:
                 self.command_window.hide()
         except KeyboardInterrupt:
-            print("收到键盘中断信号")
+            logger.info("收到键盘中断信号")
         except Exception as e:
-            print(f"事件循环发生错误: {e}")
-            traceback.print_exc()
+            logger.exception("事件循环发生错误: %s", e)
 
 def check_single_instance():
     """检查否已有实例在运行"""
@@ -890,6 +843,8 @@ async def main():
         # 创建事件循环
         loop = qasync.QEventLoop(app)
         asyncio.set_event_loop(loop)
+        # 指标导出线程通过事件循环读取限流器的队列
+        get_metrics_exporter().set_loop(loop)
         
         # 创建清理任务
         cleanup_task = None
@@ -902,16 +857,22 @@ async def main():
                 except asyncio.CancelledError:
                     break
                 except Exception:
-                    traceback.print_exc()
+                    logger.exception("定期清理任务出错")
         
         try:
             # 启动清理任务
             cleanup_task = loop.create_task(cleanup_routine())
+            # 持续测量事件循环调度延迟，记录阻塞界面的调用栈
+            loop_monitor = get_loop_monitor()
+            if window.config.get("loop_monitor_enabled", True):
+                loop_monitor.stall_threshold = float(window.config.get("loop_stall_threshold_ms", 200)) / 1000
+                loop.call_soon(loop_monitor.start)
             
             # 注册程序退出时的清理函���
             def cleanup():
                 if cleanup_task and not cleanup_task.done():
                     cleanup_task.cancel()
+                loop_monitor.stop()
                 if loop.is_running():
                     loop.stop()
             
@@ -919,49 +880,68 @@ async def main():
             
             # 运行事件循环
             with loop:
-                return loop.run_forever()
+                loop.run_forever()
+                # aboutToQuit 时已开始关闭网络会话和共享连接，这里等它完成
+                loop.run_until_complete(window.start_closing_network_clients())
                 
         except KeyboardInterrupt:
-            print("收到键盘中断信号")
+            logger.info("收到键盘中断信号")
         except Exception as e:
-            print(f"事件循环发生错误: {e}")
-            traceback.print_exc()
+            logger.exception("事件循环发生错误: %s", e)
         finally:
             # 清理资源
-            print("开始清理程序资源...")
+            logger.info("开始清理程序资源...")
             
             # 取消清理任务
             if cleanup_task and not cleanup_task.done():
                 cleanup_task.cancel()
-                print("清理任务已取消")
+                logger.info("清理任务已取消")
+            get_loop_monitor().stop()
             
             # 停止并关闭事件循环
             try:
                 if loop.is_running():
                     loop.stop()
-                    print("事件循环已停止")
+                    logger.info("事件循环已停止")
                 loop.close()
-                print("事件循环已关闭")
+                logger.info("事件循环已关闭")
             except Exception as e:
-                print(f"关闭事件循环时发生错误: {e}")
+                logger.error("关闭事件循环时发生错误: %s", e)
             
-            print("程序资源清理完成")
+            logger.info("程序资源清理完成")
             
     except Exception as e:
-        print(f"主函数发生严重错误: {e}")
-        traceback.print_exc()
+        logger.exception("主函数发生严重错误: %s", e)
+
+def init_logging():
+    """按配置初始化日志，配置文件读取失败时使用默认设置"""
+    config = {}
+    try:
+        with open('config/config.json', 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        pass
+    setup_logging(
+        level=config.get("log_level", "INFO"),
+        log_dir=config.get("log_dir", "logs"),
+        console=config.get("log_console", False),
+    )
 
 if __name__ == "__main__":
     os.environ["QT_LOGGING_RULES"] = "qt.qpa.window=false"
+    init_logging()
     try:
         if not check_single_instance():
-            print("程序已在运行！")
+            logger.info("程序已在运行！")
             sys.exit(0)
             
         # 使用 asyncio.run 替代直接调用
         sys.exit(asyncio.run(main()))
         
     except Exception as e:
-        print(f"程序启动失败: {str(e)}")
-        traceback.print_exc()
+        logger.exception("程序启动失败: %s", e)
         sys.exit(1)
+    finally:
+        get_metrics_exporter().close()
+        get_tracer().close()
+        stop_logging()
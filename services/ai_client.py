@@ -1,13 +1,24 @@
+import asyncio
+import time
 from openai import AsyncOpenAI
 from typing import AsyncGenerator, Union
-import httpx
 import logging
-import traceback
+from services.http_pool import connection_phases, get_http_pool, track_timings
+from services.rate_limiter import ProviderLimiter, estimate_tokens
+from services.request_coalescer import RequestCoalescer
+from services.response_cache import ResponseCache
+from services.retry import RetryPolicy
+from utils.metrics import get_metrics
+from utils.tracing import current_trace
+
+logger = logging.getLogger(__name__)
 
 class AIClient:
     def __init__(self, api_key: str, base_url: str = None, model: str = "yi-lightning", 
                  api_type: str = "OpenAI", proxy: str = None, proxy_enabled: bool = False,
-                 temperature: float = 0.7, max_tokens: int = 2000):
+                 temperature: float = 0.7, max_tokens: int = 2000, response_cache: ResponseCache = None,
+                 coalesce_requests: bool = True, rate_limiter: ProviderLimiter = None,
+                 retry_policy: RetryPolicy = None):
         client_params = {"api_key": api_key}
         
         self.model = model
@@ -17,113 +28,235 @@ class AIClient:
         self.proxy = proxy
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.response_cache = response_cache
+        self.coalescer = RequestCoalescer() if coalesce_requests else None
+        self.rate_limiter = rate_limiter or ProviderLimiter(self.base_url)
+        self.retry_policy = retry_policy or RetryPolicy()
         
-        print(f"温度: {self.temperature}")
-        print(f"最大令牌数: {self.max_tokens}")
-        
-        # 设置代理
-        if self.proxy_enabled and self.proxy:
-            proxy_url = f"http://{self.proxy}"
-            proxy_config = {
-                "http://": proxy_url,
-                "https://": proxy_url
-            }
-            self.http_client = httpx.AsyncClient(
-                proxies=proxy_config,
-                verify=False  # 如果有SSL证书问题可以禁用验证
-            )
-            client_params["http_client"] = self.http_client
-            print(f"代理已启用: {proxy_url}")
-            print(f"代理配置: {proxy_config}")  # 直接打印代理配置字典
-        else:
-            self.http_client = None
-            print(f"代理未启用 (enabled={proxy_enabled}, proxy={proxy})")
+        # 设置代理，HTTP客户端从进程级连接池获取，重新配置时复用已建立的连接
+        self.http_client = self._pooled_http_client()
+        client_params["http_client"] = self.http_client
+        # 重试由 retry_policy 统一处理，关闭 SDK 自带的重试避免叠加
+        client_params["max_retries"] = 0
             
         if base_url:
             client_params["base_url"] = base_url
             
-        print("\n初始化配置:")
-        print(f"API类型: {self.api_type}")
-        print(f"模型: {self.model}")
-        print(f"API地址: {self.base_url}")
-        print(f"代理状态: {'启用' if self.proxy_enabled else '未启用'}")
-        print(f"代理设置: {self.proxy if self.proxy_enabled else '无'}")
-        print(f"客户端参数: {client_params}\n")
+        # client_params 中含有 api_key，不能写入日志
+        logger.info("初始化AI客户端: 类型=%s 模型=%s 地址=%s 代理=%s 温度=%s 最大令牌数=%s",
+                    self.api_type, self.model, self.base_url,
+                    self.proxy if self.proxy_enabled else "无", self.temperature, self.max_tokens)
             
         self.client = AsyncOpenAI(**client_params)
         
+    def _pooled_http_client(self):
+        if self.proxy_enabled and self.proxy:
+            proxy_url = f"http://{self.proxy}"
+            return get_http_pool().get_client(
+                self.base_url,
+                proxy=proxy_url,
+                verify=False  # 如果有SSL证书问题可以禁用验证
+            )
+        return get_http_pool().get_client(self.base_url)
+
+    def _ensure_http_client(self):
+        """连接池参数变化后旧客户端会被关闭，仍在使用的 AIClient 换用新的共享客户端"""
+        if self.http_client.is_closed:
+            self.http_client = self._pooled_http_client()
+            self.client = self.client.copy(http_client=self.http_client)
+
+    def _build_call_params(self, prompt: str, stream: bool, messages: list,
+                           temperature: float, max_tokens: int) -> dict:
+        """组装API调用参数，未传入的参数使用默认值"""
+        current_temperature = temperature if temperature is not None else self.temperature
+        current_max_tokens = max_tokens if max_tokens is not None else self.max_tokens
+        
+        if messages is None:
+            messages = [{
+                "role": "system",
+                "content": "你是一名AI助理，请直接回答问题"
+            }, {
+                "role": "user",
+                "content": prompt
+            }]
+        
+        call_params = {
+            "model": self.model,
+            "messages": messages,
+            "stream": stream,
+            "temperature": current_temperature,
+            "max_tokens": current_max_tokens
+        }
+        
+        if self.api_type == "Azure":
+            call_params["api_version"] = "2024-02-15-preview"
+        return call_params
+
     async def get_response_stream(self, prompt: str, stream: bool = True, messages: list = None,
                                 temperature: float = None, max_tokens: int = None) -> AsyncGenerator[str, None]:
-        """获取AI响应，支持流式和非流式模式"""
+        """获取AI响应，支持流式和非流式模式，出错时把错误信息作为文本返回"""
         try:
-            # 使用传入的参数或默认值
-            current_temperature = temperature if temperature is not None else self.temperature
-            current_max_tokens = max_tokens if max_tokens is not None else self.max_tokens
-            
-            if messages is None:
-                messages = [{
-                    "role": "system",
-                    "content": "你是一名AI助理，请直接回答问题"
-                }, {
-                    "role": "user",
-                    "content": prompt
-                }]
-            
-            call_params = {
-                "model": self.model,
-                "messages": messages,
-                "stream": stream,
-                "temperature": current_temperature,
-                "max_tokens": current_max_tokens
-            }
-            
-            if self.api_type == "Azure":
-                call_params["api_version"] = "2024-02-15-preview"
-            
-            print("\n实际API调用参数:")
-            print(f"URL: {self.client.base_url}")
-            print(f"代理状态: {'启用' if self.proxy_enabled else '未启用'}")
-            if self.proxy_enabled and self.proxy:
-                print(f"代理设置: http://{self.proxy}")
-            print(f"温度: {current_temperature}")
-            print(f"最大令牌数: {current_max_tokens}")
-            print(f"参数: {call_params}\n")
-            
-            # 根据不同的API类型设置不同的参数
-            if self.api_type == "Azure":
-                response = await self.client.chat.completions.create(**call_params)
-            else:  # OpenAI 和其他API
-                response = await self.client.chat.completions.create(**call_params)
-            
-            if stream:
-                # 流式模式
-                async for chunk in response:
-                    # if (hasattr(chunk, 'choices') and len(chunk.choices) > 0):
-                    #     print(f"响应块的choices: {chunk.choices}")  # 添加调试输出
-                    if (hasattr(chunk, 'choices') and 
-                        len(chunk.choices) > 0 and 
-                        chunk.choices[0].delta and 
-                        hasattr(chunk.choices[0].delta, 'content') and 
-                        chunk.choices[0].delta.content):
-                        yield chunk.choices[0].delta.content
-                print("流式模式结束")
-            else:
-                # 非流式模式，直接返回完整响应
-                if hasattr(response, 'choices') and len(response.choices) > 0:
-                    complete_response = response.choices[0].message.content
-                    yield complete_response
-                else:
-                    error_msg = "API响应格式错误：未找到有效的响应内容"
-                    print(error_msg)
-                    yield error_msg
-                print("非流式模式结束")
-                    
+            async for text in self.stream_chat(prompt, stream, messages, temperature, max_tokens):
+                yield text
         except Exception as e:
-            error_msg = f"API调用错误: {str(e)}"
-            print(error_msg)  # 在控制台打印错误
-            print("详细错误信息:")
-            traceback.print_exc()  # 打印详细的堆栈跟踪
-            yield error_msg
+            logger.exception("API调用错误")
+            yield f"API调用错误: {str(e)}"
+
+    async def stream_chat(self, prompt: str, stream: bool = True, messages: list = None,
+                          temperature: float = None, max_tokens: int = None) -> AsyncGenerator[str, None]:
+        """获取AI响应，出错时抛出异常
+
+        启用缓存时相同请求直接回放缓存内容；启用请求合并时，
+        相同的并发请求只向上游发送一次。
+        """
+        call_params = self._build_call_params(prompt, stream, messages, temperature, max_tokens)
+        cache = self.response_cache
+        if cache is not None and not cache.is_cacheable(call_params["temperature"]):
+            cache = None
+        if cache is None and self.coalescer is None:
+            async for text in self._fetch(call_params):
+                yield text
+            return
+
+        key = ResponseCache.make_key(
+            self.base_url, call_params["model"], call_params["messages"],
+            call_params["temperature"], call_params["max_tokens"]
+        )
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                # 按原来的分块快速回放，让流式界面走同样的代码路径
+                for text in cached:
+                    yield text
+                    await asyncio.sleep(0)
+                return
+
+        if self.coalescer is not None:
+            source = self.coalescer.stream(
+                (key, stream), lambda: self._fetch(call_params, cache, key)
+            )
+        else:
+            source = self._fetch(call_params, cache, key)
+        async for text in source:
+            yield text
+
+    async def stream_direct(self, prompt: str, stream: bool = True, messages: list = None,
+                            temperature: float = None, max_tokens: int = None) -> AsyncGenerator[str, None]:
+        """绕过缓存和请求合并，总是单独向上游发送一次请求（仍然经过限流和重试）"""
+        call_params = self._build_call_params(prompt, stream, messages, temperature, max_tokens)
+        async for text in self._fetch(call_params):
+            yield text
+
+    async def _fetch(self, call_params: dict, cache: ResponseCache = None,
+                     key: str = None) -> AsyncGenerator[str, None]:
+        """请求上游，可重试的错误按重试策略自动重试，完整结束后写入缓存"""
+        chunks = []
+        attempt = 0
+        while True:
+            try:
+                async for text in self._limited_stream(call_params):
+                    chunks.append(text)
+                    yield text
+                break
+            except Exception as e:
+                # 已经输出过内容时无法无缝续接，只能把错误交给调用方
+                delay = None if chunks else self.retry_policy.get_delay(attempt, e)
+                reason = self.retry_policy.classify(e) or type(e).__name__
+                if delay is None:
+                    get_metrics().increment("ai_request_failures", provider=self.base_url, reason=reason)
+                    raise
+                attempt += 1
+                get_metrics().increment("ai_request_retries", provider=self.base_url, reason=reason)
+                logger.warning("请求失败(%s)，%.1f秒后第%s次重试: %s", reason, delay, attempt, e)
+                await asyncio.sleep(delay)
+        # 只缓存完整结束的响应，调用方中途停止或出错时不会走到这里
+        if cache is not None and chunks:
+            cache.put(key, chunks)
+
+    async def _limited_stream(self, call_params: dict) -> AsyncGenerator[str, None]:
+        """在限流配额内请求一次上游，结束时按实际输出退还多扣的令牌"""
+        prompt_tokens = sum(
+            estimate_tokens(message.get("content"))
+            for message in call_params["messages"]
+            if isinstance(message.get("content"), str)
+        )
+        output = []
+        queued = time.monotonic()
+        async with self.rate_limiter.slot(prompt_tokens + call_params["max_tokens"]) as lease:
+            self._ensure_http_client()
+            start = time.monotonic()
+            timings = track_timings()
+            trace = current_trace()
+            if trace is not None:
+                trace.provider = trace.provider or self.base_url
+                trace.mark("request_sent", start)
+            try:
+                async with get_http_pool().lease(self.http_client):
+                    async for text in self._request_stream(call_params):
+                        if not output and call_params["stream"]:
+                            self._record_ttft(start - queued, start, timings)
+                            if trace is not None and "response_headers" in timings:
+                                trace.mark("first_byte", timings["response_headers"])
+                        output.append(text)
+                        yield text
+            finally:
+                lease.used_tokens = prompt_tokens + estimate_tokens("".join(output))
+
+    def _record_ttft(self, queue_wait: float, start: float, timings: dict):
+        """记录首字延迟及其拆分：限流排队、客户端准备、建立连接、TLS、服务端处理、首个内容块"""
+        now = time.monotonic()
+        metrics = get_metrics()
+        metrics.observe("ai_ttft_seconds", now - start, provider=self.base_url)
+        phases = connection_phases(timings)
+        phases["queue"] = queue_wait
+        if "request_start" in timings:
+            phases["client"] = timings["request_start"] - start
+        if "response_headers" in timings:
+            phases["first_chunk"] = now - timings["response_headers"]
+        for phase, seconds in phases.items():
+            metrics.observe("ai_ttft_phase_seconds", seconds, provider=self.base_url, phase=phase)
+        reused = "connection.connect_tcp.started" not in timings
+        metrics.increment("ai_connections", provider=self.base_url, reused=reused)
+
+    async def warm_up(self):
+        """提前建立到服务地址的连接，之后的请求可以直接复用"""
+        self._ensure_http_client()
+        await get_http_pool().warm_up(self.http_client, self.base_url)
+
+    async def _request_stream(self, call_params: dict) -> AsyncGenerator[str, None]:
+        """实际调用API"""
+        stream = call_params["stream"]
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("API调用: 地址=%s 代理=%s 温度=%s 最大令牌数=%s 参数=%s",
+                         self.client.base_url, f"http://{self.proxy}" if self.proxy_enabled and self.proxy else "无",
+                         call_params['temperature'], call_params['max_tokens'], call_params)
+        
+        # 根据不同的API类型设置不同的参数
+        if self.api_type == "Azure":
+            response = await self.client.chat.completions.create(**call_params)
+        else:  # OpenAI 和其他API
+            response = await self.client.chat.completions.create(**call_params)
+        
+        if stream:
+            # 流式模式
+            async for chunk in response:
+                # if (hasattr(chunk, 'choices') and len(chunk.choices) > 0):
+                #     print(f"响应块的choices: {chunk.choices}")  # 添加调试输出
+                if (hasattr(chunk, 'choices') and 
+                    len(chunk.choices) > 0 and 
+                    chunk.choices[0].delta and 
+                    hasattr(chunk.choices[0].delta, 'content') and 
+                    chunk.choices[0].delta.content):
+                    yield chunk.choices[0].delta.content
+            logger.debug("流式模式结束")
+        else:
+            # 非流式模式，直接返回完整响应
+            if hasattr(response, 'choices') and len(response.choices) > 0:
+                complete_response = response.choices[0].message.content
+                yield complete_response
+            else:
+                raise ValueError("API响应格式错误：未找到有效的响应内容")
+            logger.debug("非流式模式结束")
 
     async def get_response(self, prompt: str, messages: list = None, temperature: float = None, max_tokens: int = None) -> str:
         """获取非流式响应的辅助方法"""
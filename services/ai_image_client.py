@@ -1,14 +1,64 @@
+import logging
+import asyncio
 import base64
+import contextlib
 import aiohttp
 import json
+from services.rate_limiter import ProviderLimiter, estimate_tokens
+from utils.tracing import current_trace
+
+logger = logging.getLogger(__name__)
 
 class AIImageClient:
-    def __init__(self, api_key, base_url=None, model="yi-vision", proxy=None, proxy_enabled=False):
+    def __init__(self, api_key, base_url=None, model="yi-vision", proxy=None, proxy_enabled=False,
+                 connection_limit=10, dns_cache_ttl=300, keepalive_timeout=60, rate_limiter=None):
         self.api_key = api_key
         self.base_url = base_url or "https://api.lingyiwanwu.com/v1"
         self.model = model
         self.proxy = proxy
         self.proxy_enabled = proxy_enabled
+        self.connection_limit = connection_limit
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self._session = None
+        self._in_flight = 0
+        self._retired = False
+        self.rate_limiter = rate_limiter or ProviderLimiter(self.base_url)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """懒加载共享会话，多次分析复用 DNS 缓存和已建立的连接"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.connection_limit,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    @contextlib.asynccontextmanager
+    async def _session_lease(self):
+        """借用共享会话发一次请求，客户端已退役时在最后一个请求结束后关闭会话"""
+        session = self._get_session()
+        self._in_flight += 1
+        try:
+            yield session
+        finally:
+            self._in_flight -= 1
+            if self._retired and not self._in_flight:
+                asyncio.ensure_future(self.close())
+
+    def retire(self):
+        """客户端被替换时调用：没有进行中的请求就立即关闭，否则等请求结束后关闭"""
+        self._retired = True
+        if not self._in_flight:
+            asyncio.ensure_future(self.close())
+
+    async def close(self):
+        """关闭会话及其连接，客户端被替换或程序退出时调用"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
 
     async def get_response(self, prompt: str, image_data: bytes) -> str:
         """获取单次响应"""
@@ -44,7 +94,9 @@ class AIImageClient:
             # 设置代理
             proxy = f"http://{self.proxy}" if self.proxy_enabled and self.proxy else None
             
-            async with aiohttp.ClientSession() as session:
+            prompt_tokens = estimate_tokens(prompt)
+            async with self.rate_limiter.slot(prompt_tokens + data["max_tokens"]) as lease, \
+                    self._session_lease() as session:
                 async with session.post(
                     f"{self.base_url}/chat/completions",
                     headers=headers,
@@ -56,8 +108,10 @@ class AIImageClient:
                         raise Exception(f"API请求失败: {error_text}")
                     
                     result = await response.json()
-                    return result['choices'][0]['message']['content']
-                    
+                    content = result['choices'][0]['message']['content']
+                    lease.used_tokens = prompt_tokens + estimate_tokens(content)
+                    return content
+                
         except Exception as e:
             raise Exception(f"获取AI响应失败: {str(e)}")
 
@@ -96,32 +150,45 @@ class AIImageClient:
             # 设置代理
             proxy = f"http://{self.proxy}" if self.proxy_enabled and self.proxy else None
             
-            async with aiohttp.ClientSession() as session:
+            prompt_tokens = estimate_tokens(prompt)
+            output = []
+            trace = current_trace()
+            async with self.rate_limiter.slot(prompt_tokens + data["max_tokens"]) as lease, \
+                    self._session_lease() as session:
+                if trace is not None:
+                    trace.provider = trace.provider or self.base_url
+                    trace.mark("request_sent")
                 async with session.post(
                     f"{self.base_url}/chat/completions",
                     headers=headers,
                     json=data,
                     proxy=proxy
                 ) as response:
+                    if trace is not None:
+                        trace.mark("first_byte")
                     if response.status != 200:
                         error_text = await response.text()
                         raise Exception(f"API请求失败: {error_text}")
-                    
+
                     # 处理流式响应
-                    async for line in response.content:
-                        if line:
-                            try:
-                                line = line.decode('utf-8').strip()
-                                if line.startswith('data: ') and line != 'data: [DONE]':
-                                    json_str = line[6:]  # 移除 "data: " 前缀
-                                    data = json.loads(json_str)
-                                    if len(data['choices']) > 0:
-                                        delta = data['choices'][0]['delta']
-                                        if 'content' in delta:
-                                            yield delta['content']
-                            except Exception as e:
-                                print(f"处理响应流出错: {str(e)}")
-                                continue
-                    
+                    try:
+                        async for line in response.content:
+                            if line:
+                                try:
+                                    line = line.decode('utf-8').strip()
+                                    if line.startswith('data: ') and line != 'data: [DONE]':
+                                        json_str = line[6:]  # 移除 "data: " 前缀
+                                        data = json.loads(json_str)
+                                        if len(data['choices']) > 0:
+                                            delta = data['choices'][0]['delta']
+                                            if 'content' in delta:
+                                                output.append(delta['content'])
+                                                yield delta['content']
+                                except Exception as e:
+                                    logger.warning("处理响应流出错: %s", e)
+                                    continue
+                    finally:
+                        lease.used_tokens = prompt_tokens + estimate_tokens("".join(output))
+                
         except Exception as e:
             raise Exception(f"获取AI响应失败: {str(e)}") 
\ No newline at end of file
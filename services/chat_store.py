@@ -0,0 +1,95 @@
+import os
+import time
+import uuid
+
+from services.sqlite_writer import SQLiteWriter, connect
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS conversations ("
+    "id TEXT PRIMARY KEY, created REAL NOT NULL, title TEXT NOT NULL DEFAULT '')",
+    "CREATE TABLE IF NOT EXISTS messages ("
+    "id INTEGER PRIMARY KEY AUTOINCREMENT, conversation_id TEXT NOT NULL, "
+    "role TEXT NOT NULL, content TEXT NOT NULL, created REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS messages_conversation ON messages (conversation_id, id)",
+)
+
+
+class ChatStore:
+    """连续对话记录的 SQLite 存储
+
+    数据库使用 WAL 模式，界面线程只读（按页读取，读不会被写阻塞），写入交给 SQLiteWriter 批量提交。
+    分页按消息 id 倒序取，有 (conversation_id, id) 索引，每页的耗时与总记录数无关。
+    """
+
+    def __init__(self, db_path: str = "tmp/chat_history.db", batch_size: int = 100, flush_interval: float = 0.5):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = connect(db_path)
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+        self._db.commit()
+        self._writer = SQLiteWriter(db_path, self._apply, "ChatStoreWriter", batch_size, flush_interval)
+
+    def latest_conversation(self):
+        """最近有消息的对话 id，没有记录时返回 None"""
+        row = self._db.execute("SELECT conversation_id FROM messages ORDER BY id DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def new_conversation() -> str:
+        """新对话的 id，第一条消息写入时才会创建记录"""
+        return uuid.uuid4().hex
+
+    def load_page(self, conversation_id: str, before_id: int = None, limit: int = 50) -> list:
+        """读取 before_id 之前最近的 limit 条消息，按时间顺序返回 [(id, role, content)]"""
+        if before_id is None:
+            rows = self._db.execute(
+                "SELECT id, role, content FROM messages WHERE conversation_id = ? ORDER BY id DESC LIMIT ?",
+                (conversation_id, limit)
+            ).fetchall()
+        else:
+            rows = self._db.execute(
+                "SELECT id, role, content FROM messages WHERE conversation_id = ? AND id < ? "
+                "ORDER BY id DESC LIMIT ?",
+                (conversation_id, before_id, limit)
+            ).fetchall()
+        rows.reverse()
+        return rows
+
+    def add_message(self, conversation_id: str, role: str, content: str):
+        """写入一条完整的消息（在后台线程中提交）"""
+        self._writer.put(("message", conversation_id, role, content, time.time()))
+
+    def delete_conversation(self, conversation_id: str):
+        self._writer.put(("delete", conversation_id))
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待已提交的写入全部完成"""
+        return self._writer.flush(timeout)
+
+    def close(self):
+        """写完队列中剩余的内容后关闭"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._db.close()
+
+    @staticmethod
+    def _apply(db, op):
+        if op[0] == "message":
+            _, conversation_id, role, content, created = op
+            db.execute(
+                "INSERT OR IGNORE INTO conversations (id, created, title) VALUES (?, ?, ?)",
+                (conversation_id, created, content[:50] if role == "user" else "")
+            )
+            db.execute(
+                "INSERT INTO messages (conversation_id, role, content, created) VALUES (?, ?, ?, ?)",
+                (conversation_id, role, content, created)
+            )
+        elif op[0] == "delete":
+            db.execute("DELETE FROM messages WHERE conversation_id = ?", (op[1],))
+            db.execute("DELETE FROM conversations WHERE id = ?", (op[1],))
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+from collections import OrderedDict
+
+from services.rate_limiter import estimate_tokens
+from utils.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# 每条消息在请求中除内容外的开销（角色、分隔符）
+MESSAGE_OVERHEAD = 4
+
+SUMMARY_SYSTEM_PROMPT = "请把下面的对话压缩成一段简洁的摘要，保留事实、结论和用户提出的要求，不要使用 markdown 格式。"
+SUMMARY_PREFIX = "之前对话的摘要："
+
+
+class ContextWindow:
+    """按令牌预算裁剪连续对话的上下文
+
+    build() 始终保留系统提示词和最新的消息，从最新的一轮往前加入历史，超出预算的旧消息整轮丢弃。
+    预算按模型配置，需扣除本次回复的 max_tokens。每条消息的令牌数按内容缓存，
+    流式输出结束后的长回复只在下一轮估算一次。
+
+    启用摘要时，被丢弃的消息在后台交给模型压缩成滚动摘要，放在系统提示词之后；
+    摘要生成前的这一轮直接丢弃旧消息，不等待摘要。
+    """
+
+    def __init__(self, budgets: dict = None, summary_enabled: bool = False, summary_max_tokens: int = 300,
+                 cache_size: int = 4096):
+        self.budgets = {}
+        self.summary_enabled = False
+        self.summary_max_tokens = 300
+        self.cache_size = cache_size
+        self._counts = OrderedDict()
+        self.summary = ""
+        self.summarized = 0  # 摘要覆盖了历史中的前多少条消息
+        self.dropped = 0  # 上一次 build() 丢弃了历史中的前多少条消息
+        self.prepended = 0  # 历史最前面累计插入的消息条数
+        self._summary_task = None
+        self._reserve_warned = False
+        self.configure(budgets, summary_enabled, summary_max_tokens)
+
+    def configure(self, budgets: dict = None, summary_enabled: bool = False, summary_max_tokens: int = 300):
+        """budgets 形如 {"default": 8000, "模型名": 令牌数}，未列出的模型使用 default"""
+        self.budgets = dict(budgets or {})
+        self.budgets.setdefault("default", 8000)
+        self.summary_enabled = summary_enabled
+        self.summary_max_tokens = summary_max_tokens
+        self._reserve_warned = False
+        if not summary_enabled:
+            # 只丢弃摘要；翻页加载的位置属于当前对话，重新启用摘要后这些消息仍然不合并
+            self._clear_summary()
+
+    def budget_for(self, model: str = None) -> int:
+        return int(self.budgets.get(model or "", self.budgets["default"]))
+
+    def count(self, message: dict) -> int:
+        """一条消息的令牌数（估算），按内容缓存"""
+        content = message.get("content") or ""
+        tokens = self._counts.get(content)
+        if tokens is None:
+            tokens = estimate_tokens(content) + MESSAGE_OVERHEAD
+            self._counts[content] = tokens
+            if len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+        else:
+            self._counts.move_to_end(content)
+        return tokens
+
+    def build(self, system_prompt: str, history: list, model: str = None, reserve: int = 0) -> list:
+        """组装本次请求的消息列表：系统提示词、摘要（如有）和预算内最近的历史
+
+        reserve 是为回复预留的令牌数；预算不足时至少保留最新的一条消息。
+        reserve 超过预算的一半时（例如 max_tokens 调到 16000 而预算是默认的 8000），
+        只按预算的一半预留，历史和预留加起来仍不超过预算，也不会只剩最新的一条。
+        """
+        total = self.budget_for(model)
+        if reserve > total // 2:
+            if not self._reserve_warned:
+                logger.warning("回复预留的 %d 令牌超过上下文预算 %d 的一半，按 %d 令牌预留",
+                               reserve, total, total // 2)
+                self._reserve_warned = True
+            reserve = total // 2
+        budget = total - reserve
+        system = {"role": "system", "content": system_prompt}
+        used = self.count(system)
+        summary = None
+        if self.summary_enabled and self.summary:
+            summary = {"role": "system", "content": SUMMARY_PREFIX + self.summary}
+            used += self.count(summary)
+
+        start = len(history)
+        while start > 0:
+            tokens = self.count(history[start - 1])
+            if used + tokens > budget and start < len(history):
+                break
+            used += tokens
+            start -= 1
+        # 从完整的一轮开始，不以助手的回复开头
+        while 0 < start < len(history) - 1 and history[start]["role"] != "user":
+            start += 1
+
+        self.dropped = start
+        messages = [system]
+        if start > 0 and summary is not None:
+            messages.append(summary)
+        messages.extend(history[start:])
+
+        metrics = get_metrics()
+        metrics.observe("chat_context_tokens", sum(self.count(message) for message in messages))
+        if start > 0:
+            metrics.increment("chat_context_trimmed")
+            logger.debug("上下文超出预算 %d，丢弃最早的 %d 条消息，保留 %d 条", budget, start, len(history) - start)
+        return messages
+
+    def schedule_summary(self, ai_client, history: list):
+        """在后台把尚未摘要的已丢弃消息合并进滚动摘要，已有任务在运行时不重复启动"""
+        # 翻页加载的更早消息不合并进摘要，从它们之后开始
+        start = max(self.summarized, self.prepended)
+        if not self.summary_enabled or self.dropped <= start:
+            return
+        if self._summary_task is not None and not self._summary_task.done():
+            return
+        # 一次摘要的输入也不超过预算，剩下的下一轮再合并
+        limit = self.budget_for(getattr(ai_client, "model", None)) - 2 * self.summary_max_tokens
+        end = start
+        used = 0
+        while end < self.dropped and (end == start or used + self.count(history[end]) <= limit):
+            used += self.count(history[end])
+            end += 1
+        self._summary_task = asyncio.ensure_future(
+            self._summarize(ai_client, history[start:end], end, self.prepended)
+        )
+
+    def history_prepended(self, count: int):
+        """历史最前面插入了 count 条更早的消息（翻页加载），已记录的位置随之后移
+
+        这些消息比摘要覆盖的内容还早，不会再合并进摘要：schedule_summary 从第 prepended 条开始。
+        """
+        self.prepended += count
+        if self.summarized:
+            self.summarized += count
+        self.dropped += count
+
+    async def _summarize(self, ai_client, messages: list, end: int, prepended: int):
+        names = {"user": "用户", "assistant": "助手"}
+        transcript = "\n".join(f"{names.get(m['role'], m['role'])}: {m['content']}" for m in messages)
+        prompt = f"已有摘要：{self.summary}\n\n新的对话：\n{transcript}" if self.summary else transcript
+        request = [
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ]
+        try:
+            parts = []
+            async for text in ai_client.stream_chat(prompt, False, request, 0.3, self.summary_max_tokens):
+                parts.append(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 摘要失败不影响对话，下一轮再试
+            logger.warning("生成对话摘要失败: %s", e)
+            return
+        summary = "".join(parts).strip()
+        if summary:
+            self.summary = summary
+            # 摘要生成期间历史前面可能又插入了消息
+            self.summarized = end + self.prepended - prepended
+            logger.debug("对话摘要已更新，覆盖前 %d 条消息", end)
+
+    def reset(self):
+        """清空对话时调用，丢弃摘要和进行中的摘要任务"""
+        self._clear_summary()
+        self.dropped = 0
+        self.prepended = 0
+
+    def _clear_summary(self):
+        if self._summary_task is not None:
+            self._summary_task.cancel()
+            self._summary_task = None
+        self.summary = ""
+        self.summarized = 0
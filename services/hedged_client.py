@@ -0,0 +1,156 @@
+import logging
+import asyncio
+from typing import AsyncGenerator
+
+from utils.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _Racer:
+    """参与竞速的一路请求，first 任务等待它的第一块内容"""
+
+    def __init__(self, label: str, source):
+        self.label = label
+        self.source = source
+        self.first = asyncio.ensure_future(source.__anext__())
+
+    def first_chunk(self):
+        """已经拿到的第一块内容；空响应返回 None，出错时抛出异常"""
+        try:
+            return self.first.result()
+        except StopAsyncIteration:
+            return None
+
+    async def cancel(self) -> int:
+        """取消这一路请求，返回已经收到但被丢弃的字节数（UTF-8）"""
+        wasted = 0
+        if not self.first.done():
+            self.first.cancel()
+        try:
+            chunk = await self.first
+            wasted = len((chunk or "").encode("utf-8"))
+        except asyncio.CancelledError:
+            # 只忽略这一路自己的取消，调用方被取消时继续向上抛出
+            if asyncio.current_task().cancelling():
+                raise
+        except Exception:
+            pass
+        finally:
+            await self.source.aclose()
+        return wasted
+
+
+class HedgedClient:
+    """对冲请求：首字迟迟不到时再发一路相同的请求，哪一路先出字就用哪一路
+
+    等待时间取最近首字延迟的分位数，落后的一路会被立即取消。对冲请求绕过
+    请求合并和响应缓存，否则两路请求会被合并成一次。
+    """
+
+    def __init__(self, primary, alternate=None, percentile: float = 90,
+                 min_delay: float = 0.3, max_delay: float = 3.0, default_delay: float = 1.0,
+                 min_samples: int = 5):
+        self.primary = primary
+        self.alternate = alternate or primary
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+
+    def __getattr__(self, name):
+        if name == "primary":
+            raise AttributeError(name)
+        return getattr(self.primary, name)
+
+    def hedge_delay(self) -> float:
+        """发出第二路请求前等待的秒数"""
+        base_url = getattr(self.primary, "base_url", None)
+        metrics = get_metrics()
+        if len(metrics.samples("ai_ttft_seconds", provider=base_url)) < self.min_samples:
+            return self.default_delay
+        delay = metrics.percentile("ai_ttft_seconds", self.percentile, provider=base_url)
+        return max(self.min_delay, min(self.max_delay, delay))
+
+    @staticmethod
+    def _direct(client, args):
+        # AIClient 和 ProviderRouter 提供不经过合并的请求入口，其他客户端退回普通接口。
+        # 只认类自己定义的方法，避免经由 __getattr__ 拿到被包装对象的方法而绕过路由
+        if getattr(type(client), "stream_direct", None) is not None:
+            return client.stream_direct(*args)
+        return client.stream_chat(*args)
+
+    async def stream_chat(self, prompt: str, stream: bool = True, messages: list = None,
+                          temperature: float = None, max_tokens: int = None) -> AsyncGenerator[str, None]:
+        args = (prompt, stream, messages, temperature, max_tokens)
+        if not stream:
+            # 非流式请求没有首字，不做对冲
+            async for text in self.primary.stream_chat(*args):
+                yield text
+            return
+
+        metrics = get_metrics()
+        racers = [_Racer("primary", self._direct(self.primary, args))]
+        winner = None
+        try:
+            done, _ = await asyncio.wait([racers[0].first], timeout=self.hedge_delay())
+            if not done or racers[0].first.exception() is not None and \
+                    not isinstance(racers[0].first.exception(), StopAsyncIteration):
+                racers.append(_Racer("hedge", self._direct(self.alternate, args)))
+                metrics.increment("ai_hedge_fired")
+
+            pending = {racer.first: racer for racer in racers}
+            last_error = None
+            while winner is None and pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    racer = pending.pop(task)
+                    error = task.exception()
+                    if error is None or isinstance(error, StopAsyncIteration):
+                        winner = racer
+                        break
+                    last_error = error
+            if winner is None:
+                raise last_error
+            if winner.label == "hedge":
+                metrics.increment("ai_hedge_won")
+        finally:
+            for racer in racers:
+                if racer is not winner:
+                    wasted = await racer.cancel()
+                    if wasted:
+                        metrics.increment("ai_hedge_wasted_bytes", wasted)
+
+        try:
+            first = winner.first_chunk()
+            if first is None:
+                return
+            yield first
+            async for text in winner.source:
+                yield text
+        finally:
+            await winner.source.aclose()
+
+    async def get_response_stream(self, prompt: str, stream: bool = True, messages: list = None,
+                                  temperature: float = None, max_tokens: int = None) -> AsyncGenerator[str, None]:
+        """与 AIClient.get_response_stream 相同，出错时把错误信息作为文本返回"""
+        try:
+            async for text in self.stream_chat(prompt, stream, messages, temperature, max_tokens):
+                yield text
+        except Exception as e:
+            logger.exception("API调用错误")
+            yield f"API调用错误: {str(e)}"
+
+    async def get_response(self, prompt: str, messages: list = None, temperature: float = None,
+                           max_tokens: int = None) -> str:
+        response = ""
+        async for chunk in self.get_response_stream(
+            prompt,
+            stream=False,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        ):
+            response += chunk
+        return response
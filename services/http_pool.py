@@ -0,0 +1,186 @@
+import logging
+import asyncio
+import contextlib
+import contextvars
+import importlib.util
+import time
+import httpx
+
+from utils.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# 当前上下文中发出的请求把各阶段的时间点写到这里，用于拆分首字延迟
+_timings = contextvars.ContextVar("http_timings", default=None)
+
+
+def track_timings() -> dict:
+    """之后在当前上下文中发出的请求会把连接各阶段的时间点记录到返回的字典里
+
+    键为 httpcore 的 trace 事件名（如 connection.connect_tcp.complete），
+    另有 request_start 和 response_headers 两个时间点。
+    """
+    timings = {}
+    _timings.set(timings)
+    return timings
+
+
+def connection_phases(timings: dict) -> dict:
+    """把时间点换算成各阶段耗时（秒）；复用已有连接时 connect/tls 为0"""
+    def span(name):
+        start = timings.get(f"connection.{name}.started")
+        end = timings.get(f"connection.{name}.complete")
+        return end - start if start is not None and end is not None else 0.0
+
+    phases = {"connect": span("connect_tcp"), "tls": span("start_tls")}
+    if "request_start" in timings and "response_headers" in timings:
+        phases["server"] = max(0.0, timings["response_headers"] - timings["request_start"]
+                               - phases["connect"] - phases["tls"])
+    return phases
+
+
+async def _on_request(request: httpx.Request):
+    timings = _timings.get()
+    if timings is None:
+        return
+    timings["request_start"] = time.monotonic()
+
+    async def trace(event, info):
+        timings.setdefault(event, time.monotonic())
+    request.extensions["trace"] = trace
+
+
+async def _on_response(response: httpx.Response):
+    timings = _timings.get()
+    if timings is not None:
+        timings["response_headers"] = time.monotonic()
+
+
+class HttpClientPool:
+    """进程级共享的 httpx 连接池，按 (base_url, proxy, verify) 复用长连接"""
+
+    def __init__(self, max_connections: int = 20, max_keepalive_connections: int = 10,
+                 keepalive_expiry: float = 120.0, http2: bool = True):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        # 只有安装了 h2 时才能启用 HTTP/2，服务端不支持时 httpx 会自动回落到 HTTP/1.1
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        self._clients = {}
+        self._retired = []
+        self._in_flight = {}
+        self._warming = {}
+
+    def configure(self, max_connections: int = None, max_keepalive_connections: int = None,
+                  keepalive_expiry: float = None, http2: bool = None):
+        """更新连接池参数，参数变化时旧客户端在其上的请求全部结束后关闭"""
+        settings = (
+            max_connections if max_connections is not None else self.max_connections,
+            max_keepalive_connections if max_keepalive_connections is not None else self.max_keepalive_connections,
+            keepalive_expiry if keepalive_expiry is not None else self.keepalive_expiry,
+            (http2 and importlib.util.find_spec("h2") is not None) if http2 is not None else self.http2,
+        )
+        current = (self.max_connections, self.max_keepalive_connections, self.keepalive_expiry, self.http2)
+        if settings == current:
+            return
+        (self.max_connections, self.max_keepalive_connections,
+         self.keepalive_expiry, self.http2) = settings
+        # 正在进行的流式请求可能还在使用旧客户端，等它们结束后再关闭
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            if self._in_flight.get(id(client)):
+                self._retired.append(client)
+            else:
+                self._close_later(client)
+
+    @contextlib.asynccontextmanager
+    async def lease(self, client: httpx.AsyncClient):
+        """标记客户端上有一个请求正在进行，已退役的客户端在最后一个请求结束时关闭"""
+        key = id(client)
+        self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        try:
+            yield client
+        finally:
+            remaining = self._in_flight[key] - 1
+            if remaining:
+                self._in_flight[key] = remaining
+            else:
+                del self._in_flight[key]
+                if client in self._retired:
+                    self._retired.remove(client)
+                    self._close_later(client)
+
+    def _close_later(self, client: httpx.AsyncClient):
+        asyncio.ensure_future(self._close_client(client))
+
+    @staticmethod
+    async def _close_client(client: httpx.AsyncClient):
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.error("关闭HTTP客户端失败: %s", e)
+
+    def get_client(self, base_url: str, proxy: str = None, verify: bool = True) -> httpx.AsyncClient:
+        """获取（或创建）与目标服务对应的共享客户端"""
+        key = (base_url, proxy, verify)
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            limits = httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry
+            )
+            client = httpx.AsyncClient(
+                proxy=proxy,
+                verify=verify,
+                limits=limits,
+                http2=self.http2,
+                follow_redirects=True,
+                event_hooks={"request": [_on_request], "response": [_on_response]}
+            )
+            self._clients[key] = client
+        return client
+
+    def warm_up(self, client: httpx.AsyncClient, url: str, timeout: float = 5.0) -> asyncio.Future:
+        """提前完成 DNS、TCP 和 TLS 握手（经过代理时包括代理连接），让随后的请求落在热连接上
+
+        发送一个不消耗额度的 HEAD 请求，响应状态码无关紧要；同一客户端正在预热时不会重复发送。
+        """
+        task = self._warming.get(id(client))
+        if task is None or task.done():
+            task = asyncio.ensure_future(self._warm_up(client, url, timeout))
+            self._warming[id(client)] = task
+            task.add_done_callback(lambda _: self._warming.pop(id(client), None))
+        return task
+
+    async def _warm_up(self, client: httpx.AsyncClient, url: str, timeout: float):
+        timings = track_timings()
+        start = time.monotonic()
+        try:
+            async with self.lease(client):
+                response = await client.head(url, timeout=timeout)
+                await response.aclose()
+        except Exception as e:
+            logger.error("预热连接失败: %s", e)
+            return
+        metrics = get_metrics()
+        metrics.observe("http_warmup_seconds", time.monotonic() - start, url=url)
+        for phase, seconds in connection_phases(timings).items():
+            metrics.observe("http_warmup_phase_seconds", seconds, url=url, phase=phase)
+
+    async def close(self):
+        """关闭所有客户端，程序退出时调用"""
+        clients = list(self._clients.values()) + self._retired
+        self._clients.clear()
+        self._retired.clear()
+        for client in clients:
+            await self._close_client(client)
+
+
+_pool = HttpClientPool()
+
+
+def get_http_pool() -> HttpClientPool:
+    """获取进程级共享的连接池"""
+    return _pool
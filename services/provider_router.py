@@ -0,0 +1,202 @@
+import logging
+import asyncio
+import time
+from collections import Counter, deque
+from typing import AsyncGenerator
+
+from utils.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderHealth:
+    """单个服务提供方的健康状况：最近的首字延迟和连续失败次数"""
+
+    def __init__(self, name: str, window: int = 50):
+        self.name = name
+        self.latencies = deque(maxlen=window)
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    def record_success(self, ttft: float):
+        self.latencies.append(ttft)
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    def record_failure(self, cooldown: float):
+        self.failures += 1
+        self.consecutive_failures += 1
+        # 连续失败越多冷却越久，冷却期内排到最后，但所有服务都不可用时仍会尝试
+        self.cooldown_until = time.monotonic() + cooldown * min(self.consecutive_failures, 4)
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    @property
+    def p50(self):
+        """最近首字延迟的中位数，没有数据时返回 None"""
+        if not self.latencies:
+            return None
+        values = sorted(self.latencies)
+        return values[(len(values) - 1) // 2]
+
+    def stats(self) -> dict:
+        return {
+            "provider": self.name,
+            "p50_ttft": self.p50,
+            "successes": self.successes,
+            "failures": self.failures,
+            "available": self.available,
+        }
+
+
+_health = {}
+
+
+def get_provider_health(name: str) -> ProviderHealth:
+    """健康状况按名称保存在进程内，重新保存设置后不会丢失"""
+    health = _health.get(name)
+    if health is None:
+        health = _health[name] = ProviderHealth(name)
+    return health
+
+
+class ProviderRouter:
+    """把多个预设当作一个服务池使用，接口与 AIClient 相同
+
+    strategy 为 "failover" 时按配置顺序依次尝试；为 "latency" 时优先使用
+    最近首字延迟中位数最低的服务。出错或首字超时会自动切换到下一个服务，
+    已经输出内容后出错则不再切换，直接把错误交给调用方。
+    """
+
+    def __init__(self, providers: list, strategy: str = "failover",
+                 ttft_timeout: float = 8.0, cooldown: float = 30.0):
+        self.providers = list(providers)  # [(名称, AIClient)]
+        self.strategy = strategy
+        self.ttft_timeout = ttft_timeout
+        self.cooldown = cooldown
+        self._waiting = Counter()  # 绕过合并的请求中，各服务正在等待首字的数量
+
+    @property
+    def primary(self):
+        return self.providers[0][1]
+
+    def __getattr__(self, name):
+        # model、base_url 等属性沿用第一个服务的设置
+        if name in ("providers", "_waiting"):
+            raise AttributeError(name)
+        return getattr(self.primary, name)
+
+    def _ordered(self) -> list:
+        """按策略排序，冷却中的服务放到最后"""
+        indexed = list(enumerate(self.providers))
+        if self.strategy == "latency":
+            def sort_key(item):
+                p50 = get_provider_health(item[1][0]).p50
+                # 没有数据的服务排在前面，先采集一次延迟
+                return (p50 is not None, p50 or 0.0, item[0])
+            indexed.sort(key=sort_key)
+        ordered = [provider for _, provider in indexed]
+        return ([p for p in ordered if get_provider_health(p[0]).available] +
+                [p for p in ordered if not get_provider_health(p[0]).available])
+
+    async def stream_chat(self, prompt: str, stream: bool = True, messages: list = None,
+                          temperature: float = None, max_tokens: int = None) -> AsyncGenerator[str, None]:
+        """依次尝试各个服务，直到某个服务返回第一块内容"""
+        args = (prompt, stream, messages, temperature, max_tokens)
+        async for text in self._route(self._ordered(), lambda client: client.stream_chat(*args), stream):
+            yield text
+
+    async def stream_direct(self, prompt: str, stream: bool = True, messages: list = None,
+                            temperature: float = None, max_tokens: int = None) -> AsyncGenerator[str, None]:
+        """与 stream_chat 相同地路由和切换，但绕过各服务的缓存和请求合并
+
+        供对冲请求使用：正在等待首字的服务排到后面，两路对冲请求会落到不同的服务上。
+        """
+        args = (prompt, stream, messages, temperature, max_tokens)
+        ordered = sorted(self._ordered(), key=lambda provider: self._waiting[provider[0]])
+        async for text in self._route(ordered, lambda client: client.stream_direct(*args), stream,
+                                      track_waiting=True):
+            yield text
+
+    async def _route(self, ordered: list, open_stream, stream: bool,
+                     track_waiting: bool = False) -> AsyncGenerator[str, None]:
+        last_error = None
+        for index, (name, client) in enumerate(ordered):
+            health = get_provider_health(name)
+            if index > 0:
+                get_metrics().increment("ai_router_failovers", provider=name)
+                logger.warning("切换到服务: %s", name)
+            source = open_stream(client)
+            start = time.monotonic()
+            if track_waiting:
+                self._waiting[name] += 1
+            try:
+                # 非流式请求没有首字的概念，只在出错时切换
+                timeout = self.ttft_timeout if stream and self.ttft_timeout > 0 else None
+                first = await asyncio.wait_for(source.__anext__(), timeout)
+            except StopAsyncIteration:
+                health.record_success(time.monotonic() - start)
+                return
+            except asyncio.TimeoutError:
+                await source.aclose()
+                health.record_failure(self.cooldown)
+                last_error = TimeoutError(f"{name} 在 {self.ttft_timeout:.1f} 秒内没有返回内容")
+                logger.warning("服务 %s 首字超时", name)
+                continue
+            except Exception as e:
+                await source.aclose()
+                health.record_failure(self.cooldown)
+                last_error = e
+                logger.error("服务 %s 请求失败: %s", name, e)
+                continue
+            finally:
+                if track_waiting:
+                    self._waiting[name] -= 1
+                    if not self._waiting[name]:
+                        del self._waiting[name]
+
+            health.record_success(time.monotonic() - start)
+            try:
+                yield first
+                async for text in source:
+                    yield text
+            except Exception:
+                health.record_failure(self.cooldown)
+                raise
+            finally:
+                await source.aclose()
+            return
+
+        raise last_error or RuntimeError("没有可用的AI服务")
+
+    async def get_response_stream(self, prompt: str, stream: bool = True, messages: list = None,
+                                  temperature: float = None, max_tokens: int = None) -> AsyncGenerator[str, None]:
+        """与 AIClient.get_response_stream 相同，出错时把错误信息作为文本返回"""
+        try:
+            async for text in self.stream_chat(prompt, stream, messages, temperature, max_tokens):
+                yield text
+        except Exception as e:
+            logger.exception("API调用错误")
+            yield f"API调用错误: {str(e)}"
+
+    async def get_response(self, prompt: str, messages: list = None, temperature: float = None,
+                           max_tokens: int = None) -> str:
+        response = ""
+        async for chunk in self.get_response_stream(
+            prompt,
+            stream=False,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        ):
+            response += chunk
+        return response
+
+    def stats(self) -> list:
+        """各服务的健康状况"""
+        return [get_provider_health(name).stats() for name, _ in self.providers]
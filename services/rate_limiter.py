@@ -0,0 +1,204 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算令牌数：中日韩字符按1个令牌计，其他字符按4个字符1个令牌计"""
+    if not text:
+        return 0
+    wide = sum(1 for ch in text if ord(ch) >= 0x2E80)
+    return wide + (len(text) - wide + 3) // 4
+
+
+class _TokenBucket:
+    """按分钟配额匀速补充的令牌桶，配额为0表示不限制"""
+
+    def __init__(self, per_minute: float = 0):
+        self.capacity = 0
+        self.level = 0.0
+        self._updated = time.monotonic()
+        self.configure(per_minute)
+
+    def configure(self, per_minute: float):
+        self._refill()
+        was_unlimited = self.capacity <= 0
+        self.capacity = max(0.0, float(per_minute))
+        self.level = self.capacity if was_unlimited else min(self.level, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.capacity > 0:
+            self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60.0)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """取出 amount 个令牌还需等待的秒数"""
+        if self.capacity <= 0:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)  # 单次请求超过配额时按整桶计算，避免永远等待
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60.0 / self.capacity
+
+    def take(self, amount: float):
+        if self.capacity > 0:
+            self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float):
+        if self.capacity > 0 and amount > 0:
+            self._refill()
+            self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimitLease:
+    """一次获得的请求配额，used_tokens 用于在结束时按实际用量退还多扣的令牌"""
+
+    def __init__(self, tokens: int, waited: float):
+        self.tokens = tokens
+        self.used_tokens = tokens
+        self.waited = waited
+
+
+class ProviderLimiter:
+    """单个服务提供方的客户端限流：并发流数量、每分钟请求数、每分钟令牌数
+
+    等待中的请求按先来先服务排队，只有队首满足条件后才会放行后面的请求。
+    """
+
+    def __init__(self, name: str, max_concurrent: int = 0, requests_per_minute: int = 0,
+                 tokens_per_minute: int = 0):
+        self.name = name
+        self.active = 0
+        self._waiters = deque()
+        self._timer = None
+        self._requests = _TokenBucket()
+        self._tokens = _TokenBucket()
+        self._recent_waits = deque(maxlen=200)
+        self.total_acquired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.configure(max_concurrent, requests_per_minute, tokens_per_minute)
+
+    def configure(self, max_concurrent: int = 0, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        """更新限流参数，排队中的请求按新参数重新判断"""
+        self.max_concurrent = max(0, int(max_concurrent))
+        self._requests.configure(requests_per_minute)
+        self._tokens.configure(tokens_per_minute)
+        self._wake()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.max_concurrent <= 0 and self._requests.capacity <= 0 and self._tokens.capacity <= 0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for future, _ in self._waiters if not future.done())
+
+    async def acquire(self, tokens: int = 0) -> float:
+        """排队获取一次请求配额，返回等待的秒数"""
+        start = time.monotonic()
+        if not self._waiters and self._can_start(tokens) == 0.0:
+            self._start(tokens)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append((future, tokens))
+            self._wake()
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # 已经分配到配额但调用方被取消，需要归还
+                    self.release(tokens, 0)
+                else:
+                    future.cancel()
+                    self._wake()
+                raise
+        waited = time.monotonic() - start
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self._recent_waits.append(waited)
+        return waited
+
+    def release(self, tokens: int = 0, used_tokens: int = None):
+        """结束一次请求，按实际用量退还多扣的令牌"""
+        self.active -= 1
+        if used_tokens is not None:
+            self._tokens.give_back(tokens - used_tokens)
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, tokens: int = 0):
+        """async with 方式使用配额"""
+        waited = await self.acquire(tokens)
+        lease = RateLimitLease(tokens, waited)
+        try:
+            yield lease
+        finally:
+            self.release(tokens, lease.used_tokens)
+
+    def _can_start(self, tokens: int) -> float:
+        """返回0表示可以立即开始，正数表示需要等待的秒数，None表示并发已满"""
+        if self.max_concurrent > 0 and self.active >= self.max_concurrent:
+            return None
+        return max(self._requests.wait_time(1), self._tokens.wait_time(tokens))
+
+    def _start(self, tokens: int):
+        self._requests.take(1)
+        self._tokens.take(tokens)
+        self.active += 1
+        self.total_acquired += 1
+
+    def _wake(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiters:
+            future, tokens = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            wait = self._can_start(tokens)
+            if wait is None:
+                return  # 等待有请求结束
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._wake)
+                return
+            self._waiters.popleft()
+            self._start(tokens)
+            future.set_result(None)
+
+    def stats(self) -> dict:
+        """当前队列深度与等待时间统计"""
+        waits = sorted(self._recent_waits)
+        return {
+            "provider": self.name,
+            "active": self.active,
+            "queue_depth": self.queue_depth,
+            "acquired": self.total_acquired,
+            "avg_wait": self.total_wait / self.total_acquired if self.total_acquired else 0.0,
+            "max_wait": self.max_wait,
+            "p95_wait": waits[int(len(waits) * 0.95) - 1] if waits else 0.0,
+        }
+
+
+_limiters = {}
+
+
+def get_rate_limiter(provider: str, max_concurrent: int = 0, requests_per_minute: int = 0,
+                     tokens_per_minute: int = 0) -> ProviderLimiter:
+    """获取服务提供方对应的限流器，同一提供方的所有客户端共享一个队列"""
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        limiter = ProviderLimiter(provider, max_concurrent, requests_per_minute, tokens_per_minute)
+        _limiters[provider] = limiter
+    else:
+        limiter.configure(max_concurrent, requests_per_minute, tokens_per_minute)
+    return limiter
+
+
+def all_rate_limiters() -> list:
+    """所有已创建的限流器，用于展示统计信息"""
+    return list(_limiters.values())
@@ -0,0 +1,106 @@
+import asyncio
+from typing import AsyncGenerator, AsyncIterator, Callable, Hashable
+
+
+class SharedStream:
+    """一个正在进行的上游请求，负责把响应块分发给所有订阅者"""
+
+    def __init__(self, source: AsyncIterator[str]):
+        self.chunks = []
+        self.error = None
+        self.done = False
+        self.closing = False
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source):
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+            aclose = getattr(source, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    def _notify(self):
+        # 唤醒当前所有等待者，之后的等待者使用新的事件
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    @property
+    def joinable(self) -> bool:
+        return not self.done and not self.closing
+
+    async def follow(self) -> AsyncGenerator[str, None]:
+        """订阅这个请求：先回放已经到达的响应块，再继续接收新的"""
+        self.subscribers += 1
+        try:
+            index = 0
+            while True:
+                while index < len(self.chunks):
+                    yield self.chunks[index]
+                    index += 1
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await self._changed.wait()
+        finally:
+            self.release()
+
+    def release(self):
+        """订阅者离开；最后一个订阅者离开时取消上游请求"""
+        self.subscribers -= 1
+        if self.subscribers <= 0 and not self.done:
+            self.closing = True
+            self.task.cancel()
+
+
+class RequestCoalescer:
+    """合并相同的并发请求：同一时刻只向上游发送一次，结果分发给所有调用方"""
+
+    def __init__(self):
+        self._inflight = {}
+        self.started = 0
+        self.joined = 0
+
+    async def stream(self, key: Hashable,
+                     source_factory: Callable[[], AsyncIterator[str]]) -> AsyncGenerator[str, None]:
+        """订阅 key 对应的请求，不存在时用 source_factory 发起新请求
+
+        后加入的订阅者会先收到已经到达的响应块；每个订阅者都可以单独停止，
+        只有全部订阅者离开后上游请求才会被取消。
+        """
+        request = self._inflight.get(key)
+        if request is None or not request.joinable:
+            request = SharedStream(source_factory())
+            self._inflight[key] = request
+            request.task.add_done_callback(lambda _: self._forget(key, request))
+            self.started += 1
+        else:
+            self.joined += 1
+
+        follower = request.follow()
+        try:
+            async for chunk in follower:
+                yield chunk
+        finally:
+            # 调用方提前停止时立即释放订阅，不等垃圾回收
+            await follower.aclose()
+
+    def _forget(self, key, request):
+        if self._inflight.get(key) is request:
+            del self._inflight[key]
+
+    @property
+    def inflight(self) -> int:
+        """当前进行中的上游请求数"""
+        return len(self._inflight)
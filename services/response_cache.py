@@ -0,0 +1,172 @@
+import logging
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+
+from services.sqlite_writer import SQLiteWriter, connect
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """AI响应的精确匹配缓存：内存LRU + 可选的SQLite持久层
+
+    持久层使用 WAL 模式，界面线程只读；写入和删除交给 SQLiteWriter 在后台批量提交。
+    """
+
+    def __init__(self, enabled: bool = False, max_entries: int = 256, ttl: float = 3600,
+                 db_path: str = None, cache_nonzero_temperature: bool = False,
+                 batch_size: int = 100, flush_interval: float = 0.5):
+        self._entries = OrderedDict()  # key -> (写入时间, 响应块列表)
+        self._db = None
+        self._db_path = None
+        self._writer = None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.hits = 0
+        self.misses = 0
+        self.configure(enabled, max_entries, ttl, db_path, cache_nonzero_temperature)
+
+    def configure(self, enabled: bool, max_entries: int = 256, ttl: float = 3600,
+                  db_path: str = None, cache_nonzero_temperature: bool = False):
+        """更新缓存参数，已缓存的内容会被保留"""
+        self.enabled = enabled
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.cache_nonzero_temperature = cache_nonzero_temperature
+        self._evict()
+        if db_path != self._db_path:
+            self._close_db()
+            if db_path:
+                self._open_db(db_path)
+
+    def _open_db(self, db_path: str):
+        try:
+            directory = os.path.dirname(db_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            self._db = connect(db_path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, created REAL NOT NULL, chunks TEXT NOT NULL)"
+            )
+            self._db.commit()
+            self._db_path = db_path
+        except sqlite3.Error as e:
+            logger.error("打开响应缓存数据库失败: %s", e)
+            self._db = None
+            self._db_path = None
+            return
+        self._writer = SQLiteWriter(db_path, self._apply, "ResponseCacheWriter",
+                                    self.batch_size, self.flush_interval)
+
+    def _close_db(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._db is not None:
+            self._db.close()
+        self._db = None
+        self._db_path = None
+        self._writer = None
+
+    def close(self):
+        """写完队列中剩余的内容后关闭持久层"""
+        self._close_db()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待排队的写入全部提交，没有持久层时直接返回"""
+        if self._writer is None:
+            return True
+        return self._writer.flush(timeout)
+
+    @staticmethod
+    def _apply(db, op):
+        if op[0] == "put":
+            db.execute("INSERT OR REPLACE INTO responses (key, created, chunks) VALUES (?, ?, ?)", op[1:])
+        elif op[0] == "delete":
+            db.execute("DELETE FROM responses WHERE key = ?", (op[1],))
+        elif op[0] == "clear":
+            db.execute("DELETE FROM responses")
+
+    @staticmethod
+    def make_key(namespace: str, model: str, messages: list, temperature: float, max_tokens: int) -> str:
+        """根据请求参数生成缓存键，namespace 用于区分不同的服务地址"""
+        payload = json.dumps(
+            [namespace, model, messages, temperature, max_tokens],
+            ensure_ascii=False, sort_keys=True
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def is_cacheable(self, temperature: float) -> bool:
+        """温度大于0时每次回答都可能不同，默认不缓存"""
+        return self.enabled and (temperature == 0 or self.cache_nonzero_temperature)
+
+    def get(self, key: str):
+        """返回缓存的响应块列表，未命中时返回 None"""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            created, chunks = entry
+            if self.ttl <= 0 or now - created < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(chunks)
+            del self._entries[key]
+
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT created, chunks FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                created, chunks = row[0], json.loads(row[1])
+                if self.ttl <= 0 or now - created < self.ttl:
+                    self._store_memory(key, created, chunks)
+                    self.hits += 1
+                    return list(chunks)
+                self._writer.put(("delete", key))
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, chunks: list):
+        """写入一条完整响应"""
+        created = time.time()
+        self._store_memory(key, created, list(chunks))
+        if self._writer is not None:
+            self._writer.put(("put", key, created, json.dumps(chunks, ensure_ascii=False)))
+
+    def _store_memory(self, key, created, chunks):
+        self._entries[key] = (created, chunks)
+        self._entries.move_to_end(key)
+        self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空内存和磁盘中的缓存"""
+        self._entries.clear()
+        if self._writer is not None:
+            self._writer.put(("clear",))
+
+    def stats(self) -> dict:
+        """命中/未命中计数"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+        }
+
+
+_cache = ResponseCache()
+
+
+def get_response_cache() -> ResponseCache:
+    """获取进程级共享的响应缓存"""
+    return _cache
@@ -0,0 +1,78 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+import httpx
+import openai
+
+
+class RetryPolicy:
+    """按错误类型决定是否重试：限流、超时、连接错误和服务端5xx可以重试，其他错误直接抛出
+
+    重试间隔为带上限的指数退避 + 随机抖动，服务端返回 Retry-After 时以服务端为准。
+    """
+
+    RETRYABLE_STATUS = (408, 409, 429)
+
+    def __init__(self, max_retries: int = 2, base_delay: float = 0.5, max_delay: float = 8.0,
+                 max_retry_after: float = 30.0):
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def classify(self, error: Exception):
+        """返回可重试错误的类别名称，不可重试时返回 None"""
+        if isinstance(error, openai.APITimeoutError):
+            return "timeout"
+        if isinstance(error, openai.APIConnectionError):
+            return "connection"
+        if isinstance(error, openai.APIStatusError):
+            status = error.status_code
+            if status == 429:
+                return "rate_limit"
+            if status in self.RETRYABLE_STATUS or status >= 500:
+                return f"status_{status}"
+            return None
+        # 流式读取过程中 httpx 的异常不会被 openai 包装
+        if isinstance(error, httpx.TimeoutException):
+            return "timeout"
+        if isinstance(error, (httpx.NetworkError, httpx.RemoteProtocolError)):
+            return "connection"
+        return None
+
+    def retry_after(self, error: Exception):
+        """从错误响应中解析 Retry-After（秒），没有时返回 None"""
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+        if not headers:
+            return None
+        value = headers.get("retry-after-ms")
+        if value:
+            try:
+                return max(0.0, float(value) / 1000.0)
+            except ValueError:
+                pass
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def get_delay(self, attempt: int, error: Exception):
+        """第 attempt 次重试（从0开始）前的等待秒数，返回 None 表示不应重试"""
+        if attempt >= self.max_retries or self.classify(error) is None:
+            return None
+        retry_after = self.retry_after(error)
+        if retry_after is not None:
+            # 服务端要求等待太久时不再重试，直接把错误交给用户
+            if retry_after > self.max_retry_after:
+                return None
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
@@ -0,0 +1,78 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def connect(db_path: str):
+    """打开 WAL 模式的连接，读和写互不阻塞"""
+    db = sqlite3.connect(db_path)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+class SQLiteWriter:
+    """SQLite 的后台批量写入线程
+
+    写操作放进队列，由后台线程每 flush_interval 秒或攒够 batch_size 条后在一个事务中提交，
+    慢磁盘不会卡住界面线程。apply(db, op) 在写入线程中执行单个操作；一批中任一操作失败时
+    整批回滚并记录日志，线程继续处理后续的写入。
+    """
+
+    def __init__(self, db_path: str, apply, name: str, batch_size: int = 100, flush_interval: float = 0.5):
+        self.db_path = db_path
+        self.apply = apply
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def put(self, op: tuple):
+        """排队一个写操作，立即返回"""
+        self._queue.put(op)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待已排队的写入全部提交"""
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """写完队列中剩余的内容后结束线程"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _run(self):
+        db = connect(self.db_path)
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1] is not None and batch[-1][0] != "flush" and len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                with db:
+                    for op in batch:
+                        if op is not None and op[0] != "flush":
+                            self.apply(db, op)
+            except sqlite3.Error as e:
+                logger.error("%s 写入失败: %s", self.name, e)
+            for op in batch:
+                if op is not None and op[0] == "flush":
+                    op[1].set()
+            if batch[-1] is None:
+                db.close()
+                return
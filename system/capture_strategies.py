@@ -0,0 +1,95 @@
+import logging
+import json
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureStrategies:
+    """按程序记住哪种复制方式有效以及耗时多久，保存在 tmp/capture_strategies.json
+
+    数据格式: {进程名: {复制方式: {"latency": 平均耗时, "successes": 成功次数, "failures": 失败次数}}}
+    只有同一次获取中后面的方式成功了，前面超时的方式才记为失败，没有选中文本不会误伤。
+    path 为 None 时只保存在内存中。
+    """
+
+    def __init__(self, path: str = 'tmp/capture_strategies.json'):
+        self.path = path
+        self.apps = {}
+        self.load()
+
+    def load(self):
+        if not self.path:
+            return
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.apps = json.load(f)
+        except Exception:
+            logger.exception("读取复制方式记录失败")
+            self.apps = {}
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.apps, f, indent=4, ensure_ascii=False)
+        except Exception as e:
+            logger.error("保存复制方式记录失败: %s", e)
+
+    def order(self, process_name: str, default_methods) -> list:
+        """返回该程序应尝试的复制方式顺序
+
+        成功过的方式按 平均耗时 / 成功率 从小到大排在最前，没试过的保持默认顺序，只失败过的放在最后。
+        """
+        stats = self.apps.get(process_name, {})
+        known, untried, failed = [], [], []
+        for index, method in enumerate(default_methods):
+            entry = stats.get(method)
+            if entry is None:
+                untried.append(method)
+            elif entry["successes"] > 0:
+                success_rate = entry["successes"] / (entry["successes"] + entry["failures"])
+                known.append((entry["latency"] / success_rate, index, method))
+            else:
+                failed.append(method)
+        return [method for _, _, method in sorted(known)] + untried + failed
+
+    def latency(self, process_name: str, method: str):
+        """该程序用这种方式复制的平均耗时，没有成功记录时返回 None"""
+        entry = self.apps.get(process_name, {}).get(method)
+        if entry and entry["successes"] > 0:
+            return entry["latency"]
+        return None
+
+    def _entry(self, process_name: str, method: str) -> dict:
+        return self.apps.setdefault(process_name, {}).setdefault(
+            method, {"latency": 0.0, "successes": 0, "failures": 0}
+        )
+
+    def record(self, process_name: str, succeeded: str, latency: float, failed=()):
+        """记录一次成功的获取：succeeded 为成功的方式，failed 为此前超时的方式"""
+        entry = self._entry(process_name, succeeded)
+        if entry["successes"] == 0:
+            entry["latency"] = latency
+        else:
+            entry["latency"] = 0.7 * entry["latency"] + 0.3 * latency
+        entry["successes"] += 1
+        for method in failed:
+            self._entry(process_name, method)["failures"] += 1
+        self.save()
+
+
+_strategies = None
+
+
+def get_capture_strategies() -> CaptureStrategies:
+    """获取共享的复制方式记录，第一次使用时从磁盘加载"""
+    global _strategies
+    if _strategies is None:
+        _strategies = CaptureStrategies()
+    return _strategies
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import sys
+import time
+
+try:
+    import pyperclip
+    import win32clipboard
+except ImportError:
+    # 非 Windows 环境下使用内存剪贴板
+    win32clipboard = None
+
+logger = logging.getLogger(__name__)
+
+
+class Win32Clipboard:
+    """系统剪贴板
+
+    sequence_number 来自 GetClipboardSequenceNumber，剪贴板内容每变化一次就加一，
+    比较序号即可知道复制是否完成，不需要读取内容。
+    """
+
+    def __init__(self, min_poll: float = 0.002, max_poll: float = 0.02):
+        self.min_poll = min_poll
+        self.max_poll = max_poll
+
+    def sequence_number(self) -> int:
+        return win32clipboard.GetClipboardSequenceNumber()
+
+    def get_text(self) -> str:
+        return pyperclip.paste()
+
+    def set_text(self, text: str):
+        pyperclip.copy(text)
+
+    async def wait_changed(self, since: int, timeout: float) -> bool:
+        """等待序号与 since 不同，超时返回 False
+
+        读取序号只是一次系统调用，开始时密集检查以便复制一完成就返回，之后逐渐放慢。
+        """
+        deadline = time.monotonic() + timeout
+        delay = self.min_poll
+        while self.sequence_number() == since:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(self.max_poll, delay * 2)
+        return True
+
+
+class MemoryClipboard:
+    """纯 Python 的内存剪贴板，用于测试和非 Windows 环境；wait_changed 由 set_text 直接唤醒"""
+
+    def __init__(self, text: str = ""):
+        self._text = text
+        self._sequence = 1
+        self._waiters = []
+
+    def sequence_number(self) -> int:
+        return self._sequence
+
+    def get_text(self) -> str:
+        return self._text
+
+    def set_text(self, text: str):
+        self._text = text
+        self._sequence += 1
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def wait_changed(self, since: int, timeout: float) -> bool:
+        if self._sequence != since:
+            return True
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+
+_clipboard = None
+
+
+def get_clipboard():
+    """获取进程级共享的剪贴板：Windows 下为系统剪贴板，其他平台为内存剪贴板"""
+    global _clipboard
+    if _clipboard is None:
+        if sys.platform == "win32" and win32clipboard is not None:
+            _clipboard = Win32Clipboard()
+        else:
+            _clipboard = MemoryClipboard()
+    return _clipboard
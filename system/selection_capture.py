@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import time
+
+from system.capture_strategies import get_capture_strategies
+from system.clipboard import MemoryClipboard, get_clipboard
+from utils.metrics import get_metrics
+
+try:
+    import keyboard
+    import psutil
+    from win32api import PostMessage
+    from win32con import WM_COPY
+    from win32gui import GetForegroundWindow, SetForegroundWindow
+    from win32process import GetWindowThreadProcessId
+except ImportError:
+    # 非 Windows 环境下只能使用 Fake 后端
+    keyboard = None
+
+logger = logging.getLogger(__name__)
+
+# 没有记录的程序按默认顺序尝试；浏览器里 ctrl+c 偶尔不生效，需要更多备选方式
+CHROMIUM_BROWSERS = (
+    'chrome.exe', 'msedge.exe', 'firefox.exe', 'opera.exe',
+    'brave.exe', 'vivaldi.exe', 'edge.exe'
+)
+BROWSER_METHODS = ("ctrl+c", "ctrl+insert", "wm_copy")
+DEFAULT_METHODS = ("ctrl+c", "ctrl+insert")
+# 热键的修饰键还按着时发出的 ctrl+c 会变成 ctrl+alt+c 之类的组合
+MODIFIER_KEYS = ("alt", "ctrl", "shift", "windows")
+
+
+class Win32CopyKeys:
+    """向前台窗口发送复制操作"""
+
+    def foreground(self):
+        """返回 (窗口句柄, 进程名)，没有前台窗口时句柄为 None"""
+        hwnd = GetForegroundWindow()
+        if not hwnd:
+            return None, ""
+        _, pid = GetWindowThreadProcessId(hwnd)
+        return hwnd, psutil.Process(pid).name().lower()
+
+    def focus(self, hwnd):
+        SetForegroundWindow(hwnd)
+
+    def modifiers_pressed(self) -> bool:
+        return any(keyboard.is_pressed(key) for key in MODIFIER_KEYS)
+
+    def send_copy(self, method: str, hwnd):
+        if method == "wm_copy":
+            PostMessage(hwnd, WM_COPY, 0, 0)
+        else:
+            keyboard.press_and_release(method)
+
+
+class FakeCopyKeys:
+    """模拟前台程序：收到复制操作后经过 latency 秒把 selection 写入剪贴板
+
+    methods 为该程序响应的复制方式，其他方式被忽略；release_after 秒后修饰键才松开。
+    """
+
+    def __init__(self, clipboard: MemoryClipboard, selection: str, process_name: str = "notepad.exe",
+                 latency: float = 0.02, methods=("ctrl+c", "ctrl+insert", "wm_copy"),
+                 release_after: float = 0.0):
+        self.clipboard = clipboard
+        self.selection = selection
+        self.process_name = process_name
+        self.latency = latency
+        self.methods = methods
+        self.released_at = time.monotonic() + release_after
+        self.sent = []
+
+    def foreground(self):
+        return 1, self.process_name
+
+    def focus(self, hwnd):
+        pass
+
+    def modifiers_pressed(self) -> bool:
+        return time.monotonic() < self.released_at
+
+    def send_copy(self, method: str, hwnd):
+        self.sent.append(method)
+        if method in self.methods:
+            asyncio.get_running_loop().call_later(self.latency, self.clipboard.set_text, self.selection)
+
+
+class SelectionCapture:
+    """异步获取选中文本
+
+    先等热键的修饰键松开，发送复制操作后等待剪贴板序号变化，内容一变立即读取，不做固定等待。
+    复制方式的顺序和每种方式的等待上限按程序学习（见 CaptureStrategies）：
+    有记录时 timeout = 该程序的平均耗时 × 3，否则为最近一次复制耗时 × 4，均限制在 [min_timeout, max_timeout]。
+    """
+
+    def __init__(self, clipboard=None, keys=None, strategies=None, min_timeout: float = 0.1,
+                 max_timeout: float = 0.5, release_timeout: float = 0.5):
+        self.clipboard = clipboard or get_clipboard()
+        self.keys = keys or Win32CopyKeys()
+        self.strategies = strategies or get_capture_strategies()
+        self.release_timeout = release_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self._copy_latency = min_timeout / 2
+        self._lock = asyncio.Lock()
+
+    def timeout(self, process_name: str = None, method: str = None) -> float:
+        learned = self.strategies.latency(process_name, method) if process_name else None
+        timeout = learned * 3 if learned is not None else self._copy_latency * 4
+        return min(self.max_timeout, max(self.min_timeout, timeout))
+
+    def _learn(self, latency: float):
+        self._copy_latency = 0.7 * self._copy_latency + 0.3 * latency
+
+    async def _wait_modifiers_released(self):
+        deadline = time.monotonic() + self.release_timeout
+        while self.keys.modifiers_pressed():
+            if time.monotonic() >= deadline:
+                logger.debug("等待修饰键松开超时")
+                return
+            await asyncio.sleep(0.01)
+
+    async def capture(self):
+        """复制前台窗口中的选中文本并返回，失败时返回 None；原剪贴板内容会被恢复"""
+        async with self._lock:
+            return await self._capture()
+
+    async def _capture(self):
+        await self._wait_modifiers_released()
+        hwnd, process_name = self.keys.foreground()
+        if not hwnd:
+            logger.warning("无法获取活动窗口")
+            return None
+        logger.debug("当前活动窗口进程：%s", process_name)
+
+        defaults = BROWSER_METHODS if process_name in CHROMIUM_BROWSERS else DEFAULT_METHODS
+        methods = self.strategies.order(process_name, defaults)
+        timed_out = []
+        metrics = get_metrics()
+        old_clipboard = self.clipboard.get_text()
+        original_sequence = self.clipboard.sequence_number()
+        selected_text = None
+        start = time.monotonic()
+        try:
+            self.keys.focus(hwnd)
+            for method in methods:
+                since = self.clipboard.sequence_number()
+                sent_at = time.monotonic()
+                self.keys.send_copy(method, hwnd)
+                if not await self.clipboard.wait_changed(since, self.timeout(process_name, method)):
+                    logger.debug("%s 复制超时 (%s)", method, process_name)
+                    timed_out.append(method)
+                    continue
+                latency = time.monotonic() - sent_at
+                self._learn(latency)
+                selected_text = self.clipboard.get_text()
+                if selected_text and selected_text.strip():
+                    self.strategies.record(process_name, method, latency, failed=timed_out)
+                    metrics.observe("selection_capture_seconds", time.monotonic() - start, method=method)
+                    break
+        except Exception as e:
+            logger.error("复制操作失败: %s", e)
+            selected_text = None
+        finally:
+            # 只有剪贴板确实被改动过才需要恢复
+            if old_clipboard and self.clipboard.sequence_number() != original_sequence:
+                try:
+                    self.clipboard.set_text(old_clipboard)
+                except Exception as e:
+                    logger.warning("恢复剪贴板失败: %s", e)
+
+        if selected_text:
+            selected_text = selected_text.strip()
+            if selected_text:
+                logger.debug("成功获取选中文本: %s...", selected_text[:50])
+                return selected_text
+
+        metrics.increment("selection_capture_failures", process=process_name)
+        logger.warning("未能获取选中文本")
+        return None
@@ -0,0 +1,369 @@
+import asyncio
+import ctypes
+import logging
+import threading
+import time
+from collections import deque
+from ctypes import wintypes
+
+from utils.metrics import get_metrics
+
+try:
+    import keyboard
+    import psutil
+    import pyperclip
+    import pythoncom
+    import win32api
+    from win32api import PostMessage
+    from win32com import client as win32com_client
+    from win32con import WM_CHAR
+    from win32gui import GetForegroundWindow, SetForegroundWindow
+    from win32process import AttachThreadInput, GetWindowThreadProcessId
+except ImportError:
+    # 非 Windows 环境下只能使用 Fake 后端
+    keyboard = None
+
+logger = logging.getLogger(__name__)
+
+INPUT_KEYBOARD = 1
+KEYEVENTF_KEYUP = 0x0002
+KEYEVENTF_UNICODE = 0x0004
+VK_RETURN = 0x0D
+VK_SHIFT = 0x10
+# 换行的输入方式：unicode 作为普通字符输入；shift_enter 按 Shift+Enter；enter 按回车键。
+# 聊天软件和网页表单里回车会直接发送/提交，所以默认不按回车键
+NEWLINE_MODES = ("unicode", "shift_enter", "enter")
+
+
+class MOUSEINPUT(ctypes.Structure):
+    _fields_ = [("dx", wintypes.LONG), ("dy", wintypes.LONG), ("mouseData", wintypes.DWORD),
+                ("dwFlags", wintypes.DWORD), ("time", wintypes.DWORD), ("dwExtraInfo", ctypes.c_size_t)]
+
+
+class KEYBDINPUT(ctypes.Structure):
+    _fields_ = [("wVk", wintypes.WORD), ("wScan", wintypes.WORD), ("dwFlags", wintypes.DWORD),
+                ("time", wintypes.DWORD), ("dwExtraInfo", ctypes.c_size_t)]
+
+
+class HARDWAREINPUT(ctypes.Structure):
+    _fields_ = [("uMsg", wintypes.DWORD), ("wParamL", wintypes.WORD), ("wParamH", wintypes.WORD)]
+
+
+class _INPUTUNION(ctypes.Union):
+    _fields_ = [("mi", MOUSEINPUT), ("ki", KEYBDINPUT), ("hi", HARDWAREINPUT)]
+
+
+class INPUT(ctypes.Structure):
+    _fields_ = [("type", wintypes.DWORD), ("union", _INPUTUNION)]
+
+
+def build_unicode_inputs(text: str, newline: str = "unicode"):
+    """把文本转换为 SendInput 的 INPUT 数组
+
+    每个 UTF-16 码元一次按下和一次抬起（KEYEVENTF_UNICODE），忽略 \\r；
+    换行按 newline 指定的方式输入（见 NEWLINE_MODES）。
+    """
+    events = []
+    for char in text:
+        if char == "\r":
+            continue
+        if char == "\n" and newline != "unicode":
+            if newline == "shift_enter":
+                events.append((VK_SHIFT, 0, 0))
+            events.append((VK_RETURN, 0, 0))
+            events.append((VK_RETURN, 0, KEYEVENTF_KEYUP))
+            if newline == "shift_enter":
+                events.append((VK_SHIFT, 0, KEYEVENTF_KEYUP))
+            continue
+        data = char.encode("utf-16-le")
+        for i in range(0, len(data), 2):
+            unit = int.from_bytes(data[i:i + 2], "little")
+            events.append((0, unit, KEYEVENTF_UNICODE))
+            events.append((0, unit, KEYEVENTF_UNICODE | KEYEVENTF_KEYUP))
+    inputs = (INPUT * len(events))()
+    for item, (vk, scan, flags) in zip(inputs, events):
+        item.type = INPUT_KEYBOARD
+        item.union.ki = KEYBDINPUT(vk, scan, flags, 0, 0)
+    return inputs
+
+
+class InjectionTarget:
+    """一次输出过程中的目标窗口，窗口句柄、进程名等只解析一次"""
+
+    def __init__(self, hwnd, process_name: str):
+        self.hwnd = hwnd
+        self.process_name = process_name
+        self.word = None  # Word 自动化对象，第一次使用时创建
+
+
+class Win32TextInjection:
+    """向目标窗口输入文本
+
+    优先用 SendInput 一次提交整段文本；目标不在前台或 SendInput 被拦截（如目标以管理员身份运行）时
+    退回逐字 PostMessage(WM_CHAR)，最后再用 keyboard 模块。Word 使用自动化接口直接写入。
+    newline 为换行的输入方式，见 NEWLINE_MODES。
+    """
+
+    def __init__(self, newline: str = "unicode"):
+        self.newline = newline
+
+    @property
+    def newline(self) -> str:
+        return self._newline
+
+    @newline.setter
+    def newline(self, mode: str):
+        if mode not in NEWLINE_MODES:
+            logger.warning("未知的换行方式 %s，改为作为字符输入", mode)
+            mode = "unicode"
+        self._newline = mode
+
+    def resolve_target(self) -> InjectionTarget:
+        hwnd = GetForegroundWindow()
+        _, pid = GetWindowThreadProcessId(hwnd)
+        return InjectionTarget(hwnd, psutil.Process(pid).name().lower())
+
+    def worker_started(self):
+        """输入线程开始：Word 自动化对象在该线程创建，需要先初始化 COM"""
+        pythoncom.CoInitialize()
+
+    def worker_stopped(self):
+        pythoncom.CoUninitialize()
+
+    def focus(self, target: InjectionTarget):
+        """附加输入线程后激活目标窗口，这样可以保持输入焦点"""
+        current_thread = win32api.GetCurrentThreadId()
+        target_thread = GetWindowThreadProcessId(target.hwnd)[0]
+        AttachThreadInput(current_thread, target_thread, True)
+        try:
+            SetForegroundWindow(target.hwnd)
+        finally:
+            AttachThreadInput(current_thread, target_thread, False)
+
+    def _type_in_word(self, target: InjectionTarget, text: str) -> bool:
+        try:
+            if target.word is None:
+                target.word = win32com_client.Dispatch("Word.Application")
+            if target.word.Documents.Count > 0:
+                target.word.Selection.TypeText(text)
+                return True
+        except Exception as e:
+            logger.error("使用 Word 自动化接口失败: %s", e)
+            target.word = None
+        return False
+
+    def _send_input(self, target: InjectionTarget, text: str) -> bool:
+        if GetForegroundWindow() != target.hwnd:
+            return False
+        inputs = build_unicode_inputs(text, self.newline)
+        if not len(inputs):
+            return True
+        sent = ctypes.windll.user32.SendInput(len(inputs), inputs, ctypes.sizeof(INPUT))
+        if sent != len(inputs):
+            logger.debug("SendInput 只提交了 %s/%s 个事件", sent, len(inputs))
+            return False
+        return True
+
+    def inject(self, target: InjectionTarget, text: str):
+        if 'winword' in target.process_name and self._type_in_word(target, text):
+            return
+        try:
+            if self._send_input(target, text):
+                return
+        except Exception as e:
+            logger.error("SendInput 方法失败: %s", e)
+        try:
+            for char in text:
+                PostMessage(target.hwnd, WM_CHAR, ord(char), 0)
+            return
+        except Exception as e:
+            logger.error("PostMessage 方法失败: %s", e)
+        try:
+            keyboard.write(text, delay=0.001)
+        except Exception as e:
+            logger.error("所有插入方法均失败: %s", e)
+
+    def paste(self, target: InjectionTarget, text: str):
+        """通过剪贴板一次性粘贴，用于非流式输出"""
+        if 'winword' in target.process_name and self._type_in_word(target, text):
+            return
+        try:
+            old_clipboard = pyperclip.paste()
+            pyperclip.copy(text)
+            keyboard.press_and_release('ctrl+v')
+            time.sleep(0.01)
+            pyperclip.copy(old_clipboard)
+        except Exception as e:
+            logger.error("粘贴失败，改为逐字输入: %s", e)
+            self.inject(target, text)
+
+
+class FakeTextInjection:
+    """记录每次提交的文本，用于测试；delay 模拟目标程序处理一次提交的耗时"""
+
+    def __init__(self, process_name: str = "notepad.exe", delay: float = 0.0):
+        self.process_name = process_name
+        self.delay = delay
+        self.frames = []
+        self.resolved = 0
+
+    @property
+    def text(self) -> str:
+        return "".join(self.frames)
+
+    def resolve_target(self) -> InjectionTarget:
+        self.resolved += 1
+        return InjectionTarget(1, self.process_name)
+
+    def worker_started(self):
+        pass
+
+    def worker_stopped(self):
+        pass
+
+    def focus(self, target: InjectionTarget):
+        pass
+
+    def inject(self, target: InjectionTarget, text: str):
+        if self.delay:
+            time.sleep(self.delay)
+        self.frames.append(text)
+
+    def paste(self, target: InjectionTarget, text: str):
+        self.frames.append(text)
+
+
+class InsertionWorker:
+    """后台线程把流式输出写到光标位置
+
+    网络读取通过 put() 把响应块放进有界队列后立即继续读取，输入线程按目标程序能接受的速度取出：
+    每次把队列中已有的块合并为一帧提交，两帧之间至少间隔 frame_interval 秒。
+    队列满（目标程序远慢于网络）时 put() 挂起等待，形成背压；cancel() 立即丢弃未输入的内容。
+    目标窗口在 start() 时解析并激活一次。
+    """
+
+    def __init__(self, backend, max_chunks: int = 256, frame_interval: float = 0.03):
+        self.backend = backend
+        self.max_chunks = max_chunks
+        self.frame_interval = frame_interval
+        self.target = None
+        self.injected_chars = 0
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._closing = False
+        self._cancelled = False
+        self._space_waiter = None
+        self._loop = None
+        self._done = None
+        self._thread = None
+        self._started_at = None
+
+    def start(self):
+        """在事件循环线程中调用：解析目标窗口并启动输入线程"""
+        self._loop = asyncio.get_running_loop()
+        self._done = self._loop.create_future()
+        self.target = self.backend.resolve_target()
+        self.backend.focus(self.target)
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="InsertionWorker", daemon=True)
+        self._thread.start()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> dict:
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            "queue_depth": self.queue_depth,
+            "injected_chars": self.injected_chars,
+            "chars_per_sec": self.injected_chars / elapsed if elapsed > 0 else 0.0,
+        }
+
+    async def put(self, text: str):
+        """放入一个响应块，队列满时等待输入线程取走"""
+        if not text:
+            return
+        while True:
+            with self._cond:
+                if self._cancelled or self._closing:
+                    return
+                if len(self._queue) < self.max_chunks:
+                    self._queue.append(text)
+                    self._cond.notify()
+                    get_metrics().set_gauge("text_injection_queue_depth", len(self._queue))
+                    return
+                waiter = self._space_waiter = self._loop.create_future()
+            get_metrics().increment("text_injection_backpressure_waits")
+            await waiter
+
+    def _wake_producer(self):
+        """在持有锁时调用：通知等待空位的 put()"""
+        waiter, self._space_waiter = self._space_waiter, None
+        if waiter is not None:
+            self._loop.call_soon_threadsafe(_resolve, waiter)
+
+    def cancel(self):
+        """丢弃尚未输入的内容并结束输入线程，例如用户点击了停止"""
+        with self._cond:
+            self._cancelled = True
+            self._queue.clear()
+            self._wake_producer()
+            self._cond.notify()
+
+    async def close(self):
+        """等队列中的内容全部输入后结束"""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        await self._done
+        stats = self.stats()
+        get_metrics().set_gauge("text_injection_queue_depth", 0)
+        if stats["injected_chars"]:
+            get_metrics().observe("text_injection_chars_per_second", stats["chars_per_sec"])
+            logger.debug("输入完成: %s 字, %.0f 字/秒", stats["injected_chars"], stats["chars_per_sec"])
+
+    def _next_frame(self, last_frame: float):
+        with self._cond:
+            self._cond.wait_for(lambda: self._queue or self._closing or self._cancelled)
+            if self._cancelled or not self._queue:
+                return None
+        # 给更多响应块到达的时间，合并成一帧
+        wait = self.frame_interval - (time.monotonic() - last_frame)
+        with self._cond:
+            if wait > 0 and not self._closing:
+                self._cond.wait_for(lambda: self._cancelled or self._closing, wait)
+            if self._cancelled:
+                return None
+            text = "".join(self._queue)
+            self._queue.clear()
+            self._wake_producer()
+        return text
+
+    def _run(self):
+        metrics = get_metrics()
+        try:
+            self.backend.worker_started()
+            last_frame = 0.0
+            while True:
+                text = self._next_frame(last_frame)
+                if text is None:
+                    break
+                last_frame = time.monotonic()
+                try:
+                    self.backend.inject(self.target, text)
+                except Exception as e:
+                    logger.exception("插入文本到光标失败: %s", e)
+                metrics.observe("text_injection_frame_seconds", time.monotonic() - last_frame)
+                metrics.increment("text_injection_chars", len(text))
+                self.injected_chars += len(text)
+        finally:
+            self.backend.worker_stopped()
+            self._loop.call_soon_threadsafe(_resolve, self._done)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
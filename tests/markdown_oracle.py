@@ -0,0 +1,63 @@
+"""Markdown 过滤的测试数据：样本、原正则实现和分块工具，测试和 benchmarks/bench_markdown.py 共用
+
+markdown_corpus 下每篇样本 NAME.md 的期望输出保存在 NAME.expected.txt，由原正则实现生成。
+"""
+import os
+import re
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "markdown_corpus")
+
+
+def legacy_remove_markdown(text: str) -> str:
+    """原先的多遍正则实现，期望输出由它生成，测试和基准都以它为准"""
+    text = re.sub(r'```[\s\S]*?```', '', text)
+    text = re.sub(r'`[^`]*`', '', text)
+    text = re.sub(r'#{1,6}\s.*\n', '', text)
+    text = re.sub(r'\*\*.*?\*\*', '', text)
+    text = re.sub(r'\*.*?\*', '', text)
+    text = re.sub(r'__.*?__', '', text)
+    text = re.sub(r'_.*?_', '', text)
+    text = re.sub(r'^\s*[-*+]\s', '', text, flags=re.MULTILINE)
+    text = re.sub(r'^\s*\d+\.\s', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\[([^\]]*)\]\([^\)]*\)', r'\1', text)
+    text = re.sub(r'!\[([^\]]*)\]\([^\)]*\)', '', text)
+    text = re.sub(r'^\s*>\s', '', text, flags=re.MULTILINE)
+    text = re.sub(r'^-{3,}$', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\|.*\|', '', text)
+    text = re.sub(r'^\s*[-:|\s]+$', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\n\s*\n', '\n\n', text)
+    return text.strip()
+
+
+def adversarial_inputs(size):
+    return {
+        "大量空行": "\n" * size + "x",
+        "未闭合的 [": "[" * size,
+        "长空白": " " * size + "x\n",
+        "空白行夹列表": "  \n" * (size // 3) + "- x",
+        "下划线路径": ("/usr/lib/python_3/site_packages/my_module " * (size // 40)),
+    }
+
+
+def load_corpus():
+    """返回 {样本名: (原文, 期望输出)}"""
+    corpus = {}
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if not name.endswith(".md"):
+            continue
+        with open(os.path.join(CORPUS_DIR, name), encoding="utf-8", newline="") as f:
+            text = f.read()
+        with open(os.path.join(CORPUS_DIR, name[:-3] + ".expected.txt"), encoding="utf-8", newline="") as f:
+            expected = f.read()
+        corpus[name] = (text, expected)
+    return corpus
+
+
+def random_chunks(text, rnd, max_size=12):
+    chunks = []
+    i = 0
+    while i < len(text):
+        size = rnd.randint(1, max_size)
+        chunks.append(text[i:i + size])
+        i += size
+    return chunks
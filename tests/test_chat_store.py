@@ -0,0 +1,20 @@
+from services.chat_store import ChatStore
+
+
+def test_messages_are_written_in_background_and_paged(tmp_path):
+    store = ChatStore(str(tmp_path / "chat.db"), flush_interval=0.05)
+    conversation_id = store.new_conversation()
+    for i in range(5):
+        store.add_message(conversation_id, "user", f"第 {i} 条")
+    assert store.flush()
+
+    page = store.load_page(conversation_id, limit=3)
+    assert [content for _, _, content in page] == ["第 2 条", "第 3 条", "第 4 条"]
+    older = store.load_page(conversation_id, before_id=page[0][0])
+    assert [content for _, _, content in older] == ["第 0 条", "第 1 条"]
+
+    store.delete_conversation(conversation_id)
+    store.close()
+    reopened = ChatStore(str(tmp_path / "chat.db"))
+    assert reopened.load_page(conversation_id) == []
+    reopened.close()
@@ -0,0 +1,82 @@
+import asyncio
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PySide6.QtWidgets")
+
+from ui.chat_window import ChatWindow  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+class FakeClient:
+    """每次调用 step() 才吐出下一块内容的假服务，记录流是否被关闭"""
+
+    model = None
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = 0
+        self.step = asyncio.Event()
+
+    async def get_response_stream(self, prompt, stream=True, messages=None, temperature=None, max_tokens=None):
+        try:
+            for chunk in self.chunks:
+                await self.step.wait()
+                self.step.clear()
+                yield f"{prompt}:{chunk}"
+        finally:
+            self.closed += 1
+
+    async def release(self):
+        self.step.set()
+        await asyncio.sleep(0.01)
+
+
+async def send(window, text):
+    window.input_text.setPlainText(text)
+    task = asyncio.create_task(window.send_message())
+    await asyncio.sleep(0)
+    return task
+
+
+def test_clear_chat_cancels_the_reply_in_flight(app):
+    async def scenario():
+        client = FakeClient(["一", "二", "三"])
+        window = ChatWindow(client)
+        task = await send(window, "问题")
+        await client.release()
+        assert [m["role"] for m in window.messages] == ["user", "assistant"]
+
+        window.clear_chat()
+        await asyncio.wait([task])
+        await client.release()
+        return window, task, client
+
+    window, task, client = asyncio.run(scenario())
+    assert task.cancelled()
+    assert client.closed == 1
+    assert window.messages == []
+    assert not window._streaming and not window._reply_tasks
+
+
+def test_concurrent_replies_write_to_their_own_messages(app):
+    async def scenario():
+        client = FakeClient(["一", "二"])
+        window = ChatWindow(client)
+        first = await send(window, "甲")
+        second = await send(window, "乙")
+        for _ in range(3):
+            await client.release()
+        await asyncio.gather(first, second)
+        return window
+
+    window = asyncio.run(scenario())
+    replies = [m["content"] for m in window.messages if m["role"] == "assistant"]
+    assert sorted(replies) == ["甲:一甲:二", "乙:一乙:二"]
+    assert not window._streaming
@@ -0,0 +1,47 @@
+import asyncio
+
+from system.clipboard import MemoryClipboard
+
+
+def test_set_text_bumps_sequence_number():
+    clipboard = MemoryClipboard("旧内容")
+    before = clipboard.sequence_number()
+    clipboard.set_text("新内容")
+    assert clipboard.sequence_number() == before + 1
+    assert clipboard.get_text() == "新内容"
+
+
+def test_wait_changed_returns_as_soon_as_text_is_set():
+    async def scenario():
+        clipboard = MemoryClipboard()
+        since = clipboard.sequence_number()
+        asyncio.get_running_loop().call_later(0.01, clipboard.set_text, "复制的文本")
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        changed = await clipboard.wait_changed(since, timeout=1.0)
+        return changed, loop.time() - start
+
+    changed, elapsed = asyncio.run(scenario())
+    assert changed
+    assert elapsed < 0.5
+
+
+def test_wait_changed_times_out_without_change():
+    async def scenario():
+        clipboard = MemoryClipboard()
+        result = await clipboard.wait_changed(clipboard.sequence_number(), timeout=0.02)
+        return result, clipboard._waiters
+
+    changed, waiters = asyncio.run(scenario())
+    assert not changed
+    assert waiters == []
+
+
+def test_wait_changed_is_immediate_when_already_changed():
+    async def scenario():
+        clipboard = MemoryClipboard()
+        since = clipboard.sequence_number()
+        clipboard.set_text("已经变了")
+        return await clipboard.wait_changed(since, timeout=0)
+
+    assert asyncio.run(scenario())
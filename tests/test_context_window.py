@@ -0,0 +1,101 @@
+import asyncio
+
+from services.context_window import ContextWindow
+
+
+def make_history(count):
+    roles = ("user", "assistant")
+    return [{"role": roles[i % 2], "content": f"第 {i} 条消息"} for i in range(count)]
+
+
+def test_reserve_larger_than_budget_keeps_history():
+    window = ContextWindow()
+    history = make_history(81)
+    for reserve in (8000, 16000):
+        messages = window.build("系统提示词", history, reserve=reserve)
+        assert len(messages) - 1 > 2, reserve
+        assert messages[-1] is history[-1]
+
+
+def test_history_and_reserve_stay_within_budget():
+    window = ContextWindow({"default": 200})
+    history = make_history(81)
+    for reserve in (0, 40, 99, 100, 101, 150, 200, 16000):
+        messages = window.build("系统提示词", history, reserve=reserve)
+        used = sum(window.count(message) for message in messages)
+        assert used + min(reserve, 100) <= 200, reserve
+
+
+def test_oversized_reserve_warns_once_per_configure(caplog):
+    window = ContextWindow()
+    history = make_history(10)
+    with caplog.at_level("WARNING", logger="services.context_window"):
+        for _ in range(3):
+            window.build("系统提示词", history, reserve=16000)
+        assert len(caplog.records) == 1
+        window.configure()
+        window.build("系统提示词", history, reserve=16000)
+        assert len(caplog.records) == 2
+
+
+def test_small_reserve_uses_remaining_budget():
+    window = ContextWindow({"default": 100})
+    history = make_history(81)
+    generous = window.build("系统提示词", history)
+    tight = window.build("系统提示词", history, reserve=40)
+    assert 1 < len(tight) < len(generous)
+
+
+class FakeClient:
+    model = None
+
+    def __init__(self):
+        self.prompts = []
+
+    async def stream_chat(self, prompt, stream, messages, temperature, max_tokens):
+        self.prompts.append(prompt)
+        yield "摘要"
+
+
+def test_prepended_history_is_not_summarized():
+    async def scenario():
+        window = ContextWindow({"default": 60}, summary_enabled=True)
+        history = make_history(20)
+        window.build("系统提示词", history)
+        assert window.dropped > 0
+
+        # 还没有摘要时翻页加载了更早的消息
+        older = [{"role": "user", "content": f"更早的第 {i} 条"} for i in range(6)]
+        history[0:0] = older
+        window.history_prepended(len(older))
+
+        client = FakeClient()
+        window.schedule_summary(client, history)
+        await window._summary_task
+        assert client.prompts and "更早的" not in client.prompts[0]
+        assert "第 0 条消息" in client.prompts[0]
+        assert len(older) < window.summarized <= window.dropped
+
+    asyncio.run(scenario())
+
+
+def test_toggling_summary_keeps_prepended_history():
+    async def scenario():
+        window = ContextWindow({"default": 60}, summary_enabled=True)
+        history = make_history(20)
+        older = [{"role": "user", "content": f"更早的第 {i} 条"} for i in range(6)]
+        history[0:0] = older
+        window.history_prepended(len(older))
+
+        # 关闭再打开摘要不应忘记哪些消息是翻页加载的
+        window.configure({"default": 60}, summary_enabled=False)
+        window.configure({"default": 60}, summary_enabled=True)
+        assert window.prepended == len(older)
+
+        window.build("系统提示词", history)
+        client = FakeClient()
+        window.schedule_summary(client, history)
+        await window._summary_task
+        assert client.prompts and "更早的" not in client.prompts[0]
+
+    asyncio.run(scenario())
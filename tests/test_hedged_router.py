@@ -0,0 +1,104 @@
+import asyncio
+
+from services.hedged_client import HedgedClient, _Racer
+from services.provider_router import ProviderRouter
+
+
+class FakeProvider:
+    """按预设延迟吐出固定内容的假服务，记录每种入口被调用的次数"""
+
+    def __init__(self, name, delay=0.0, error=None):
+        self.name = name
+        self.base_url = f"https://{name}.invalid/v1"
+        self.delay = delay
+        self.error = error
+        self.calls = {"stream_chat": 0, "stream_direct": 0}
+
+    async def _stream(self):
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        yield f"{self.name}-1"
+        yield f"{self.name}-2"
+
+    def stream_chat(self, *args):
+        self.calls["stream_chat"] += 1
+        return self._stream()
+
+    def stream_direct(self, *args):
+        self.calls["stream_direct"] += 1
+        return self._stream()
+
+
+async def collect(client):
+    return [text async for text in client.stream_chat("问题")]
+
+
+def make_router(*providers):
+    # 名称带上测试名，避免进程内共享的健康状况互相影响
+    return ProviderRouter([(f"hedge-test-{p.name}", p) for p in providers], ttft_timeout=5.0)
+
+
+def test_hedge_legs_go_through_router_to_different_providers():
+    slow = FakeProvider("slow-a", delay=1.0)
+    fast = FakeProvider("fast-b", delay=0.0)
+    hedged = HedgedClient(make_router(slow, fast), default_delay=0.05)
+
+    assert asyncio.run(collect(hedged)) == ["fast-b-1", "fast-b-2"]
+    assert slow.calls == {"stream_chat": 0, "stream_direct": 1}
+    assert fast.calls == {"stream_chat": 0, "stream_direct": 1}
+
+
+def test_hedged_router_still_fails_over():
+    broken = FakeProvider("broken-c", error=ConnectionError("down"))
+    healthy = FakeProvider("healthy-d")
+    hedged = HedgedClient(make_router(broken, healthy), default_delay=5.0)
+
+    assert asyncio.run(collect(hedged)) == ["healthy-d-1", "healthy-d-2"]
+    assert broken.calls["stream_direct"] == 1
+    assert healthy.calls["stream_direct"] == 1
+
+
+def test_plain_client_without_stream_direct_uses_stream_chat():
+    class ChatOnly:
+        base_url = "https://chat-only.invalid/v1"
+
+        async def stream_chat(self, *args):
+            yield "ok"
+
+    assert asyncio.run(collect(HedgedClient(ChatOnly(), default_delay=5.0))) == ["ok"]
+
+
+async def slow_to_cancel():
+    try:
+        await asyncio.sleep(10)
+    except asyncio.CancelledError:
+        # 模拟关闭连接需要一点时间
+        await asyncio.sleep(0.5)
+        raise
+    yield "不会到达"
+
+
+def test_racer_cancel_does_not_swallow_callers_cancellation():
+    async def scenario():
+        racer = _Racer("hedge", slow_to_cancel())
+        await asyncio.sleep(0)
+        task = asyncio.create_task(racer.cancel())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.wait([task])
+        return task.cancelled()
+
+    assert asyncio.run(scenario())
+
+
+def test_racer_counts_wasted_bytes():
+    async def answer():
+        yield "你好"
+
+    async def scenario():
+        racer = _Racer("hedge", answer())
+        await asyncio.sleep(0)
+        return await racer.cancel()
+
+    assert asyncio.run(scenario()) == len("你好".encode("utf-8"))
@@ -0,0 +1,87 @@
+import asyncio
+
+import httpx
+
+from services.http_pool import HttpClientPool
+from utils.metrics import get_metrics
+
+
+def test_configure_closes_idle_clients_immediately():
+    async def scenario():
+        pool = HttpClientPool()
+        client = pool.get_client("https://example.invalid/v1")
+        pool.configure(max_connections=pool.max_connections + 1)
+        await asyncio.sleep(0)
+        assert client.is_closed
+        assert pool.get_client("https://example.invalid/v1") is not client
+        await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_retired_client_closes_after_last_lease():
+    async def scenario():
+        pool = HttpClientPool()
+        client = pool.get_client("https://example.invalid/v1")
+        async with pool.lease(client):
+            pool.configure(max_connections=pool.max_connections + 1)
+            await asyncio.sleep(0)
+            assert not client.is_closed
+        await asyncio.sleep(0)
+        assert client.is_closed
+        assert not pool._retired
+        await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_unchanged_settings_keep_clients():
+    async def scenario():
+        pool = HttpClientPool()
+        client = pool.get_client("https://example.invalid/v1")
+        pool.configure(max_connections=pool.max_connections)
+        assert pool.get_client("https://example.invalid/v1") is client
+        await pool.close()
+        assert client.is_closed
+
+    asyncio.run(scenario())
+
+
+def test_warm_up_sends_one_head_request_per_client():
+    requests = []
+
+    async def handler(request):
+        requests.append(request.method)
+        await asyncio.sleep(0.01)
+        return httpx.Response(404)
+
+    async def scenario():
+        pool = HttpClientPool()
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        url = "https://warmup.invalid/v1"
+        # 热键连按时同一客户端只预热一次
+        first = pool.warm_up(client, url)
+        second = pool.warm_up(client, url)
+        assert first is second
+        await first
+        await client.aclose()
+        return get_metrics().samples("http_warmup_seconds", url=url)
+
+    samples = asyncio.run(scenario())
+    assert requests == ["HEAD"]
+    assert len(samples) == 1
+
+
+def test_failed_warm_up_is_logged_not_raised(caplog):
+    async def handler(request):
+        raise httpx.ConnectError("拒绝连接", request=request)
+
+    async def scenario():
+        pool = HttpClientPool()
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        await pool.warm_up(client, "https://refused.invalid/v1")
+        await client.aclose()
+        return pool._warming
+
+    assert asyncio.run(scenario()) == {}
+    assert "预热连接失败" in caplog.text
@@ -0,0 +1,28 @@
+import json
+import os
+import time
+
+from utils.keyword_usage import KeywordUsage
+
+
+def test_record_does_not_write_until_flush(tmp_path):
+    path = os.path.join(tmp_path, "usage.json")
+    usage = KeywordUsage(path, save_delay=60)
+    usage.record("翻译")
+    usage.record("翻译")
+    assert not os.path.exists(path)
+
+    usage.flush()
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == {"翻译": 2}
+    assert KeywordUsage(path).most_used(["总结", "翻译"]) == "翻译"
+
+
+def test_record_is_saved_in_background(tmp_path):
+    path = os.path.join(tmp_path, "usage.json")
+    usage = KeywordUsage(path, save_delay=0.05)
+    usage.record("总结")
+    deadline = time.monotonic() + 5
+    while not KeywordUsage(path).counts and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert KeywordUsage(path).counts == {"总结": 1}
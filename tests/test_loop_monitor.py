@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+from utils.loop_monitor import LoopMonitor
+from utils.metrics import get_metrics
+
+
+def blocking_call(seconds):
+    time.sleep(seconds)
+
+
+def test_stall_is_logged_with_blocking_stack(caplog):
+    async def scenario():
+        monitor = LoopMonitor(interval=0.05, stall_threshold=0.1)
+        monitor.start()
+        await asyncio.sleep(0.1)
+        blocking_call(0.4)
+        await asyncio.sleep(0.15)
+        monitor.stop()
+
+    stalls = get_metrics().counter("event_loop_stalls")
+    with caplog.at_level("WARNING", logger="utils.loop_monitor"):
+        asyncio.run(scenario())
+
+    assert get_metrics().counter("event_loop_stalls") == stalls + 1
+    records = [record for record in caplog.records if "事件循环阻塞" in record.getMessage()]
+    assert len(records) == 1
+    assert "blocking_call" in records[0].getMessage()
+
+
+def test_hang_is_reported_before_the_loop_recovers(caplog):
+    async def scenario():
+        monitor = LoopMonitor(interval=0.05, stall_threshold=0.1, hang_threshold=0.3)
+        monitor.start()
+        await asyncio.sleep(0.1)
+        blocking_call(0.6)
+        monitor.stop()
+
+    hangs = get_metrics().counter("event_loop_hangs")
+    with caplog.at_level("ERROR", logger="utils.loop_monitor"):
+        asyncio.run(scenario())
+
+    assert get_metrics().counter("event_loop_hangs") == hangs + 1
+    assert "仍未恢复" in caplog.text and "blocking_call" in caplog.text
@@ -0,0 +1,65 @@
+import random
+
+from tests.markdown_oracle import adversarial_inputs, legacy_remove_markdown, load_corpus, random_chunks
+from utils.markdown_stripper import MarkdownStripper
+from utils.utils import remove_markdown
+
+# 覆盖每条规则的字符，随机组合后与原正则实现逐字节比较
+ALPHABET = ["`", "```", "#", "# ", "*", "**", "_", "__", "-", "- ", "1. ", ">", "> ", "[", "]", "(", ")",
+            "![", "|", ":", " ", "\t", "\n", "\n\n", "a", "文字"]
+
+
+def stream(text, chunks):
+    stripper = MarkdownStripper()
+    return "".join(stripper.feed(chunk) for chunk in chunks) + stripper.flush()
+
+
+def test_golden_corpus():
+    rnd = random.Random(0)
+    for name, (text, expected) in load_corpus().items():
+        assert remove_markdown(text) == expected, name
+        assert stream(text, random_chunks(text, rnd)) == expected, name
+
+
+def test_matches_legacy_regexes_on_random_input():
+    rnd = random.Random(1)
+    for _ in range(3000):
+        text = "".join(rnd.choice(ALPHABET) for _ in range(rnd.randint(0, 40)))
+        expected = legacy_remove_markdown(text)
+        assert remove_markdown(text) == expected, repr(text)
+        assert stream(text, random_chunks(text, rnd, 5)) == expected, repr(text)
+
+
+def test_adversarial_inputs_match_legacy():
+    # 原实现在这些输入上是平方级的，长度取小一些；耗时对比见 benchmarks/bench_markdown.py
+    rnd = random.Random(2)
+    for name, text in adversarial_inputs(2000).items():
+        expected = legacy_remove_markdown(text)
+        assert remove_markdown(text) == expected, name
+        assert stream(text, random_chunks(text, rnd, 4)) == expected, name
+
+
+def scanned_length(text, chunk_size=4):
+    """按小块流式处理 text，返回各扫描器 _process 收到的缓冲区总长度"""
+    stripper = MarkdownStripper()
+    total = 0
+    for stage in stripper._stages:
+        def counting(buf, final, process=stage._process):
+            nonlocal total
+            total += len(buf)
+            return process(buf, final)
+        stage._process = counting
+    out = [stripper.feed(text[i:i + chunk_size]) for i in range(0, len(text), chunk_size)]
+    out.append(stripper.flush())
+    assert "".join(out) == remove_markdown(text)
+    return total
+
+
+def test_long_held_suffix_is_not_rescanned():
+    # 未闭合的标记、长空白等保留的后缀如果每块都重新扫描一遍，扫描量会随长度平方增长
+    size = 20_000
+    for text in ("**" + "a" * size, "__" + "a *" * (size // 3), "`" + "a\n" * (size // 2),
+                 "```" + "a`\n" * (size // 3), "[" + "a\n" * (size // 2), "[x](" + "a" * size,
+                 "# " + "a" * size, "#" * size, "|" + "a" * size, "-" * size,
+                 "\n" * size + "x", " " * size + "x", "  \n" * (size // 3) + "- x", "1" * size + ". x"):
+        assert scanned_length(text) < 40 * len(text), text[:10]
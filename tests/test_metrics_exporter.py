@@ -0,0 +1,64 @@
+import asyncio
+import socket
+import urllib.request
+
+import pytest
+
+pytest.importorskip("psutil")
+
+from services.rate_limiter import get_rate_limiter  # noqa: E402
+from utils.metrics import get_metrics  # noqa: E402
+from utils.metrics_exporter import MetricsExporter, render_prometheus  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_counters_and_histograms_use_prometheus_format():
+    metrics = get_metrics()
+    metrics.increment("export_test_requests", 2, provider="a")
+    metrics.observe("export_test_seconds", 0.2, provider="a")
+
+    text = render_prometheus()
+    assert "# TYPE ai_assistant_export_test_requests_total counter" in text
+    assert 'ai_assistant_export_test_requests_total{provider="a"} 2' in text
+    assert "# TYPE ai_assistant_export_test_seconds histogram" in text
+    assert 'ai_assistant_export_test_seconds_bucket{le="+Inf",provider="a"} 1' in text
+    assert 'ai_assistant_export_test_seconds_count{provider="a"} 1' in text
+
+
+def test_rate_limiters_are_read_on_the_event_loop():
+    async def scenario():
+        limiter = get_rate_limiter("export-test", max_concurrent=1)
+        await limiter.acquire()
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        # 导出线程通过事件循环读取限流器
+        text = await asyncio.to_thread(render_prometheus, asyncio.get_running_loop())
+        limiter.release()
+        await waiting
+        limiter.release()
+        return text
+
+    text = asyncio.run(scenario())
+    assert 'ai_assistant_rate_limiter_active{provider="export-test"} 1' in text
+    assert 'ai_assistant_rate_limiter_queue_depth{provider="export-test"} 1' in text
+
+
+def test_http_endpoint_and_textfile(tmp_path):
+    exporter = MetricsExporter()
+    port = free_port()
+    path = tmp_path / "textfile" / "ai_assistant.prom"
+    exporter.configure(port=port, textfile_path=str(path), interval=60)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            body = response.read().decode("utf-8")
+        assert response.headers["Content-Type"].startswith("text/plain")
+        assert "ai_assistant_process_resident_memory_bytes" in body
+    finally:
+        exporter.close()
+    assert "ai_assistant_process_threads" in path.read_text(encoding="utf-8")
+    assert not list(path.parent.glob("*.tmp"))
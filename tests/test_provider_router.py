@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from services.provider_router import ProviderRouter, get_provider_health
+
+
+class FakeClient:
+    """按预设延迟和错误吐出内容的假服务"""
+
+    def __init__(self, name, delay=0.0, error=None, fail_after_first=False):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.fail_after_first = fail_after_first
+        self.calls = 0
+
+    async def stream_chat(self, *args):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None and not self.fail_after_first:
+            raise self.error
+        yield f"{self.name}-1"
+        if self.fail_after_first:
+            raise self.error
+        yield f"{self.name}-2"
+
+
+def collect(router):
+    async def scenario():
+        return [text async for text in router.stream_chat("问题")]
+    return asyncio.run(scenario())
+
+
+def test_error_fails_over_and_cools_down_the_broken_provider():
+    # 名称带上测试名，避免进程内共享的健康状况互相影响
+    broken = FakeClient("router-broken", error=ConnectionError("down"))
+    healthy = FakeClient("router-healthy")
+    router = ProviderRouter([("router-broken", broken), ("router-healthy", healthy)], cooldown=60.0)
+
+    assert collect(router) == ["router-healthy-1", "router-healthy-2"]
+    assert not get_provider_health("router-broken").available
+    # 冷却中的服务排到最后，下一次直接使用健康的服务
+    assert collect(router) == ["router-healthy-1", "router-healthy-2"]
+    assert (broken.calls, healthy.calls) == (1, 2)
+
+
+def test_slow_first_token_fails_over():
+    slow = FakeClient("router-slow", delay=1.0)
+    fast = FakeClient("router-fast")
+    router = ProviderRouter([("router-slow", slow), ("router-fast", fast)], ttft_timeout=0.05)
+
+    assert collect(router) == ["router-fast-1", "router-fast-2"]
+    assert get_provider_health("router-slow").failures == 1
+
+
+def test_error_after_output_is_not_retried_elsewhere():
+    flaky = FakeClient("router-flaky", error=ConnectionError("reset"), fail_after_first=True)
+    spare = FakeClient("router-spare")
+    router = ProviderRouter([("router-flaky", flaky), ("router-spare", spare)])
+
+    with pytest.raises(ConnectionError):
+        collect(router)
+    assert spare.calls == 0
+
+
+def test_all_providers_failing_raises_last_error():
+    first = FakeClient("router-down-a", error=ConnectionError("a"))
+    second = FakeClient("router-down-b", error=ConnectionError("b"))
+    router = ProviderRouter([("router-down-a", first), ("router-down-b", second)])
+
+    with pytest.raises(ConnectionError, match="b"):
+        collect(router)
+
+
+def test_latency_strategy_prefers_lowest_median():
+    for name, ttft in (("router-lat-a", 0.5), ("router-lat-b", 0.1)):
+        for _ in range(3):
+            get_provider_health(name).record_success(ttft)
+    a, b = FakeClient("router-lat-a"), FakeClient("router-lat-b")
+    router = ProviderRouter([("router-lat-a", a), ("router-lat-b", b)], strategy="latency")
+
+    assert collect(router) == ["router-lat-b-1", "router-lat-b-2"]
+    assert a.calls == 0
@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+from services.rate_limiter import ProviderLimiter
+
+
+def test_waiters_are_served_in_arrival_order():
+    async def scenario():
+        limiter = ProviderLimiter("fifo", max_concurrent=1)
+        order = []
+
+        async def request(index):
+            async with limiter.slot():
+                order.append(index)
+                await asyncio.sleep(0.01)
+
+        tasks = []
+        for index in range(5):
+            tasks.append(asyncio.create_task(request(index)))
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        return order, limiter.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == [0, 1, 2, 3, 4]
+    assert stats["acquired"] == 5 and stats["active"] == 0 and stats["queue_depth"] == 0
+
+
+def test_large_request_at_head_is_not_overtaken():
+    async def scenario():
+        # 每分钟 600 令牌，即每 0.1 秒补充 1 个
+        limiter = ProviderLimiter("head", tokens_per_minute=600)
+        await limiter.acquire(600)
+        order = []
+
+        async def request(name, tokens):
+            await limiter.acquire(tokens)
+            order.append(name)
+
+        big = asyncio.create_task(request("big", 3))
+        await asyncio.sleep(0)
+        small = asyncio.create_task(request("small", 1))
+        await asyncio.gather(big, small)
+        return order
+
+    # 小请求先有足够的令牌，但要排在队首的大请求之后
+    assert asyncio.run(scenario()) == ["big", "small"]
+
+
+def test_cancelled_waiter_does_not_block_the_queue():
+    async def scenario():
+        limiter = ProviderLimiter("cancel", max_concurrent=1)
+        await limiter.acquire()
+        cancelled = asyncio.create_task(limiter.acquire())
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.wait_for(waiting, 1.0)
+        return limiter.active, limiter.queue_depth
+
+    assert asyncio.run(scenario()) == (1, 0)
+
+
+def test_unused_tokens_are_given_back():
+    async def scenario():
+        limiter = ProviderLimiter("refund", tokens_per_minute=100)
+        async with limiter.slot(80) as lease:
+            lease.used_tokens = 20
+        # 多扣的 60 令牌已经退还，再申请 70 不需要等待
+        start = time.monotonic()
+        await limiter.acquire(70)
+        return time.monotonic() - start
+
+    assert asyncio.run(scenario()) < 0.05
@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+QtCore = pytest.importorskip("PySide6.QtCore")
+
+from ui.render_scheduler import RenderScheduler  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+def run_events(app, seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.005)
+
+
+def test_chunks_within_a_frame_are_written_once(app):
+    writes, frames = [], []
+    scheduler = RenderScheduler(lambda key, text: writes.append((key, text)), fps=10,
+                                on_frame=frames.append)
+    for chunk in ["你", "好", "，", "世界"]:
+        scheduler.append("a", chunk)
+    scheduler.append("b", "另一条")
+    scheduler.append("b", "")
+    assert writes == []
+
+    run_events(app, 0.2)
+    assert writes == [("a", "你好，世界"), ("b", "另一条")]
+    assert frames == [["a", "b"]]
+    assert scheduler.frames == 1
+
+
+def test_frames_are_spaced_by_the_interval(app):
+    stamps = []
+    scheduler = RenderScheduler(lambda key, text: stamps.append(time.monotonic()), fps=10)
+    scheduler.append("a", "1")
+    run_events(app, 0.05)
+    scheduler.append("a", "2")
+    run_events(app, 0.2)
+    assert len(stamps) == 2
+    assert stamps[1] - stamps[0] >= 0.09
+
+
+def test_flush_writes_now_and_clear_drops_pending(app):
+    writes = []
+    scheduler = RenderScheduler(lambda key, text: writes.append(text), fps=10)
+    scheduler.append("a", "立即")
+    scheduler.flush()
+    assert writes == ["立即"]
+
+    scheduler.append("a", "丢弃")
+    scheduler.clear()
+    run_events(app, 0.2)
+    assert writes == ["立即"]
@@ -0,0 +1,112 @@
+import asyncio
+
+from services.request_coalescer import RequestCoalescer
+
+
+class FakeSource:
+    """按顺序吐出响应块的假上游，每块之间等待一个事件，记录被打开和关闭的次数"""
+
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+        self.opened = 0
+        self.closed = False
+        self.step = asyncio.Event()
+
+    def __call__(self):
+        self.opened += 1
+        return self._stream()
+
+    async def _stream(self):
+        try:
+            for chunk in self.chunks:
+                await self.step.wait()
+                self.step.clear()
+                yield chunk
+            await self.step.wait()
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.closed = True
+
+    async def release(self, count):
+        for _ in range(count):
+            self.step.set()
+            await asyncio.sleep(0.01)
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+def test_concurrent_callers_share_one_upstream_request():
+    async def scenario():
+        coalescer = RequestCoalescer()
+        source = FakeSource(["你", "好", "！"])
+        first = asyncio.create_task(collect(coalescer.stream("key", source)))
+        second = asyncio.create_task(collect(coalescer.stream("key", source)))
+        await source.release(1)
+        # 已经收到第一块后才加入的调用方先回放已有的响应块
+        late = asyncio.create_task(collect(coalescer.stream("key", source)))
+        await source.release(3)
+        results = await asyncio.gather(first, second, late)
+        return coalescer, source, results
+
+    coalescer, source, results = asyncio.run(scenario())
+    assert results == [["你", "好", "！"]] * 3
+    assert source.opened == 1
+    assert (coalescer.started, coalescer.joined) == (1, 2)
+    assert coalescer.inflight == 0
+
+
+def test_upstream_error_reaches_every_subscriber():
+    async def scenario():
+        coalescer = RequestCoalescer()
+        source = FakeSource(["部分"], error=ConnectionError("断开"))
+        received = [[], []]
+
+        async def subscriber(index):
+            async for chunk in coalescer.stream("key", source):
+                received[index].append(chunk)
+
+        tasks = [asyncio.create_task(subscriber(i)) for i in range(2)]
+        await source.release(2)
+        return received, await asyncio.gather(*tasks, return_exceptions=True)
+
+    received, errors = asyncio.run(scenario())
+    assert received == [["部分"], ["部分"]]
+    assert [type(error) for error in errors] == [ConnectionError, ConnectionError]
+
+
+def test_upstream_is_cancelled_only_after_last_subscriber_leaves():
+    async def scenario():
+        coalescer = RequestCoalescer()
+        source = FakeSource(["一", "二", "三"])
+        streams = [coalescer.stream("key", source) for _ in range(2)]
+        firsts = [asyncio.create_task(stream.__anext__()) for stream in streams]
+        await source.release(1)
+        await asyncio.gather(*firsts)
+
+        await streams[0].aclose()
+        await asyncio.sleep(0.01)
+        still_open = not source.closed
+        await streams[1].aclose()
+        await asyncio.sleep(0.01)
+        return still_open, source.closed, coalescer.inflight
+
+    assert asyncio.run(scenario()) == (True, True, 0)
+
+
+def test_new_request_starts_after_previous_one_finished():
+    async def scenario():
+        coalescer = RequestCoalescer()
+        source = FakeSource(["完"])
+        task = asyncio.create_task(collect(coalescer.stream("key", source)))
+        await source.release(2)
+        await task
+        task = asyncio.create_task(collect(coalescer.stream("key", source)))
+        await source.release(2)
+        await task
+        return source.opened, coalescer.started
+
+    assert asyncio.run(scenario()) == (2, 2)
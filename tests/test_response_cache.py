@@ -0,0 +1,35 @@
+import os
+
+from services.response_cache import ResponseCache
+
+
+def test_put_is_persisted_by_background_writer(tmp_path):
+    db_path = os.path.join(tmp_path, "cache.db")
+    cache = ResponseCache(enabled=True, db_path=db_path)
+    cache.put("key", ["你好", "世界"])
+    assert cache.flush()
+    cache.close()
+
+    reopened = ResponseCache(enabled=True, db_path=db_path)
+    assert reopened.get("key") == ["你好", "世界"]
+    reopened.close()
+
+
+def test_clear_and_expired_entries_are_removed_from_disk(tmp_path):
+    db_path = os.path.join(tmp_path, "cache.db")
+    cache = ResponseCache(enabled=True, db_path=db_path)
+    cache.put("old", ["a"])
+    cache.put("new", ["b"])
+    cache.flush()
+    cache.clear()
+    cache.flush()
+    assert cache._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 0
+
+    cache.put("stale", ["c"])
+    cache.flush()
+    cache._entries.clear()
+    cache.ttl = 1e-9
+    assert cache.get("stale") is None
+    cache.flush()
+    assert cache._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 0
+    cache.close()
@@ -0,0 +1,52 @@
+import time
+from email.utils import formatdate
+
+import httpx
+import pytest
+
+openai = pytest.importorskip("openai")
+
+from services.retry import RetryPolicy  # noqa: E402
+
+
+def status_error(status, headers=None):
+    request = httpx.Request("POST", "https://api.invalid/v1/chat/completions")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    error_class = openai.RateLimitError if status == 429 else openai.APIStatusError
+    return error_class("错误", response=response, body=None)
+
+
+def test_retry_after_seconds_take_precedence_over_backoff():
+    policy = RetryPolicy(base_delay=0.5)
+    delay = policy.get_delay(0, status_error(429, {"retry-after": "3"}))
+    assert 3.0 <= delay <= 3.5
+
+
+def test_retry_after_ms_and_http_date_are_understood():
+    policy = RetryPolicy()
+    assert policy.retry_after(status_error(429, {"retry-after-ms": "1500", "retry-after": "9"})) == 1.5
+    date = formatdate(time.time() + 10, usegmt=True)
+    assert 8.0 <= policy.retry_after(status_error(503, {"retry-after": date})) <= 10.0
+
+
+def test_too_long_retry_after_is_not_retried():
+    policy = RetryPolicy(max_retry_after=30.0)
+    assert policy.get_delay(0, status_error(429, {"retry-after": "120"})) is None
+
+
+def test_backoff_is_capped_and_limited_by_attempts():
+    policy = RetryPolicy(max_retries=3, base_delay=1.0, max_delay=2.0)
+    error = status_error(502)
+    for attempt in range(3):
+        assert 0.0 <= policy.get_delay(attempt, error) <= min(2.0, 2 ** attempt)
+    assert policy.get_delay(3, error) is None
+
+
+def test_only_transient_errors_are_retried():
+    policy = RetryPolicy()
+    assert policy.classify(status_error(429)) == "rate_limit"
+    assert policy.classify(status_error(500)) == "status_500"
+    assert policy.classify(httpx.ConnectError("拒绝连接")) == "connection"
+    assert policy.classify(httpx.ReadTimeout("超时")) == "timeout"
+    assert policy.get_delay(0, status_error(400)) is None
+    assert policy.get_delay(0, ValueError("参数错误")) is None
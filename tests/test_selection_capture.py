@@ -0,0 +1,80 @@
+import asyncio
+
+from system.capture_strategies import CaptureStrategies
+from system.clipboard import MemoryClipboard
+from system.selection_capture import FakeCopyKeys, SelectionCapture
+
+
+def make_capture(selection="选中的文本", old_text="原剪贴板", **keys_options):
+    clipboard = MemoryClipboard(old_text)
+    keys = FakeCopyKeys(clipboard, selection, **keys_options)
+    capture = SelectionCapture(clipboard=clipboard, keys=keys, strategies=CaptureStrategies(path=None),
+                               min_timeout=0.05, max_timeout=0.1, release_timeout=0.5)
+    return capture, clipboard, keys
+
+
+def test_capture_returns_selection_and_restores_clipboard():
+    capture, clipboard, keys = make_capture()
+    assert asyncio.run(capture.capture()) == "选中的文本"
+    assert keys.sent == ["ctrl+c"]
+    assert clipboard.get_text() == "原剪贴板"
+
+
+def test_capture_waits_for_hotkey_modifiers_to_be_released():
+    capture, _, keys = make_capture(release_after=0.05)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        text = await capture.capture()
+        return text, loop.time() - start
+
+    text, elapsed = asyncio.run(scenario())
+    assert text == "选中的文本"
+    assert elapsed >= 0.05
+
+
+def test_capture_times_out_when_nothing_is_copied():
+    capture, clipboard, keys = make_capture(methods=())
+    before = clipboard.sequence_number()
+    assert asyncio.run(capture.capture()) is None
+    assert keys.sent == ["ctrl+c", "ctrl+insert"]
+    # 剪贴板没有被改动过，不需要恢复
+    assert clipboard.sequence_number() == before
+
+
+def test_capture_learns_the_method_that_works_for_the_app():
+    capture, _, keys = make_capture(methods=("ctrl+insert",))
+
+    async def scenario():
+        first = await capture.capture()
+        keys.sent.clear()
+        second = await capture.capture()
+        return first, second
+
+    assert asyncio.run(scenario()) == ("选中的文本", "选中的文本")
+    assert keys.sent == ["ctrl+insert"]
+    assert capture.strategies.order("notepad.exe", ("ctrl+c", "ctrl+insert")) == ["ctrl+insert", "ctrl+c"]
+
+
+def test_cancelled_capture_releases_lock_for_next_capture():
+    capture, clipboard, keys = make_capture(latency=0.3)
+    capture.max_timeout = 1.0
+    capture._copy_latency = 1.0  # 放宽等待上限，保证取消发生在等待剪贴板变化期间
+
+    async def scenario():
+        task = asyncio.ensure_future(capture.capture())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        state = (task.cancelled(), clipboard.get_text())
+        keys.latency = 0.01
+        return state, await asyncio.wait_for(capture.capture(), 0.25)
+
+    (cancelled, clipboard_text), text = asyncio.run(scenario())
+    assert cancelled
+    assert clipboard_text == "原剪贴板"
+    assert text == "选中的文本"
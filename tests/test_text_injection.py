@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+from system.text_injection import (
+    KEYEVENTF_KEYUP, KEYEVENTF_UNICODE, VK_RETURN, VK_SHIFT,
+    FakeTextInjection, InsertionWorker, build_unicode_inputs,
+)
+
+
+def events(text, newline="unicode"):
+    return [(item.union.ki.wVk, item.union.ki.wScan, item.union.ki.dwFlags)
+            for item in build_unicode_inputs(text, newline)]
+
+
+def test_newline_is_typed_as_a_character_by_default():
+    assert events("a\r\nb") == [
+        (0, ord("a"), KEYEVENTF_UNICODE), (0, ord("a"), KEYEVENTF_UNICODE | KEYEVENTF_KEYUP),
+        (0, 0x0A, KEYEVENTF_UNICODE), (0, 0x0A, KEYEVENTF_UNICODE | KEYEVENTF_KEYUP),
+        (0, ord("b"), KEYEVENTF_UNICODE), (0, ord("b"), KEYEVENTF_UNICODE | KEYEVENTF_KEYUP),
+    ]
+
+
+def test_enter_keys_are_opt_in():
+    assert events("\n", "shift_enter") == [
+        (VK_SHIFT, 0, 0), (VK_RETURN, 0, 0), (VK_RETURN, 0, KEYEVENTF_KEYUP), (VK_SHIFT, 0, KEYEVENTF_KEYUP),
+    ]
+    assert events("\n", "enter") == [(VK_RETURN, 0, 0), (VK_RETURN, 0, KEYEVENTF_KEYUP)]
+
+
+def test_surrogate_pairs_are_sent_as_two_units():
+    assert [scan for _, scan, flags in events("😀") if not flags & KEYEVENTF_KEYUP] == [0xD83D, 0xDE00]
+
+
+def test_worker_coalesces_chunks_into_frames():
+    backend = FakeTextInjection()
+
+    async def scenario():
+        worker = InsertionWorker(backend, frame_interval=0.05)
+        worker.start()
+        for chunk in ["你", "好", "，", "世界"]:
+            await worker.put(chunk)
+        await worker.close()
+
+    asyncio.run(scenario())
+    assert backend.text == "你好，世界"
+    assert backend.resolved == 1
+    assert len(backend.frames) < 4
+
+
+def test_put_applies_backpressure_when_queue_is_full():
+    backend = FakeTextInjection(delay=0.05)
+
+    async def scenario():
+        worker = InsertionWorker(backend, max_chunks=2, frame_interval=0)
+        worker.start()
+        max_depth = 0
+        start = time.monotonic()
+        for i in range(10):
+            await worker.put(str(i))
+            max_depth = max(max_depth, worker.queue_depth)
+        put_elapsed = time.monotonic() - start
+        await worker.close()
+        return max_depth, put_elapsed
+
+    max_depth, put_elapsed = asyncio.run(scenario())
+    assert max_depth <= 2
+    # 队列满时 put() 要等输入线程取走内容，不会一次性全部放进去
+    assert put_elapsed >= 0.05
+    assert backend.text == "0123456789"
+
+
+def test_cancel_discards_pending_text():
+    backend = FakeTextInjection(delay=0.05)
+
+    async def scenario():
+        worker = InsertionWorker(backend, max_chunks=100, frame_interval=0)
+        worker.start()
+        await worker.put("已输入")
+        await asyncio.sleep(0.01)
+        for chunk in ["不", "会", "输", "入"]:
+            await worker.put(chunk)
+        worker.cancel()
+        await worker.put("取消后")
+        await asyncio.wait_for(worker.close(), 1.0)
+
+    asyncio.run(scenario())
+    assert backend.text == "已输入"
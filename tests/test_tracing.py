@@ -0,0 +1,26 @@
+from utils.tracing import Tracer
+
+
+def test_pending_marks_only_attach_to_their_own_entry():
+    tracer = Tracer()
+    tracer.mark_pending("selection", "hotkey_received")
+
+    chat = tracer.start("chat")
+    assert "hotkey_received" not in chat.marks
+
+    selection = tracer.start("selection")
+    assert "hotkey_received" in selection.marks
+    assert "hotkey_received" not in tracer.start("selection").marks
+
+
+def test_cleared_pending_marks_are_dropped():
+    tracer = Tracer()
+    tracer.mark_pending("selection", "hotkey_received")
+    tracer.clear_pending("selection")
+    assert tracer.start("selection").marks == {}
+
+
+def test_stale_pending_marks_are_ignored():
+    tracer = Tracer()
+    tracer.mark_pending("selection", "hotkey_received")
+    assert tracer.start("selection", pending_max_age=-1).marks == {}
@@ -0,0 +1,216 @@
+import math
+from collections import OrderedDict
+
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QPointF, QRectF, QSize
+from PySide6.QtGui import (QAbstractTextDocumentLayout, QColor, QFont, QPalette, QPainter,
+                           QTextCursor, QTextDocument, QTextOption)
+from PySide6.QtWidgets import QStyle, QStyledItemDelegate
+
+# 气泡样式，与原先每条消息一个 QTextEdit 时的样式表一致
+BUBBLE_PADDING = 10
+BUBBLE_RADIUS = 10
+BUBBLE_MIN_HEIGHT = 40
+ROW_MARGIN = 5
+FONT_PIXEL_SIZE = 13
+BUBBLE_COLORS = {
+    "user": (QColor("#DCF8C6"), QColor("#B5E2A8")),
+    "assistant": (QColor("#E3F2FD"), QColor("#BBDEFB")),
+}
+
+
+class ChatMessageModel(QAbstractListModel):
+    """聊天记录模型
+
+    行数据就是对话历史 messages 中的 {"role", "content"} 字典，界面和发给模型的上下文共用同一份列表。
+    消息内容只会在末尾追加（流式输出），不会被改写。
+    """
+
+    RoleRole = Qt.UserRole + 1
+
+    def __init__(self, messages: list, parent=None):
+        super().__init__(parent)
+        self.messages = messages
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.messages)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        message = self.messages[index.row()]
+        if role == Qt.DisplayRole:
+            return message["content"]
+        if role == self.RoleRole:
+            return message["role"]
+        return None
+
+    def append_message(self, role: str, content: str) -> int:
+        """添加一条消息，返回所在行"""
+        row = len(self.messages)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.messages.append({"role": role, "content": content})
+        self.endInsertRows()
+        return row
+
+    def prepend_messages(self, messages: list):
+        """在最前面插入更早的消息，例如从数据库翻页加载"""
+        if not messages:
+            return
+        self.beginInsertRows(QModelIndex(), 0, len(messages) - 1)
+        self.messages[0:0] = messages
+        self.endInsertRows()
+
+    def append_text(self, message: dict, text: str):
+        """在 message 末尾追加文本；按对象查找所在行，前面插入了消息也不会写错行"""
+        for row in range(len(self.messages) - 1, -1, -1):
+            if self.messages[row] is message:
+                break
+        else:
+            return
+        message["content"] += text
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole])
+
+    def clear(self):
+        self.beginResetModel()
+        self.messages.clear()
+        self.endResetModel()
+
+
+class _Layout:
+    """一条消息排版后的文档"""
+
+    __slots__ = ("length", "document", "longest", "tail")
+
+    def __init__(self, text: str, font: QFont):
+        self.document = QTextDocument()
+        self.document.setDefaultFont(font)
+        option = QTextOption()
+        option.setWrapMode(QTextOption.WrapMode.WrapAtWordBoundaryOrAnywhere)
+        self.document.setDefaultTextOption(option)
+        self.document.setPlainText(text)
+        self.length = len(text)
+        lines = text.split("\n")
+        self.longest = max(len(line) for line in lines)
+        self.tail = len(lines[-1])
+
+    def append(self, text: str):
+        """追加文本，只排版新增部分"""
+        delta = text[self.length:]
+        self.length = len(text)
+        cursor = QTextCursor(self.document)
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(delta)
+        lines = delta.split("\n")
+        self.tail += len(lines[0])
+        if len(lines) > 1:
+            self.longest = max(self.longest, self.tail, *(len(line) for line in lines[1:-1]))
+            self.tail = len(lines[-1])
+        self.longest = max(self.longest, self.tail)
+
+
+class MessageDelegate(QStyledItemDelegate):
+    """绘制聊天气泡
+
+    不再为每条消息创建控件，视图只绘制可见的行。每条消息的排版文档按最近使用缓存最多
+    max_documents 个，行高按 (内容长度, 气泡宽度) 单独缓存：滚动只绘制可见行，不重新排版；
+    流式输出只在文档末尾追加新增文本，行高变化时才通知视图重新布局。
+    缓存以消息字典为键，在最前面插入更早的消息不会使已有的缓存失效。
+    """
+
+    def __init__(self, view, max_documents: int = 200):
+        super().__init__(view)
+        self.view = view
+        self.max_documents = max_documents
+        self.font = QFont(view.font())
+        self.font.setPixelSize(FONT_PIXEL_SIZE)
+        self.model = None
+        self._documents = OrderedDict()  # id(消息) -> _Layout
+        self._heights = {}  # id(消息) -> (内容长度, 最长一行的字符数, 排版宽度, 行高)
+
+    def set_model(self, model):
+        """直接读取模型中的消息，并跟随模型的追加和清空更新缓存"""
+        self.model = model
+        model.dataChanged.connect(self._on_data_changed)
+        model.modelReset.connect(self.clear_cache)
+
+    def clear_cache(self):
+        self._documents.clear()
+        self._heights.clear()
+
+    def _layout(self, key: int, text: str):
+        layout = self._documents.get(key)
+        if layout is None:
+            layout = _Layout(text, self.font)
+            self._documents[key] = layout
+            if len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+        else:
+            self._documents.move_to_end(key)
+            if layout.length != len(text):
+                layout.append(text)
+        return layout
+
+    @staticmethod
+    def _text_width(longest: int, view_width: int) -> int:
+        """气泡内文字的排版宽度，气泡宽度按最长一行估算，不超过视图宽度的 85%"""
+        return min(int(view_width * 0.85), max(200, longest * 20)) - 2 * BUBBLE_PADDING
+
+    def _document(self, key: int, text: str, view_width: int):
+        """返回排版宽度已按视图宽度设置好的文档"""
+        layout = self._layout(key, text)
+        text_width = self._text_width(layout.longest, view_width)
+        # 宽度不变时不要重设，否则整个文档都要重新排版
+        if layout.document.textWidth() != text_width:
+            layout.document.setTextWidth(text_width)
+        return layout.document
+
+    def _row_height(self, message: dict, view_width: int) -> int:
+        key, text = id(message), message["content"]
+        cached = self._heights.get(key)
+        if cached and cached[0] == len(text) and cached[2] == self._text_width(cached[1], view_width):
+            # 内容和气泡宽度都没变（例如短消息在窗口变宽时），不需要排版
+            return cached[3]
+        document = self._document(key, text, view_width)
+        bubble_height = max(BUBBLE_MIN_HEIGHT, math.ceil(document.size().height()) + 2 * BUBBLE_PADDING)
+        height = bubble_height + 2 * ROW_MARGIN
+        self._heights[key] = (len(text), self._documents[key].longest, document.textWidth(), height)
+        return height
+
+    def sizeHint(self, option, index):
+        view_width = self.view.viewport().width()
+        return QSize(view_width, self._row_height(self.model.messages[index.row()], view_width))
+
+    def paint(self, painter: QPainter, option, index):
+        message = self.model.messages[index.row()]
+        view_width = self.view.viewport().width()
+        height = self._row_height(message, view_width)
+        document = self._document(id(message), message["content"], view_width)
+        bubble = QRectF(option.rect.left() + ROW_MARGIN, option.rect.top() + ROW_MARGIN,
+                        document.textWidth() + 2 * BUBBLE_PADDING, height - 2 * ROW_MARGIN)
+        role = message["role"]
+        if role == "user":
+            bubble.moveRight(option.rect.right() - ROW_MARGIN)
+        color, selected_color = BUBBLE_COLORS.get(role, BUBBLE_COLORS["assistant"])
+
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(selected_color if option.state & QStyle.State_Selected else color)
+        painter.drawRoundedRect(bubble, BUBBLE_RADIUS, BUBBLE_RADIUS)
+        origin = bubble.topLeft() + QPointF(BUBBLE_PADDING, BUBBLE_PADDING)
+        painter.translate(origin)
+        context = QAbstractTextDocumentLayout.PaintContext()
+        context.palette.setColor(QPalette.Text, QColor("#000000"))
+        # 长消息只绘制视口内的部分
+        context.clip = QRectF(self.view.viewport().rect()).intersected(bubble).translated(-origin)
+        document.documentLayout().draw(painter, context)
+        painter.restore()
+
+    def _on_data_changed(self, top_left, bottom_right, roles=()):
+        view_width = self.view.viewport().width()
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            message = self.model.messages[row]
+            cached = self._heights.get(id(message))
+            if cached is None or cached[3] != self._row_height(message, view_width):
+                self.sizeHintChanged.emit(top_left.sibling(row, 0))
@@ -1,138 +1,39 @@
-from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QTextEdit, 
-                               QPushButton, QHBoxLayout, QCheckBox, QLabel, QListWidget, QListWidgetItem, QSizePolicy, QSizeGrip, QComboBox)
+from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QTextEdit, QApplication, QMenu,
+                               QPushButton, QHBoxLayout, QCheckBox, QLabel, QListView, QSizePolicy, QSizeGrip, QComboBox)
 from PySide6.QtCore import Qt, QEvent,QTimer, QSize
-from PySide6.QtGui import QTextOption, QIcon, QDoubleValidator, QIntValidator
+from PySide6.QtGui import QIcon, QDoubleValidator, QIntValidator, QKeySequence, QShortcut
 
 import asyncio
+from ui.chat_history import ChatMessageModel, MessageDelegate
+from services.chat_store import ChatStore
+from services.context_window import ContextWindow
+from ui.render_scheduler import RenderScheduler
+from utils.tracing import traced
 
 
-class MessageItem(QWidget):
-    def __init__(self, role: str, content: str):
-        super().__init__()
-        self.role = role
-        self.content = content
-        self.label = None
-        self.init_ui()
-
-    def init_ui(self):
-        layout = QHBoxLayout()
-        layout.setContentsMargins(5, 2, 5, 2)
-        layout.setSpacing(5)
-
-        # 使用 QTextEdit 替代 QLabel
-        self.label = QTextEdit()
-        self.label.setReadOnly(True)
-        self.label.setText(self.content)
-        
-        # 设置自动换行
-        self.label.setWordWrapMode(QTextOption.WrapMode.WrapAtWordBoundaryOrAnywhere)
-        
-        # 隐藏滚动条
-        self.label.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        self.label.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        
-        # 修改宽度计算逻辑，使其基于父窗口宽度
-        parent_width = self.parent().width() if self.parent() else 550
-        max_width = int(parent_width * 0.85)  # 使用父窗口宽度的85%
-        content_length = max(len(line) for line in self.content.split('\n'))
-        width = min(max_width, max(200, content_length * 20))  # 增加每个字符的宽度
-        self.label.setFixedWidth(width)
-        
-        # 计算实际需要的高度
-        document = self.label.document()
-        document.setTextWidth(width - 20)  # 考虑padding
-        
-        # 使用documentLayout来获取更准确的文本高度
-        text_height = document.documentLayout().documentSize().height()
-        padding = 20  # 上下各10px的padding
-        total_height = int(text_height + padding)
-        
-        # 设置最小高度
-        total_height = max(40, total_height)  # 确保至少40px高
-        
-        self.label.setFixedHeight(total_height)
-        
-        if self.role == 'user':
-            layout.addStretch()
-            layout.addWidget(self.label)
-            self.label.setStyleSheet("""
-                QTextEdit {
-                    background-color: #DCF8C6;
-                    padding: 10px;
-                    border-radius: 10px;
-                    border: none;
-                    font-size: 13px;
-                    color: #000000;
-                    selection-background-color: #B5E2A8;
-                    line-height: 1.5;
-                }
-            """)
-        else:
-            layout.addWidget(self.label)
-            layout.addStretch()
-            self.label.setStyleSheet("""
-                QTextEdit {
-                    background-color: #E3F2FD;
-                    padding: 10px;
-                    border-radius: 10px;
-                    border: none;
-                    font-size: 13px;
-                    color: #000000;
-                    selection-background-color: #BBDEFB;
-                    line-height: 1.5;
-                }
-            """)
-
-        self.setLayout(layout)
-        # 为整个widget设置合适的高度，添加额外空间以防止文本被截断
-        self.setFixedHeight(total_height + 10)
-
-    def update_content(self, content):
-        """更新消息内容"""
-        self.content = content
-        self.label.setText(content)
-        
-        width = self.label.width()
-        document = self.label.document()
-        document.setTextWidth(width - 20)
-        
-        # 使用documentLayout获取准确的文本高度
-        text_height = document.documentLayout().documentSize().height()
-        padding = 20
-        total_height = int(text_height + padding)
-        total_height = max(40, total_height)  # 确保最小高度
-        
-        self.label.setFixedHeight(total_height)
-        self.setFixedHeight(total_height + 10)
-
-    def resizeEvent(self, event):
-        """处理大小调整事件"""
-        super().resizeEvent(event)
-        # 重新计算宽度和高度
-        parent_width = self.parent().width() if self.parent() else 550
-        max_width = int(parent_width * 0.85)
-        content_length = max(len(line) for line in self.content.split('\n'))
-        width = min(max_width, max(200, content_length * 20))
-        
-        self.label.setFixedWidth(width)
-        
-        # 重新计算高度
-        document = self.label.document()
-        document.setTextWidth(width - 20)
-        text_height = document.documentLayout().documentSize().height()
-        padding = 20
-        total_height = int(text_height + padding)
-        total_height = max(40, total_height)
-        
-        self.label.setFixedHeight(total_height)
-        self.setFixedHeight(total_height + 10)
-
 class ChatWindow(QMainWindow):
-    def __init__(self, ai_client):
+    def __init__(self, ai_client, render_fps: int = 30, context_window: ContextWindow = None,
+                 chat_store: ChatStore = None, page_size: int = 50):
         super().__init__()
         self.ai_client = ai_client
         self.messages = []  # 存储对话历史
-        self.should_stop = False
+        # 每轮只发送令牌预算内最近的历史
+        self.context_window = context_window or ContextWindow()
+        # 聊天记录持久化：打开时只加载最近一页，滚动到顶部时再加载更早的
+        self.chat_store = chat_store
+        self.page_size = page_size
+        self.conversation_id = None
+        self.oldest_id = None  # 已加载的最早一条消息在数据库中的 id
+        self.has_older = False
+        self.chat_model = ChatMessageModel(self.messages, self)
+        # 正在流式输出的回复，id(消息字典) -> 消息字典；多条回复可以同时进行
+        self._streaming = {}
+        # 每次清空聊天记录加一；清空前开始的回复发现代数变化后不再写入界面
+        self.generation = 0
+        self._reply_tasks = set()  # 正在等待回复的 send_message 任务，清空时取消
+        # 流式输出按帧合并后再追加到消息末尾
+        self.render_scheduler = RenderScheduler(self._write_stream, render_fps,
+                                                on_frame=self._on_render_frame)
 
         # 设置窗口属性 - 移除标题栏并保持置顶
         self.setWindowFlags(Qt.WindowStaysOnTopHint | Qt.FramelessWindowHint | Qt.WindowMaximizeButtonHint)
@@ -187,22 +88,32 @@ class ChatWindow(QMainWindow):
 
         layout.addLayout(top_layout)
 
-        # 创建聊天历史显示区域（使用 QListWidget）
-        self.chat_history = QListWidget()
+        # 创建聊天历史显示区域：模型 + 绘制气泡的委托，只绘制可见的消息
+        self.chat_history = QListView()
+        self.chat_history.setModel(self.chat_model)
+        self.chat_delegate = MessageDelegate(self.chat_history)
+        self.chat_delegate.set_model(self.chat_model)
+        self.chat_history.setItemDelegate(self.chat_delegate)
         self.chat_history.setStyleSheet("""
-            QListWidget {
+            QListView {
                 background-color: transparent;
                 border: none;
                 padding: 5px;
             }
-            QListWidget::item {
-                padding: 0px;
-                margin: 2px 0px;
-            }
         """)
         self.chat_history.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        self.chat_history.setVerticalScrollMode(QListWidget.ScrollPerPixel)
+        self.chat_history.setVerticalScrollMode(QListView.ScrollPerPixel)
         self.chat_history.setSpacing(2)  # 减小项目间距
+        self.chat_history.setUniformItemSizes(False)
+        self.chat_history.setResizeMode(QListView.Adjust)
+        # 分批布局：窗口大小改变后先排版可见的消息，其余的在后续事件循环中分批完成
+        self.chat_history.setLayoutMode(QListView.Batched)
+        self.chat_history.setBatchSize(50)
+        self.chat_history.setSelectionMode(QListView.SingleSelection)
+        self.chat_history.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.chat_history.customContextMenuRequested.connect(self.show_message_menu)
+        self.chat_history.verticalScrollBar().valueChanged.connect(self._on_history_scrolled)
+        QShortcut(QKeySequence.Copy, self.chat_history, self.copy_selected_message)
         layout.addWidget(self.chat_history)
 
         # 创建输入框
@@ -290,6 +201,9 @@ class ChatWindow(QMainWindow):
         # 设置最小窗口大小
         self.setMinimumSize(400, 300)
 
+        if self.chat_store is not None:
+            self.restore_history()
+
     def updateSizeGripPos(self):
         """更新大小调整手柄的位置"""
         self.size_grip.move(
@@ -300,36 +214,91 @@ class ChatWindow(QMainWindow):
     def resizeEvent(self, event):
         """处理窗口大小调整事件"""
         super().resizeEvent(event)
-        # 更新大小调整手柄位置
+        # 更新大小调整手柄位置；消息的行高由视图按新宽度重新布局
         self.updateSizeGripPos()
-        # 遍历所有消息项并更新它们的大小
-        for i in range(self.chat_history.count()):
-            item = self.chat_history.item(i)
-            widget = self.chat_history.itemWidget(item)
-            if widget:
-                widget.resizeEvent(event)
-                item.setSizeHint(widget.sizeHint())
-
-    def append_message(self, role: str, content: str):
-        """添加消息到聊天历史，使用自定义的 MessageItem"""
-        self.messages.append({"role": role, "content": content})
-
-        message_item = MessageItem(role, content)
-        list_item = QListWidgetItem()
-        
-        # 获取消息项的实际���小
-        size = message_item.sizeHint()
-        # 确保高度足够
-        size.setHeight(message_item.height()+15)  # 添加一点间距
-        list_item.setSizeHint(size)
-        
-        self.chat_history.addItem(list_item)
-        self.chat_history.setItemWidget(list_item, message_item)
+
+    def restore_history(self):
+        """打开最近的对话，只加载最后一页消息"""
+        self.conversation_id = self.chat_store.latest_conversation() or self.chat_store.new_conversation()
+        self.oldest_id = None
+        self.has_older = True
+        self.load_older_messages()
+        self.chat_history.scrollToBottom()
+
+    def load_older_messages(self) -> int:
+        """从数据库加载更早的一页消息插入到最前面，返回加载的条数
+
+        流式输出按消息对象写入，插入更早的消息不影响正在输出的回复。
+        """
+        if self.chat_store is None or not self.has_older:
+            return 0
+        rows = self.chat_store.load_page(self.conversation_id, self.oldest_id, self.page_size)
+        if len(rows) < self.page_size:
+            self.has_older = False
+        if not rows:
+            return 0
+        self.oldest_id = rows[0][0]
+        scrollbar = self.chat_history.verticalScrollBar()
+        distance_to_bottom = scrollbar.maximum() - scrollbar.value()
+        self.chat_model.prepend_messages([{"role": role, "content": content} for _, role, content in rows])
+        self.context_window.history_prepended(len(rows))
+        # 保持原来看到的内容在原位，不跳到新插入的消息。已有消息的行高都有缓存，
+        # 这里一次布局完成，才能得到新的滚动范围
+        self.chat_history.setLayoutMode(QListView.SinglePass)
+        self.chat_history.doItemsLayout()
+        self.chat_history.setLayoutMode(QListView.Batched)
+        scrollbar.setValue(scrollbar.maximum() - distance_to_bottom)
+        return len(rows)
+
+    def _on_history_scrolled(self, value):
+        scrollbar = self.chat_history.verticalScrollBar()
+        if self.has_older and value == scrollbar.minimum() and scrollbar.maximum() > 0:
+            self.load_older_messages()
+
+    def append_message(self, role: str, content: str, persist: bool = True) -> int:
+        """添加消息到聊天历史，返回消息所在的行
+
+        persist 为 False 时不写入数据库，用于流式输出中尚未完成的回复。
+        """
+        row = self.chat_model.append_message(role, content)
+        if persist:
+            self._persist(self.messages[row], self.conversation_id)
 
         # 滚动到底部
         self.chat_history.scrollToBottom()
         # 延迟再次滚动，确保完全显示
         QTimer.singleShot(100, self.chat_history.scrollToBottom)
+        return row
+
+    def _persist(self, message: dict, conversation_id: str):
+        if self.chat_store is not None:
+            self.chat_store.add_message(conversation_id, message["role"], message["content"])
+
+    def _write_stream(self, key: int, text: str):
+        """render_scheduler 的写入函数，key 是回复消息的 id；已结束或被清空的回复不再写入"""
+        message = self._streaming.get(key)
+        if message is not None:
+            self.chat_model.append_text(message, text)
+
+    def _on_render_frame(self, keys):
+        """一帧写入完成后滚动到底部"""
+        self.chat_history.scrollToBottom()
+
+    def copy_selected_message(self):
+        """复制选中的消息"""
+        index = self.chat_history.currentIndex()
+        if index.isValid():
+            QApplication.clipboard().setText(index.data())
+
+    def show_message_menu(self, pos):
+        """消息的右键菜单"""
+        index = self.chat_history.indexAt(pos)
+        if not index.isValid():
+            return
+        self.chat_history.setCurrentIndex(index)
+        menu = QMenu(self)
+        menu.addAction("复制", self.copy_selected_message)
+        menu.exec(self.chat_history.viewport().mapToGlobal(pos))
 
     def mousePressEvent(self, event):
         # 添加右下角调整大小的功能
@@ -384,6 +353,11 @@ class ChatWindow(QMainWindow):
         # 添加用户消息
         self.append_message("user", full_input)
 
+        generation = self.generation
+        # 回复写入开始时的对话；清空后旧回复不能写进新对话
+        conversation_id = self.conversation_id
+        task = asyncio.current_task()
+        self._reply_tasks.add(task)
         try:
             # 获取并验证温度值
             try:
@@ -399,75 +373,63 @@ class ChatWindow(QMainWindow):
             except ValueError:
                 max_tokens = 2000
             
-            messages = [{"role": "system", "content": "请直接回答问题，不要使用 markdown 格式。"}]
-            messages.extend(self.messages)
+            messages = self.context_window.build(
+                "请直接回答问题，不要使用 markdown 格式。", self.messages,
+                model=getattr(self.ai_client, "model", None), reserve=max_tokens
+            )
+            self.context_window.schedule_summary(self.ai_client, self.messages)
 
             if self.stream_mode.isChecked():
                 response_text = ""
-                message_widget = None
-                first_chunk = True
+                response_message = None  # 回复所在的消息字典，行号会因翻页加载或清空而变化
+                stripper = None
+                if self.filter_markdown.isChecked():
+                    from utils.markdown_stripper import MarkdownStripper
+                    # 格式标记可能被拆在两个响应块中，逐块过滤需要保留上下文
+                    stripper = MarkdownStripper()
                 
-                async for text in self.ai_client.get_response_stream(
-                    full_input, 
-                    stream=True, 
-                    messages=messages,
-                    temperature=temperature,
-                    max_tokens=max_tokens
-                ):
-                    if self.should_stop:
-                        break
-
-                    if self.filter_markdown.isChecked():
-                        from utils.utils import remove_markdown
-                        text = remove_markdown(text)
-
-                    response_text += text
-
-                    if first_chunk:
-                        self.append_message("assistant", response_text)
-                        last_item = self.chat_history.item(self.chat_history.count() - 1)
-                        message_widget = self.chat_history.itemWidget(last_item)
-                        first_chunk = False
-                    else:
-                        message_widget.update_content(response_text)
-                    
-                    self.chat_history.scrollToBottom()
-                    await asyncio.sleep(0.01)
-
-                # 流式输出结束后，重新计算并更新消息高度
-                if message_widget:
-                    # 重新计算高度
-                    width = message_widget.label.width()
-                    document = message_widget.label.document()
-                    document.setTextWidth(width - 20)
-                    
-                    # 获取最终的文本高度
-                    layout = document.documentLayout()
-                    size = layout.documentSize()
-                    # 正确触发 documentSizeChanged 信号
-                    layout.documentSizeChanged.emit(size)
-                    
-                    # 获取最终的文本高度
-                    text_height = size.height()
-                    padding = 20
-                    total_height = int(text_height + padding)
-                    total_height = max(40, total_height)
-                    
-                    # 更新高度
-                    message_widget.label.setFixedHeight(total_height)
-                    message_widget.setFixedHeight(total_height + 10)
-                    
-                    # 更新 QListWidgetItem 的大小
-                    last_item.setSizeHint(message_widget.sizeHint())
-                    
-                    # 确保滚动到底部
-                    self.chat_history.scrollToBottom()
-
-                # 更新消息历史
-                if len(self.messages) > 0 and self.messages[-1]['role'] == 'assistant':
-                    self.messages[-1]['content'] = response_text
-                else:
-                    self.messages.append({"role": "assistant", "content": response_text})
+                try:
+                    async for text in traced("chat", self.ai_client.get_response_stream(
+                        full_input, 
+                        stream=True, 
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens
+                    )):
+                        if generation != self.generation:
+                            break
+
+                        if stripper:
+                            text = stripper.feed(text)
+
+                        response_text += text
+
+                        if response_message is None:
+                            row = self.append_message("assistant", response_text, persist=False)
+                            response_message = self.messages[row]
+                            self._streaming[id(response_message)] = response_message
+                        else:
+                            # 只记下新增的文本，由 render_scheduler 每帧最多写入一次
+                            self.render_scheduler.append(id(response_message), text)
+
+                    if stripper and generation == self.generation:
+                        text = stripper.flush()
+                        response_text += text
+                        if response_message is not None:
+                            self.render_scheduler.append(id(response_message), text)
+                finally:
+                    # 流式输出结束（包括出错）后写入剩余内容，完整的回复才写入数据库
+                    self.render_scheduler.flush()
+                    if response_message is not None:
+                        self._streaming.pop(id(response_message), None)
+                        if conversation_id == self.conversation_id:
+                            self._persist(response_message, conversation_id)
+
+                if generation != self.generation:
+                    return
+                if response_message is None:
+                    self.append_message("assistant", response_text)
+                self.chat_history.scrollToBottom()
 
             else:
                 response = await self.ai_client.get_response(
@@ -479,17 +441,34 @@ class ChatWindow(QMainWindow):
                 if self.filter_markdown.isChecked():
                     from utils.utils import remove_markdown
                     response = remove_markdown(response)
-                self.append_message("assistant", response)
-                self.messages.append({"role": "assistant", "content": response})
+                if generation == self.generation:
+                    self.append_message("assistant", response)
 
         except Exception as e:
-            error_msg = f"错误: {str(e)}"
-            self.append_message("assistant", error_msg)
+            if generation == self.generation:
+                error_msg = f"错误: {str(e)}"
+                self.append_message("assistant", error_msg)
+        finally:
+            self._reply_tasks.discard(task)
 
     def clear_chat(self):
-        """清空聊天历史"""
-        self.messages.clear()
-        self.chat_history.clear()
+        """清空聊天历史
+
+        正在进行的回复会被停止：先让代数失效，之后旧回复的文本不会再写入界面或数据库，
+        再取消等待回复的任务，不再占用连接。
+        """
+        self.generation += 1
+        for task in list(self._reply_tasks):
+            task.cancel()
+        self._streaming.clear()
+        self.render_scheduler.clear()
+        self.context_window.reset()
+        self.chat_model.clear()
+        if self.chat_store is not None:
+            self.chat_store.delete_conversation(self.conversation_id)
+            self.conversation_id = self.chat_store.new_conversation()
+            self.oldest_id = None
+            self.has_older = False
 
     def closeEvent(self, event):
         """重写关闭事件，使窗口关闭时只隐藏而不退出程序"""
@@ -1,3 +1,4 @@
+import logging
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QTextEdit, QLabel,
                              QLineEdit, QPushButton, QHBoxLayout, QApplication, QComboBox,
                              QListWidget, QListWidgetItem)
@@ -6,11 +7,13 @@ from PySide6.QtGui import QIcon
 import subprocess
 import os
 import asyncio
-from services.ai_client import AIClient
+from core.ai_service import create_ai_client
 import json
 import qasync
 from .base_window import BaseWindow
 
+logger = logging.getLogger(__name__)
+
 class ResultWindow(BaseWindow):
     """结果展示窗口"""
     def __init__(self):
@@ -56,7 +59,7 @@ class ResultWindow(BaseWindow):
             # 执行完命令后隐藏窗口
             self.hide()
         except Exception as e:
-            print(f"执行结果失败: {str(e)}")
+            logger.error("执行结果失败: %s", e)
 
 
 
@@ -123,18 +126,12 @@ class CommandWindow(BaseWindow):
             with open('config/config.json', 'r', encoding='utf-8') as f:
                 config = json.load(f)
                 
-            self.ai_client = AIClient(
-                api_key=config.get('api_key', ''),
-                base_url=config.get('base_url', None),
-                model=config.get('model', 'gpt-4o'),
-                api_type=config.get('api_type', 'OpenAI'),
-                proxy=config.get('proxy', '127.0.0.1:1090'),
-                proxy_enabled=config.get('proxy_enabled', False)
-            )
+            # 与主窗口共用进程级连接池
+            self.ai_client = create_ai_client(config)
             
             self.es_path = config.get('es_path', 'C:\\Program Files\\Everything\\es.exe')
         except Exception as e:
-            print(f"初始化 AI 客户端失败: {str(e)}")
+            logger.error("初始化 AI 客户端失败: %s", e)
 
     def load_prompts(self):
         """加载提示词列表"""
@@ -145,7 +142,7 @@ class CommandWindow(BaseWindow):
                     for prompt in prompts:
                         self.prompt_combo.addItem(prompt['title'], prompt['content'])
         except Exception as e:
-            print(f"加载提示词失败: {str(e)}")
+            logger.error("加载提示词失败: %s", e)
 
     def on_execute_command(self):
         """处理执行命令的点击事件"""
@@ -181,7 +178,7 @@ class CommandWindow(BaseWindow):
             
             # 获取 AI 响应
             response = await self.ai_client.get_response(command, messages=messages)
-            print(f"AI 响应: {response}")
+            logger.debug("AI 响应: %s", response)
             
             # 使用 ES 搜索并获取结果
             if os.path.exists(self.es_path):
@@ -222,10 +219,10 @@ class CommandWindow(BaseWindow):
                         self.result_window.activateWindow()
                         
                 except Exception as e:
-                    print(f"执行 ES 命令失败: {str(e)}")
+                    logger.error("执行 ES 命令失败: %s", e)
                     self.command_executed.emit(f"执行 ES 命令失败: {str(e)}")
             else:
-                print(f"ES 可执行文件不存在: {self.es_path}")
+                logger.warning("ES 可执行文件不存在: %s", self.es_path)
                 self.command_executed.emit(f"ES 可执行文件不存在: {self.es_path}")
                 
             # 清空输入框并隐藏命令窗口
@@ -233,7 +230,7 @@ class CommandWindow(BaseWindow):
             self.hide()
             
         except Exception as e:
-            print(f"执行命令失败: {str(e)}")
+            logger.error("执行命令失败: %s", e)
             self.command_executed.emit(f"执行失败: {str(e)}")
 
 
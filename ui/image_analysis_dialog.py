@@ -1,3 +1,4 @@
+import logging
 from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
                              QTextEdit, QPushButton, QSplitter, QWidget, QComboBox, 
                              QCheckBox, QGroupBox)
@@ -7,6 +8,8 @@ import os
 import json
 from .styles import IMAGE_ANALYSIS_STYLE
 
+logger = logging.getLogger(__name__)
+
 class ImageAnalysisDialog(QDialog):
     analyze_requested = Signal(str, str)  # 发送(提示词, 图片路径)
     
@@ -300,7 +303,7 @@ class ImageAnalysisDialog(QDialog):
                 for prompt in prompts:
                     self.prompts_combo.addItem(prompt['title'], prompt['content'])
         except Exception as e:
-            print(f"加载提示词失败: {str(e)}")
+            logger.error("加载提示词失败: %s", e)
     
     def on_prompt_selected(self, index):
         """当选择提示词时触发"""
@@ -1,3 +1,4 @@
+import logging
 import json
 import os
 from PySide6.QtWidgets import QVBoxLayout, QHBoxLayout, QTextEdit, QPushButton, QLabel, QComboBox, QCheckBox, QLineEdit
@@ -6,6 +7,8 @@ from PySide6.QtGui import QDoubleValidator, QIntValidator, QKeyEvent
 from .styles import CHECKBOX_STYLE
 from .base_window import BaseWindow
 
+logger = logging.getLogger(__name__)
+
 class PromptInputWindow(BaseWindow):
     """独立的提示词输入窗口组件"""
     
@@ -43,9 +46,9 @@ class PromptInputWindow(BaseWindow):
                 blur_effect.setBlurRadius(15)
                 # self.setGraphicsEffect(blur_effect)  # 暂时注释，可能影响性能
                 
-                print("已启用半透明效果")
+                logger.debug("已启用半透明效果")
         except Exception as e:
-            print(f"模糊效果设置失败: {e}")
+            logger.error("模糊效果设置失败: %s", e)
         
         # 输入历史记录
         self.input_history = []
@@ -241,14 +244,14 @@ class PromptInputWindow(BaseWindow):
                 self._populate_prompts_combo(prompts)
                 
         except json.JSONDecodeError as e:
-            print(f"提示词文件格式错误: {e}，使用默认提示词")
+            logger.warning("提示词文件格式错误: %s，使用默认提示词", e)
             self._create_default_prompts(default_prompts)
             self._populate_prompts_combo(default_prompts)
         except (OSError, IOError) as e:
-            print(f"读取提示词文件失败: {e}，使用默认提示词")
+            logger.error("读取提示词文件失败: %s，使用默认提示词", e)
             self._populate_prompts_combo(default_prompts)
         except Exception as e:
-            print(f"加载提示词时发生未知错误: {e}")
+            logger.error("加载提示词时发生未知错误: %s", e)
             self._populate_prompts_combo(default_prompts)
     
     def _create_default_prompts(self, prompts):
@@ -257,7 +260,7 @@ class PromptInputWindow(BaseWindow):
             with open('config/prompts.json', 'w', encoding='utf-8') as f:
                 json.dump(prompts, f, ensure_ascii=False, indent=4)
         except (OSError, IOError) as e:
-            print(f"创建默认提示词文件失败: {e}")
+            logger.error("创建默认提示词文件失败: %s", e)
     
     def _populate_prompts_combo(self, prompts):
         """填充提示词下拉框"""
@@ -267,7 +270,7 @@ class PromptInputWindow(BaseWindow):
             if isinstance(prompt, dict) and 'title' in prompt and 'content' in prompt:
                 self.prompts_combo.addItem(prompt['title'], prompt['content'])
             else:
-                print(f"无效的提示词格式: {prompt}")
+                logger.warning("无效的提示词格式: %s", prompt)
     
     def on_prompt_selected(self, index):
         """当选择提示词时触发"""
@@ -278,7 +281,7 @@ class PromptInputWindow(BaseWindow):
         """提交提示词"""
         user_input = self.input_text.text().strip()
         if not user_input:
-            print("输入为空，跳过处理")
+            logger.warning("输入为空，跳过处理")
             return
         
         # 添加到历史记录
@@ -339,7 +342,7 @@ class PromptInputWindow(BaseWindow):
                 # 确保温度值在合理范围内
                 return max(0.0, min(2.0, temperature))
         except (ValueError, AttributeError) as e:
-            print(f"温度值解析失败: {e}，使用默认值")
+            logger.warning("温度值解析失败: %s，使用默认值", e)
         return 0.7  # 默认值
     
     def _get_max_tokens_value(self):
@@ -351,7 +354,7 @@ class PromptInputWindow(BaseWindow):
                 # 确保token值在合理范围内
                 return max(1, min(32000, max_tokens))
         except (ValueError, AttributeError) as e:
-            print(f"token值解析失败: {e}，使用默认值")
+            logger.warning("token值解析失败: %s，使用默认值", e)
         return 2000  # 默认值
     
     def show_at_cursor(self):
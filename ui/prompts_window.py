@@ -1,11 +1,13 @@
+import logging
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QPushButton, QListWidget, QLabel, QLineEdit, QTextEdit)
 from PySide6.QtCore import Qt, Signal, QTimer
 from PySide6.QtGui import QIcon
 import json
-import traceback
 import os
 
+logger = logging.getLogger(__name__)
+
 class PromptsWindow(QMainWindow):
     prompts_updated = Signal()
     
@@ -72,7 +74,7 @@ class PromptsWindow(QMainWindow):
             self.resize(800, 600)
             
         except Exception as e:
-            traceback.print_exc()
+            logger.exception("初始化提示词窗口失败")
     
     def _schedule_save(self):
         """使用防抖定时器延迟保存"""
@@ -102,7 +104,7 @@ class PromptsWindow(QMainWindow):
                     # 保存到文件
                     self.save_prompts()
         except Exception as e:
-            traceback.print_exc()
+            logger.exception("自动保存提示词失败")
     
     def save_prompts(self):
         """保存提示词到文件"""
@@ -127,7 +129,7 @@ class PromptsWindow(QMainWindow):
             self.prompts_updated.emit()
             
         except Exception as e:
-            traceback.print_exc()
+            logger.exception("保存提示词失败")
             # 清理临时文件
             if os.path.exists(temp_file):
                 try:
@@ -204,9 +206,9 @@ class PromptsWindow(QMainWindow):
                 self.prompts_list.addItem(prompt['title'])
                 
         except json.JSONDecodeError as e:
-            print(f"提示词文件格式错误: {str(e)}")
+            logger.warning("提示词文件格式错误: %s", e)
             self.prompts = []
         except Exception as e:
             #print(f"加载提示词失败: {str(e)}")
-            traceback.print_exc()
+            logger.exception("加载提示词失败")
             self.prompts = []
\ No newline at end of file
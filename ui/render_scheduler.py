@@ -0,0 +1,55 @@
+import time
+
+from PySide6.QtCore import QTimer
+
+
+class RenderScheduler:
+    """按显示帧合并流式输出的界面更新
+
+    append() 只把文本记到待写入缓冲，不立即重绘；定时器每帧（1/fps 秒）最多触发一次，
+    对每条消息调用一次 write(消息, 合并后的文本) 追加到末尾，再调用 on_frame(消息列表) 滚动到底部。
+    这样每帧的开销只与新增的文本有关，与已经输出的长度无关。没有待写入内容时定时器不运行。
+    """
+
+    def __init__(self, write, fps: int = 30, on_frame=None):
+        self.write = write
+        self.interval = 1.0 / max(1, fps)
+        self.on_frame = on_frame
+        self.frames = 0
+        self._pending = {}
+        self._last_frame = 0.0
+        self._timer = QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.render)
+
+    def append(self, message, text: str):
+        """记下要追加到 message 的文本，在下一帧写入"""
+        if not text:
+            return
+        self._pending.setdefault(message, []).append(text)
+        if not self._timer.isActive():
+            # 距离上一帧不足一个间隔时推迟到下一帧
+            delay = self.interval - (time.monotonic() - self._last_frame)
+            self._timer.start(max(0, int(delay * 1000)))
+
+    def render(self):
+        """把待写入的文本写到消息中"""
+        self._timer.stop()
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        for message, texts in pending.items():
+            self.write(message, "".join(texts))
+        self._last_frame = time.monotonic()
+        self.frames += 1
+        if self.on_frame:
+            self.on_frame(list(pending))
+
+    def flush(self):
+        """立即写入剩余内容，例如流式输出结束时"""
+        self.render()
+
+    def clear(self):
+        """丢弃所有尚未写入的内容，例如聊天记录被清空"""
+        self._timer.stop()
+        self._pending.clear()
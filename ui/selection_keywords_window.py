@@ -1,3 +1,4 @@
+import logging
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                               QListWidget, QPushButton, QLineEdit, QTextEdit, 
                               QLabel)
@@ -5,9 +6,10 @@ from PySide6.QtCore import Qt, Signal
 from PySide6.QtGui import QIcon
 import json
 import os
-import traceback
 from PySide6.QtCore import QTimer
 
+logger = logging.getLogger(__name__)
+
 class SelectionKeywordsWindow(QMainWindow):
     keywords_updated = Signal()  # 当关键词更新时发出信号
     
@@ -77,7 +79,7 @@ class SelectionKeywordsWindow(QMainWindow):
             self.resize(800, 600)
             
         except Exception as e:
-            traceback.print_exc()
+            logger.exception("初始化关键词窗口失败")
     
     def _schedule_save(self):
         """使用防抖定时器调度保存操作"""
@@ -100,7 +102,7 @@ class SelectionKeywordsWindow(QMainWindow):
                 # 发出更新信号
                 self.keywords_updated.emit()
         except Exception as e:
-            traceback.print_exc()
+            logger.exception("自动保存关键词失败")
     
     def add_keyword(self):
         """添加新关键词"""
@@ -172,7 +174,7 @@ class SelectionKeywordsWindow(QMainWindow):
                 self.keywords_list.addItem(keyword['title'])
                 
         except Exception as e:
-            traceback.print_exc()
+            logger.exception("加载关键词失败")
             self.keywords = []
     
     def save_keywords(self):
@@ -181,4 +183,4 @@ class SelectionKeywordsWindow(QMainWindow):
             with open('config/selection_keywords.json', 'w', encoding='utf-8') as f:
                 json.dump(self.keywords, f, ensure_ascii=False, indent=4)
         except Exception as e:
-            traceback.print_exc() 
\ No newline at end of file
+            logger.exception("保存关键词失败")
\ No newline at end of file
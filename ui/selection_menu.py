@@ -1,10 +1,12 @@
+import logging
 from PySide6.QtWidgets import QMenu, QWidget, QApplication
 from PySide6.QtCore import Qt, Signal
 from PySide6.QtGui import QAction, QIcon
 from utils.plugin_manager import PluginManager
 import json
 import os
-import traceback
+
+logger = logging.getLogger(__name__)
 
 class SelectionMenu(QMenu):
     plugin_triggered = Signal(object)  # 修改：只需要传递插件对象
@@ -58,7 +60,7 @@ class SelectionMenu(QMenu):
                 with open('config/selection_keywords.json', 'r', encoding='utf-8') as f:
                     self.keywords = json.load(f)
         except Exception as e:
-            traceback.print_exc()
+            logger.exception("加载关键词失败")
             self.keywords = []
     
     def refresh_menu(self):
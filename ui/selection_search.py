@@ -1,15 +1,21 @@
+import logging
 from PySide6.QtWidgets import QDialog, QVBoxLayout, QTextEdit, QPushButton, QSizeGrip, QHBoxLayout,QApplication, QComboBox, QLabel, QLineEdit
-from PySide6.QtCore import Qt, Signal
+from PySide6.QtCore import Qt, Signal, QTimer
 from PySide6.QtGui import (QTextCursor, QSyntaxHighlighter, QTextCharFormat, QColor, QFont, 
                           QCursor, QIcon, QDoubleValidator, QIntValidator, QKeyEvent)
 from .styles import SELECTION_SEARCH_STYLE
 import re
 import asyncio
-import traceback
 import pyperclip
 import keyboard
 import time
 from win32gui import GetForegroundWindow, SetForegroundWindow
+from services.request_coalescer import SharedStream
+from utils.keyword_usage import get_keyword_usage
+from utils.metrics import get_metrics
+from utils.tracing import traced
+
+logger = logging.getLogger(__name__)
 
 class MarkdownHighlighter(QSyntaxHighlighter):
     """Markdown语法高亮器"""
@@ -165,6 +171,10 @@ class SelectionSearchDialog(QDialog):
         # 添加AI客户端
         self.ai_client = None
         
+        # 预测预取：菜单打开时后台提前请求最常用的关键词
+        self.speculative_prefetch = False
+        self._prefetch = None  # (请求参数, SharedStream)
+        
         # 创建输入区域布局
         input_layout = QHBoxLayout()
         input_layout.setSpacing(8)
@@ -250,6 +260,13 @@ class SelectionSearchDialog(QDialog):
     def set_ai_client(self, ai_client):
         """设置AI客户端"""
         self.ai_client = ai_client
+        self._discard_prefetch()
+    
+    def set_speculative_prefetch(self, enabled):
+        """设置是否在菜单打开时预取最常用的关键词查询"""
+        self.speculative_prefetch = enabled
+        if not enabled:
+            self._discard_prefetch()
     
     def set_text(self, text):
         """设置显示文本，避免不必���换行"""
@@ -295,8 +312,7 @@ class SelectionSearchDialog(QDialog):
             self.activateWindow()  # 激活窗口
             
         except Exception as e:
-            print(f"显示窗口失败: {str(e)}")
-            traceback.print_exc()
+            logger.exception("显示窗口失败: %s", e)
     
     def mousePressEvent(self, event):
         """鼠标按下事件"""
@@ -338,9 +354,55 @@ class SelectionSearchDialog(QDialog):
         
         self._connected_signals = True
         
+        if not getattr(self, '_menu_hide_connected', False):
+            # 菜单先隐藏再触发所选动作，延迟到下一轮事件循环再丢弃预取结果
+            self.selection_menu.aboutToHide.connect(
+                lambda: QTimer.singleShot(0, self._discard_prefetch)
+            )
+            self._menu_hide_connected = True
+        self._start_prefetch(text)
+        
         # 显示菜单
         self.selection_menu.popup(QCursor.pos())
     
+    def _start_prefetch(self, text):
+        """后台发起最常用关键词的查询，结果先缓冲起来"""
+        self._discard_prefetch()
+        if not self.speculative_prefetch or not self.ai_client or not text:
+            return
+        prompts = [keyword['prompt'] for keyword in self.selection_menu.keywords]
+        prompt = get_keyword_usage().most_used(prompts)
+        if prompt is None:
+            return
+        params = self._request_params(text, prompt)
+        # 用 stream_chat 而不是 get_response_stream：失败会记在 stream.error 上，
+        # 而不是变成一段错误文本被当作回答认领
+        ai_client, messages, temperature, max_tokens = params
+        stream = SharedStream(ai_client.stream_chat("", True, messages, temperature, max_tokens))
+        self._prefetch = (params, stream)
+        get_metrics().increment("speculative_prefetch_started")
+    
+    def _take_prefetch(self, text, prompt):
+        """认领与当前请求完全相同的预取结果，没有时返回 None"""
+        if self._prefetch is None:
+            return None
+        params, stream = self._prefetch
+        if params != self._request_params(text, prompt) or stream.error is not None:
+            return None
+        self._prefetch = None
+        get_metrics().increment("speculative_prefetch_hits")
+        return stream
+    
+    def _discard_prefetch(self):
+        """取消没有被认领的预取请求"""
+        if self._prefetch is None:
+            return
+        _, stream = self._prefetch
+        self._prefetch = None
+        if not stream.done:
+            stream.task.cancel()
+        get_metrics().increment("speculative_prefetch_discarded")
+    
     def _handle_ai_query(self):
         """内部方法：处理AI查询"""
         self.handle_ai_query(self.current_selected_text)
@@ -351,65 +413,104 @@ class SelectionSearchDialog(QDialog):
     
     def _handle_keyword_query(self, prompt):
         """处理关键词查询"""
+        get_keyword_usage().record(prompt)
         self.handle_keyword_query(self.current_selected_text, prompt)
     
-    async def _process_ai_query(self, text, custom_prompt=None):
-        """异步处理AI查询"""
+    def _build_messages(self, text, custom_prompt=None):
+        """组装发送给AI的消息列表"""
+        messages = [
+            {
+                "role": "system",
+                "content": "请直接回答问题，不要使用markdown格式。"
+            }
+        ]
+        
+        if custom_prompt:
+            messages.append({
+                "role": "user",
+                "content": custom_prompt
+            })
+            messages.append({
+                "role": "user",
+                "content": text
+            })
+        else:
+            messages.append({
+                "role": "user",
+                "content": f"解释下面这段文本的含义：\n{text}"
+            })
+        return messages
+    
+    def _get_generation_params(self):
+        """读取并校验界面上的温度和最大令牌数"""
+        # 获取并验证温度值
         try:
-            messages = [
-                {
-                    "role": "system",
-                    "content": "请直接回答问题，不要使用markdown格式。"
-                }
-            ]
-            
-            if custom_prompt:
-                messages.append({
-                    "role": "user",
-                    "content": custom_prompt
-                })
-                messages.append({
-                    "role": "user",
-                    "content": text
-                })
-            else:
-                messages.append({
-                    "role": "user",
-                    "content": f"解释下面这段文本的含义：\n{text}"
-                })
-            
-            # 获取并验证温度值
-            try:
-                temperature = float(self.temperature_combo.currentText())
-                temperature = max(0.0, min(2.0, temperature))
-            except ValueError:
-                temperature = 0.7
-            
-            # 获取并验证最大令牌数
-            try:
-                max_tokens = int(self.max_tokens_combo.currentText())
-                max_tokens = max(1, min(32000, max_tokens))
-            except ValueError:
-                max_tokens = 2000
-            
-            print("发送到AI的消息列表:", messages)
-            print(f"温度: {temperature}, 最大令牌数: {max_tokens}")
-            
-            async for response_chunk in self.ai_client.get_response_stream(
-                prompt="",
-                stream=True,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens
-            ):
+            temperature = float(self.temperature_combo.currentText())
+            temperature = max(0.0, min(2.0, temperature))
+        except ValueError:
+            temperature = 0.7
+        
+        # 获取并验证最大令牌数
+        try:
+            max_tokens = int(self.max_tokens_combo.currentText())
+            max_tokens = max(1, min(32000, max_tokens))
+        except ValueError:
+            max_tokens = 2000
+        return temperature, max_tokens
+    
+    def _request_params(self, text, custom_prompt=None):
+        """一次查询的完整参数，用于判断预取结果能否直接使用"""
+        temperature, max_tokens = self._get_generation_params()
+        return (self.ai_client, self._build_messages(text, custom_prompt), temperature, max_tokens)
+    
+    def _open_stream(self, ai_client, messages, temperature, max_tokens):
+        return ai_client.get_response_stream(
+            prompt="",
+            stream=True,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+    
+    async def _show_stream(self, source, fallback=False) -> bool:
+        """把响应块显示到窗口
+
+        fallback 为 True 时，还没收到任何内容就出错返回 False，由调用方重新请求；
+        已经显示了部分内容后的错误照常抛出。
+        """
+        source = traced("selection", source)
+        received = False
+        try:
+            async for response_chunk in source:
+                received = True
                 if self.isVisible():
                     self.set_text(response_chunk)
                 else:
                     break
+        except Exception:
+            if received or not fallback:
+                raise
+            return False
+        finally:
+            await source.aclose()
+        return True
+
+    async def _process_ai_query(self, text, custom_prompt=None, prefetched=None):
+        """异步处理AI查询，prefetched 为已经在后台开始的同一查询"""
+        try:
+            if prefetched is not None:
+                logger.info("使用预取的响应")
+                if await self._show_stream(prefetched.follow(), fallback=True):
+                    return
+                logger.info("预取的请求在返回内容前失败，重新发起查询")
+            params = self._request_params(text, custom_prompt)
+            logger.debug("发送到AI的消息列表: %s", params[1])
+            logger.debug("温度: %s, 最大令牌数: %s", params[2], params[3])
+            await self._show_stream(self._open_stream(*params))
                     
         except Exception as e:
             error_msg = f"获取AI响应失败: {str(e)}"
-            print(error_msg)
+            logger.error("%s", error_msg)
             if self.isVisible():
                 self.text_display.setPlainText(f"错误: {error_msg}")
     
@@ -438,13 +539,14 @@ class SelectionSearchDialog(QDialog):
             # 显示窗口在当前位置
             self.show_at_cursor()
             
-            # 创建异步任务处理AI请求
+            # 创建异步任务处理AI请求，菜单打开时已预取的同一查询直接接上
+            prefetched = self._take_prefetch(text, prompt)
             loop = asyncio.get_event_loop()
-            loop.create_task(self._process_ai_query(text, prompt))
+            loop.create_task(self._process_ai_query(text, prompt, prefetched))
             
         except Exception as e:
             self.text_display.setPlainText(f"处理查询失败: {str(e)}")
-            traceback.print_exc()
+            logger.exception("处理关键词查询失败")
     
     def handle_ai_query(self, text):
         """处理AI查询请求"""
@@ -466,7 +568,7 @@ class SelectionSearchDialog(QDialog):
             
         except Exception as e:
             self.text_display.setPlainText(f"处理查询失败: {str(e)}")
-            traceback.print_exc()
+            logger.exception("处理AI查询失败")
     
     def send_query(self):
         """发送查询"""
@@ -498,7 +600,7 @@ class SelectionSearchDialog(QDialog):
             
         except Exception as e:
             self.text_display.setPlainText(f"处理查询失败: {str(e)}")
-            traceback.print_exc()
+            logger.exception("发送查询失败")
     
     def keyPressEvent(self, event):
         """处理键盘事件"""
@@ -560,5 +662,4 @@ class SelectionSearchDialog(QDialog):
                 pyperclip.copy(old_clipboard)
                 
         except Exception as e:
-            print(f"插入到光标失败: {str(e)}")
-            traceback.print_exc()
\ No newline at end of file
+            logger.exception("插入到光标失败: %s", e)
\ No newline at end of file
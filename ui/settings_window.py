@@ -1,10 +1,12 @@
+import logging
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QPushButton, QLabel, QLineEdit, QComboBox, QCheckBox, 
                              QInputDialog, QApplication)
 from PySide6.QtCore import Qt, Signal
 from PySide6.QtGui import QIcon, QKeySequence
 import json
-import traceback
+
+logger = logging.getLogger(__name__)
 
 # 添加新的快捷键编辑组件
 class HotkeyEdit(QLineEdit):
@@ -243,9 +245,7 @@ class SettingsWindow(QMainWindow):
             # 设置窗口大小
             self.resize(400, 200)
         except Exception as e:
-            print(f"设置窗口初始化错误: {str(e)}")
-            print("错误详情:")
-            traceback.print_exc()
+            logger.exception("设置窗口初始化错误: %s", e)
     
     def load_settings(self):
         try:
@@ -303,14 +303,16 @@ class SettingsWindow(QMainWindow):
                 # 加载 ES 路径
                 self.es_path_input.setText(config.get('es_path', 'C:\\Program Files\\Everything\\es.exe'))
         except Exception as e:
-            print(f"加载设置失败: {str(e)}")
+            logger.error("加载设置失败: %s", e)
     
     def save_settings(self):
         try:
             with open('config/config.json', 'r', encoding='utf-8') as f:
                 old_config = json.load(f)
 
-            config = {
+            # 保留界面上没有的配置项（如连接池参数），避免保存设置时被清除
+            config = dict(old_config)
+            config.update({
                 # 文本AI设置
                 'api_key': self.api_key_input.text(),
                 'base_url': self.base_url_input.text(),
@@ -334,7 +336,7 @@ class SettingsWindow(QMainWindow):
                 'screenshot_hotkey': self.screenshot_hotkey_edit.text() or 'Alt+3',
                 'chat_hotkey': self.chat_hotkey_edit.text() or 'ctrl+4',
                 'es_path': self.es_path_input.text() or 'C:\\Program Files\\Everything\\es.exe',
-            }
+            })
 
             # 检查热键是否发生变化
             hotkeys_changed = (
@@ -351,8 +353,7 @@ class SettingsWindow(QMainWindow):
             self.settings_saved.emit({"config": config, "hotkeys_changed": hotkeys_changed})
             self.hide()
         except Exception as e:
-            print(f"保存设置失败: {str(e)}")
-            traceback.print_exc()
+            logger.exception("保存设置失败: %s", e)
     
     def load_presets(self):
         """加载预设配置列表"""
@@ -366,7 +367,7 @@ class SettingsWindow(QMainWindow):
             with open('config/presets.json', 'w', encoding='utf-8') as f:
                 json.dump({}, f, indent=4, ensure_ascii=False)
         except Exception as e:
-            print(f"加载预设失败: {str(e)}")
+            logger.error("加载预设失败: %s", e)
     
     def save_preset(self):
         """保存当前配置为预设"""
@@ -395,7 +396,7 @@ class SettingsWindow(QMainWindow):
                 
                 self.load_presets()
         except Exception as e:
-            print(f"保存预设失败: {str(e)}")
+            logger.error("保存预设失败: %s", e)
     
     def delete_preset(self):
         """删除当前选择的预设"""
@@ -413,7 +414,7 @@ class SettingsWindow(QMainWindow):
                     
                     self.load_presets()
             except Exception as e:
-                print(f"删除预设失败: {str(e)}")
+                logger.error("删除预设失败: %s", e)
     
     def load_preset_config(self, preset_name):
         """加载选中的预设配置"""
@@ -434,7 +435,7 @@ class SettingsWindow(QMainWindow):
                     # 立即保存并发送配置
                     self.save_settings()
             except Exception as e:
-                print(f"加载预设置失败: {str(e)}")
+                logger.error("加载预设置失败: %s", e)
     
     def closeEvent(self, event):
         """重写关闭事件，使窗口关闭时只隐藏而不退出程序"""
@@ -455,4 +456,4 @@ class SettingsWindow(QMainWindow):
             self.activateWindow()
             QApplication.processEvents()
         except Exception as e:
-            traceback.print_exc()
\ No newline at end of file
+            logger.exception("显示设置窗口失败")
\ No newline at end of file
@@ -0,0 +1,104 @@
+import logging
+from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
+                               QTableWidget, QTableWidgetItem, QPushButton, QLabel,
+                               QHeaderView)
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QIcon
+
+from utils.tracing import get_tracer
+
+logger = logging.getLogger(__name__)
+
+# (表头, 字段, 单位换算)
+COLUMNS = [
+    ("服务", "provider", None),
+    ("入口", "entry", None),
+    ("次数", "count", None),
+    ("失败", "errors", None),
+    ("首字 p50", "ttft_p50", 1000),
+    ("首字 p95", "ttft_p95", 1000),
+    ("首字 p99", "ttft_p99", 1000),
+    ("总耗时 p50", "total_p50", 1000),
+    ("总耗时 p95", "total_p95", 1000),
+    ("总耗时 p99", "total_p99", 1000),
+    ("令牌/秒 p50", "tokens_per_sec_p50", 1),
+    ("最大间隔 p95", "max_gap_p95", 1000),
+]
+
+ENTRY_NAMES = {
+    "selection": "划词",
+    "input": "输入框",
+    "chat": "对话",
+    "image": "图片",
+}
+
+
+class TraceViewerWindow(QMainWindow):
+    """请求耗时统计：按服务和入口显示首字延迟、总耗时等分位数"""
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("请求耗时统计")
+        self.setWindowFlags(Qt.WindowStaysOnTopHint)
+        self.setWindowIcon(QIcon(r"icons\logo.ico"))
+
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        layout = QVBoxLayout(central_widget)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels([title for title, _, _ in COLUMNS])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        bottom_layout = QHBoxLayout()
+        self.status_label = QLabel()
+        bottom_layout.addWidget(self.status_label)
+        bottom_layout.addStretch()
+        refresh_button = QPushButton("刷新")
+        refresh_button.clicked.connect(self.refresh)
+        bottom_layout.addWidget(refresh_button)
+        layout.addLayout(bottom_layout)
+
+        # 窗口可见时每2秒刷新一次
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(2000)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+        self.resize(1000, 300)
+
+    def refresh(self):
+        """重新汇总最近的请求记录"""
+        try:
+            rows = get_tracer().summary()
+            self.table.setRowCount(len(rows))
+            for row_index, row in enumerate(rows):
+                for column, (_, field, scale) in enumerate(COLUMNS):
+                    value = row.get(field)
+                    if field == "entry":
+                        text = ENTRY_NAMES.get(value, value)
+                    elif value is None:
+                        text = "-"
+                    elif scale == 1000:
+                        text = f"{value * 1000:.0f} ms"
+                    elif scale == 1:
+                        text = f"{value:.1f}"
+                    else:
+                        text = str(value)
+                    item = QTableWidgetItem(text)
+                    if scale is not None:
+                        item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                    self.table.setItem(row_index, column, item)
+            self.status_label.setText(f"最近 {sum(r['count'] for r in rows)} 次请求")
+        except Exception as e:
+            logger.exception("刷新请求耗时统计失败: %s", e)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.refresh_timer.start()
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
@@ -1,7 +1,9 @@
+import logging
 from PySide6.QtWidgets import QSystemTrayIcon, QMenu, QWidget, QApplication, QDialog, QVBoxLayout, QLabel
 from PySide6.QtGui import QIcon, QPixmap, QPainter, QColor
 from PySide6.QtCore import Signal, Qt, QRect
-import traceback
+
+logger = logging.getLogger(__name__)
 
 class AboutDialog(QDialog):
     def __init__(self, parent=None):
@@ -76,6 +78,7 @@ class SystemTrayIcon(QSystemTrayIcon):
     show_settings_signal = Signal()
     show_prompts_signal = Signal()
     show_selection_keywords_signal = Signal()
+    show_trace_viewer_signal = Signal()
     reset_hotkeys_signal = Signal()
     quit_signal = Signal()
     
@@ -92,6 +95,7 @@ class SystemTrayIcon(QSystemTrayIcon):
             self.settings_action = self.menu.addAction("设置")
             self.prompts_action = self.menu.addAction("提示词管理")
             self.selection_keywords_action = self.menu.addAction("划词关键词管理")
+            self.trace_viewer_action = self.menu.addAction("请求耗时统计")
             self.menu.addSeparator()
             #self.reset_hotkeys_action = self.menu.addAction("重置热键")
             self.menu.addSeparator()
@@ -111,6 +115,9 @@ class SystemTrayIcon(QSystemTrayIcon):
             self.selection_keywords_action.triggered.connect(
                 lambda: self.show_selection_keywords_signal.emit()
             )
+            self.trace_viewer_action.triggered.connect(
+                lambda: self.show_trace_viewer_signal.emit()
+            )
             # self.reset_hotkeys_action.triggered.connect(
             #     lambda: self.reset_hotkeys_signal.emit()
             # )
@@ -122,9 +129,7 @@ class SystemTrayIcon(QSystemTrayIcon):
             # 显示托盘图标
             self.show()
         except Exception as e:
-            print(f"托盘图标初始化错误: {str(e)}")
-            print("错误详情:")
-            traceback.print_exc()
+            logger.exception("托盘图标初始化错误: %s", e)
     
     def show_about_dialog(self):
         """显示关于对话框"""
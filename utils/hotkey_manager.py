@@ -1,9 +1,9 @@
+import logging
 from PySide6.QtCore import QObject, Signal, Qt
 import win32con
 import win32gui
 import json
 import time
-import traceback
 import sys
 import ctypes
 from win32gui import PumpMessages, PostQuitMessage
@@ -13,6 +13,8 @@ try:
 except ImportError:
     import win32api.win32api as win32api
 
+logger = logging.getLogger(__name__)
+
 # 定义热键ID
 HOTKEY_SHOW = 1
 HOTKEY_SHOW2 = 2
@@ -70,7 +72,7 @@ class GlobalHotkey(QObject):
                 # 类已存在错误 (1410)，可以忽略
                 if e.winerror != 1410:  # 如果不是"类已存在"错误，则重新抛出
                     raise
-                print("窗口类已存在，继续使用...")
+                logger.info("窗口类已存在，继续使用...")
             
             # 创建窗口
             self.hwnd = win32gui.CreateWindow(
@@ -84,8 +86,7 @@ class GlobalHotkey(QObject):
                 raise Exception("创建窗口失败，返回的hwnd为空")
                 
         except Exception as e:
-            print(f"创建热键窗口失败: {str(e)}")
-            traceback.print_exc()
+            logger.exception("创建热键窗口失败: %s", e)
             # 确保hwnd至少有一个有效值，防止后续注册热键时出错
             if not self.hwnd:
                 self.hwnd = 0
@@ -109,8 +110,7 @@ class GlobalHotkey(QObject):
                 elif wparam == HOTKEY_COMMAND:
                     self.command_triggered.emit()
             except Exception as e:
-                print(f"处理热键消息失败: {str(e)}")
-                traceback.print_exc()
+                logger.exception("处理热键消息失败: %s", e)
         return win32gui.DefWindowProc(hwnd, msg, wparam, lparam)
 
     def _register_hotkeys(self):
@@ -118,7 +118,7 @@ class GlobalHotkey(QObject):
         try:
             # 检查窗口句柄是否有效
             if not hasattr(self, 'hwnd') or self.hwnd is None:
-                print("窗口句柄无效，尝试重新创建窗口...")
+                logger.warning("窗口句柄无效，尝试重新创建窗口...")
                 self._create_hotkey_window()
                 
                 # 再次检查窗口是否创建成功
@@ -138,7 +138,7 @@ class GlobalHotkey(QObject):
                 (HOTKEY_COMMAND, self.command_hotkey)
             ]
             
-            print("开始注册热键...")  # 调试输出
+            logger.debug("开始注册热键...")
             # 注册每个热键
             for hotkey_id, (modifier, key) in hotkeys:
                 try:
@@ -147,26 +147,24 @@ class GlobalHotkey(QObject):
                     # 转换键码
                     vk_code = self._get_virtual_key_code(key)
                     
-                    print(f"注册热键: ID={hotkey_id}, 修饰键={modifier}({mod_flag}), 键={key}({vk_code})")  # 调试输出
+                    logger.debug("注册热键: ID=%s, 修饰键=%s(%s), 键=%s(%s)", hotkey_id, modifier, mod_flag, key, vk_code)
                     
                     # 使用 user32.dll 直接注册热键
                     if ctypes.windll.user32.RegisterHotKey(self.hwnd, hotkey_id, mod_flag, vk_code):
                         self.registered_hotkeys[hotkey_id] = (mod_flag, vk_code)
-                        print(f"成功注册热键: {modifier}+{key}")
+                        logger.debug("成功注册热键: %s+%s", modifier, key)
                     else:
                         error = ctypes.get_last_error()
-                        print(f"注册热键失败: {modifier}+{key}, 错误码: {error}")
+                        logger.error("注册热键失败: %s+%s, 错误码: %s", modifier, key, error)
                         self.hotkey_failed.emit(f"注册热键失败: {modifier}+{key}, 错误码: {error}")
                         
                 except Exception as e:
-                    print(f"注册热键 {modifier}+{key} 失败: {str(e)}")
-                    traceback.print_exc()
+                    logger.exception("注册热键 %s+%s 失败: %s", modifier, key, e)
                     self.hotkey_failed.emit(f"注册热键 {modifier}+{key} 失败: {str(e)}")
                     continue
                     
         except Exception as e:
-            print(f"注册热键失败: {str(e)}")
-            traceback.print_exc()
+            logger.exception("注册热键失败: %s", e)
             self.hotkey_failed.emit(f"注册热键失败: {str(e)}")
 
     def _get_modifier_flag(self, modifier):
@@ -197,11 +195,11 @@ class GlobalHotkey(QObject):
             # 如果是其他特殊键，可以继续添加
             
             # 调试输出
-            print(f"键码转换: {key} -> {ord(key) if len(key) == 1 else 'unknown'}")
+            logger.debug("键码转换: %s -> %s", key, ord(key) if len(key) == 1 else 'unknown')
             
             return ord(key) if len(key) == 1 else 0
         except Exception as e:
-            print(f"键码转换失败: {str(e)}")
+            logger.error("键码转换失败: %s", e)
             return 0
 
     def _unregister_hotkeys(self):
@@ -209,7 +207,7 @@ class GlobalHotkey(QObject):
         try:
             # 检查窗口句柄是否有效
             if not hasattr(self, 'hwnd') or self.hwnd is None:
-                print("窗口句柄无效，无法取消注册热键")
+                logger.warning("窗口句柄无效，无法取消注册热键")
                 self.registered_hotkeys.clear()
                 return
                 
@@ -217,11 +215,10 @@ class GlobalHotkey(QObject):
                 try:
                     ctypes.windll.user32.UnregisterHotKey(self.hwnd, hotkey_id)
                 except Exception as e:
-                    print(f"取消注册热键ID={hotkey_id}失败: {str(e)}")
+                    logger.error("取消注册热键ID=%s失败: %s", hotkey_id, e)
             self.registered_hotkeys.clear()
         except Exception as e:
-            print(f"取消注册热键失败: {str(e)}")
-            traceback.print_exc()
+            logger.exception("取消注册热键失败: %s", e)
 
     def stop(self):
         """停止热键监听"""
@@ -231,28 +228,26 @@ class GlobalHotkey(QObject):
                 try:
                     win32gui.DestroyWindow(self.hwnd)
                 except Exception as e:
-                    print(f"销毁窗口失败: {str(e)}")
+                    logger.error("销毁窗口失败: %s", e)
                 self.hwnd = None
         except Exception as e:
-            print(f"停止热键监听失败: {str(e)}")
-            traceback.print_exc()
+            logger.exception("停止热键监听失败: %s", e)
 
     def restart(self):
         """重启热键监听"""
         try:
-            print("正在重启热键监听...")
+            logger.info("正在重启热键监听...")
             self.stop()
             time.sleep(0.2)  # 短暂延迟确保资源释放
             self._create_hotkey_window()
             if hasattr(self, 'hwnd') and self.hwnd:
-                print(f"成功创建窗口，句柄: {self.hwnd}")
+                logger.debug("成功创建窗口，句柄: %s", self.hwnd)
                 self._register_hotkeys()
             else:
-                print("窗口创建失败，无法注册热键")
+                logger.warning("窗口创建失败，无法注册热键")
                 self.hotkey_failed.emit("窗口创建失败，无法注册热键")
         except Exception as e:
-            print(f"重启热键监听失败: {str(e)}")
-            traceback.print_exc()
+            logger.exception("重启热键监听失败: %s", e)
             self.hotkey_failed.emit(f"重启热键监听失败: {str(e)}")
 
     def load_hotkey_config(self):
@@ -268,8 +263,7 @@ class GlobalHotkey(QObject):
                 self.chat_hotkey = self._parse_shortcut(config.get('chat_hotkey', 'Control+4'))
                 self.command_hotkey = self._parse_shortcut(config.get('command_hotkey', 'Alt+5'))
         except Exception as e:
-            print(f"加载热键配置失败: {str(e)}")
-            traceback.print_exc()
+            logger.exception("加载热键配置失败: %s", e)
 
     def _parse_shortcut(self, shortcut):
         """解析快捷键字符串为元组格式"""
@@ -285,5 +279,5 @@ class GlobalHotkey(QObject):
         try:
             self.selection_to_input_triggered.emit()
         except Exception as e:
-            print(f"处理Alt+1热键失败: {str(e)}")
+            logger.error("处理Alt+1热键失败: %s", e)
             self.hotkey_failed.emit(str(e))
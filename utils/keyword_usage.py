@@ -0,0 +1,88 @@
+import logging
+import json
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class KeywordUsage:
+    """划词关键词的使用次数统计，保存在 tmp/keyword_usage.json
+
+    record() 在界面线程调用，只更新内存中的计数；文件在最后一次记录 save_delay 秒后
+    由后台定时器写入，连续点击只写一次。退出前调用 flush() 写入尚未保存的计数。
+    """
+
+    def __init__(self, path: str = 'tmp/keyword_usage.json', save_delay: float = 2.0):
+        self.path = path
+        self.save_delay = save_delay
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # 定时器和 flush() 不同时写同一个文件
+        self._timer = None
+        self.load()
+
+    def load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.counts = json.load(f)
+        except Exception:
+            logger.exception("读取关键词使用统计失败")
+            self.counts = {}
+
+    def save(self):
+        with self._write_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                counts = dict(self.counts)
+            self._write(counts)
+
+    def _write(self, counts: dict):
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(counts, f, indent=4, ensure_ascii=False)
+        except Exception as e:
+            logger.error("保存关键词使用统计失败: %s", e)
+
+    def record(self, prompt: str):
+        """记录一次关键词使用，文件稍后在后台写入"""
+        with self._lock:
+            self.counts[prompt] = self.counts.get(prompt, 0) + 1
+            if self._timer is None:
+                self._timer = threading.Timer(self.save_delay, self.save)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """立即写入尚未保存的计数，没有待写入的内容时什么也不做"""
+        with self._lock:
+            pending = self._timer is not None
+        if pending:
+            self.save()
+
+    def most_used(self, prompts: list, min_count: int = 1):
+        """在给定的提示词中返回使用最多的一个，都没用过时返回 None"""
+        best = None
+        best_count = min_count - 1
+        for prompt in prompts:
+            count = self.counts.get(prompt, 0)
+            if count > best_count:
+                best, best_count = prompt, count
+        return best
+
+
+_usage = None
+
+
+def get_keyword_usage() -> KeywordUsage:
+    """获取共享的关键词使用统计，第一次使用时从磁盘加载"""
+    global _usage
+    if _usage is None:
+        _usage = KeywordUsage()
+    return _usage
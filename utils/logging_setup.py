@@ -0,0 +1,89 @@
+import logging
+import logging.handlers
+import os
+import queue
+import re
+
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(threadName)s] %(name)s: %(message)s"
+
+# 需要打码的敏感信息：API Key、Bearer 令牌以及 key/token/password 形式的参数
+_SECRET_PATTERNS = [
+    (re.compile(r"\b(sk-[A-Za-z0-9_\-*]{4})[A-Za-z0-9_\-*]{8,}"), r"\1***"),
+    (re.compile(r"(Bearer\s+)[A-Za-z0-9._\-~+/=*]{8,}", re.IGNORECASE), r"\1***"),
+    (re.compile(r"((?:api[_-]?key|token|password|secret)['\"]?\s*[:=]\s*['\"]?)[^'\"\s,}]{4,}",
+                re.IGNORECASE), r"\1***"),
+]
+
+_listener = None
+
+
+def redact(text: str) -> str:
+    """把文本中的密钥替换为打码后的形式"""
+    for pattern, replacement in _SECRET_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+class RedactingFilter(logging.Filter):
+    """写入前对日志内容和异常堆栈中的密钥打码"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.msg = redact(record.getMessage())
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        if record.exc_text:
+            record.exc_text = redact(record.exc_text)
+        return True
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """只把日志记录放进队列，格式化（包括异常堆栈）留给后台线程完成"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(level: str = "INFO", log_dir: str = "logs", max_bytes: int = 5 * 1024 * 1024,
+                  backup_count: int = 3, console: bool = False):
+    """初始化日志：调用线程只把记录放进队列，由后台线程写入按大小轮转的日志文件
+
+    重复调用会先停止之前的后台线程，可以在修改设置后重新初始化。
+    """
+    global _listener
+    stop_logging()
+
+    os.makedirs(log_dir, exist_ok=True)
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(log_dir, "app.log"), maxBytes=max_bytes,
+        backupCount=backup_count, encoding="utf-8"
+    )
+    handlers.append(file_handler)
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        handler.addFilter(RedactingFilter())
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    root.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """停止后台写日志线程，把队列中剩余的记录写完"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from utils.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    """事件循环卡顿监测
+
+    事件循环中的心跳协程每隔 interval 醒来一次，实际醒来时间比预期晚多少即为调度延迟；
+    后台看门狗线程发现心跳超过 stall_threshold 没有更新时，抓取事件循环线程当前的调用栈，
+    等循环恢复后连同阻塞时长一起写入日志。阻塞超过 hang_threshold 仍未恢复时立即记录一次，
+    便于排查卡死。Qt 槽函数与协程运行在同一线程，同步 sleep 之类的阻塞都能被发现。
+    """
+
+    def __init__(self, interval: float = 0.1, stall_threshold: float = 0.2, hang_threshold: float = 5.0):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.hang_threshold = hang_threshold
+        self._thread_id = None
+        self._last_beat = 0.0
+        self._stall_stack = None
+        self._hang_logged = False
+        self._heartbeat_task = None
+        self._watchdog = None
+        self._stop = None
+
+    @property
+    def running(self) -> bool:
+        return self._heartbeat_task is not None
+
+    def start(self):
+        """在事件循环线程中调用，开始监测"""
+        if self.running:
+            return
+        self._thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._heartbeat_task = asyncio.ensure_future(self._heartbeat())
+        self._stop = threading.Event()
+        self._watchdog = threading.Thread(target=self._watch, args=(self._stop,),
+                                          name="LoopWatchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        if self._stop is not None:
+            self._stop.set()
+            self._watchdog.join(timeout=1)
+        self._stop = None
+        self._watchdog = None
+
+    async def _heartbeat(self):
+        metrics = get_metrics()
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            previous, self._last_beat = self._last_beat, now
+            metrics.observe("event_loop_lag_seconds", lag)
+            if lag >= self.stall_threshold:
+                self._report_stall(lag, previous)
+
+    def _report_stall(self, duration: float, beat: float):
+        captured, self._stall_stack = self._stall_stack, None
+        self._hang_logged = False
+        # 看门狗可能在心跳更新前一刻才抓到调用栈，只使用属于这次阻塞的
+        stack = captured[1] if captured and captured[0] == beat else None
+        metrics = get_metrics()
+        metrics.increment("event_loop_stalls")
+        metrics.observe("event_loop_stall_seconds", duration)
+        if stack:
+            logger.warning("事件循环阻塞 %.0f ms，阻塞时的调用栈:\n%s", duration * 1000, stack)
+        else:
+            logger.warning("事件循环阻塞 %.0f ms", duration * 1000)
+
+    def _capture_stack(self) -> str:
+        frame = sys._current_frames().get(self._thread_id)
+        if frame is None:
+            return ""
+        return "".join(traceback.format_stack(frame))
+
+    def _watch(self, stop: threading.Event):
+        check_interval = min(self.interval, self.stall_threshold) / 2
+        while not stop.wait(check_interval):
+            # 心跳本身每 interval 才更新一次，超出的部分才算阻塞
+            beat = self._last_beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked < self.stall_threshold:
+                continue
+            if self._stall_stack is None or self._stall_stack[0] != beat:
+                self._stall_stack = (beat, self._capture_stack())
+            if blocked >= self.hang_threshold and not self._hang_logged:
+                self._hang_logged = True
+                get_metrics().increment("event_loop_hangs")
+                logger.error("事件循环已阻塞 %.1f 秒仍未恢复，当前调用栈:\n%s",
+                             blocked, self._capture_stack())
+
+
+_monitor = LoopMonitor()
+
+
+def get_loop_monitor() -> LoopMonitor:
+    """获取进程级共享的事件循环监测器"""
+    return _monitor
@@ -0,0 +1,578 @@
+"""去除 Markdown 格式，支持流式输入
+
+MarkdownStripper 按块输入、按块输出，结果与一次性处理完整文本相同，remove_markdown 也由它实现。
+它是一串小的增量扫描器，依次对应每条规则（代码块、行内代码、标题……空行），规则的细节与原先的正则
+实现逐字节一致，包括一些特殊情况，例如标题必须以换行结尾、列表项前紧挨着的空行会被一起删掉。
+每个扫描器只用 str.find 和不会回溯的正则做一次线性扫描，总耗时与文本长度成线性关系，
+不会出现原正则在大量空行、未闭合的 [ 等输入上的平方级回溯；流式输入时只保留自己还无法确定的最短后缀
+（例如未闭合的 ``` 代码块、还没遇到换行的 **、行首的空白）。
+
+一次处理（strip）与流式处理走同一套扫描器，只是不再保留后缀。原正则本身就是线性的规则
+（行内代码、成对定界符）在扫描器里直接对已经确定的部分用 re.sub；行首标记用以换行符开头的正则
+查找下一行，不在每个位置检查 ^。
+"""
+import re
+
+_HASH_RUN = re.compile(r"#+")
+# 连续多行只含 - : | 和空白的行；各部分互不重叠，不会回溯
+_SET_LINE = r"[^\S\n]*(?:[-:|][^\S\n]*)*"
+_SET_RUN = re.compile(r"^%s(?:\n%s)*$" % (_SET_LINE, _SET_LINE), re.MULTILINE)
+_SET_PARTIAL = re.compile(_SET_LINE + r"\Z")
+_INLINE_CODE = re.compile(r"`[^`]*`")
+
+
+class _Stage:
+    """扫描器基类：feed 返回可以确定的输出，flush 在文本结束时输出剩余部分
+
+    _process 还不能确定的后缀保存在 _buf 中。之后的输入如果不会让这段后缀有结果（_extends 返回 True，
+    例如未闭合的 ** 之后还没有出现 * 或换行），只追加到 _more，不拼接也不重新扫描；
+    等到可能有结果时才拼成一个缓冲区交给 _process。这相当于把这几块合成一块输入，结果不变，
+    而长的保留后缀（未闭合的标记、很长的空白）不会随每一块被重复扫描，流式处理的总耗时保持线性。
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._more = []
+
+    def feed(self, text: str) -> str:
+        if not text:
+            return ""
+        if self._buf and self._extends(text):
+            self._more.append(text)
+            return ""
+        return self._process(self._take() + text, final=False)
+
+    def flush(self) -> str:
+        buf = self._take()
+        out = self._process(buf, final=True) if buf else ""
+        self._reset()
+        return out
+
+    def _take(self) -> str:
+        buf = self._buf
+        if self._more:
+            buf += "".join(self._more)
+            self._more = []
+        self._buf = ""
+        return buf
+
+    def _tail(self, size: int) -> str:
+        """保留的后缀（含追加的部分）的最后 size 个字符"""
+        parts = []
+        for part in reversed(self._more):
+            if size <= 0:
+                break
+            parts.append(part[-size:])
+            size -= len(part)
+        if size > 0:
+            parts.append(self._buf[-size:])
+        return "".join(reversed(parts))
+
+    def _extends(self, text: str) -> bool:
+        """text 接在保留的后缀之后时，这段后缀是否仍然无法确定，默认每块都重新扫描"""
+        return False
+
+    def _reset(self):
+        self._buf = ""
+        self._more = []
+
+    def strip(self, text: str) -> str:
+        """一次处理完整的文本，与 feed(text) + flush() 结果相同"""
+        self._reset()
+        return self._process(text, final=True) if text else ""
+
+    def _process(self, buf: str, final: bool) -> str:
+        raise NotImplementedError
+
+
+class _FencedCode(_Stage):
+    """```...``` 整段删除，未闭合的 ``` 及其后内容原样保留"""
+
+    def __init__(self):
+        super().__init__()
+        self._inside = False
+        self._scan = 0
+
+    def _reset(self):
+        super()._reset()
+        self._inside = False
+        self._scan = 0
+
+    def _extends(self, text):
+        # 代码块还没闭合：结束的 ``` 可能跨在上一块的末尾
+        return self._inside and "```" not in self._tail(2) + text
+
+    def _process(self, buf, final):
+        out = []
+        pos = 0
+        scan = self._scan
+        while True:
+            if self._inside:
+                k = buf.find("```", scan)
+                if k < 0:
+                    if final:
+                        out.append(buf[pos:])
+                        return "".join(out)
+                    self._buf = buf[pos:]
+                    self._scan = max(3, len(buf) - 2 - pos)
+                    return "".join(out)
+                pos = k + 3
+                self._inside = False
+            else:
+                j = buf.find("```", pos)
+                if j < 0:
+                    end = len(buf)
+                    if not final:
+                        # 末尾的一两个反引号可能是下一个 ``` 的开头
+                        while end > pos and end > len(buf) - 2 and buf[end - 1] == "`":
+                            end -= 1
+                    out.append(buf[pos:end])
+                    self._buf = buf[end:]
+                    self._scan = 0
+                    return "".join(out)
+                out.append(buf[pos:j])
+                pos = j
+                scan = j + 3
+                self._inside = True
+
+
+class _InlineCode(_Stage):
+    """成对的反引号连同其中内容删除，落单的反引号及其后内容原样保留"""
+
+    def _extends(self, text):
+        return "`" not in text
+
+    def _process(self, buf, final):
+        end = len(buf)
+        if not final and buf.count("`") % 2:
+            # 最后一个反引号落单，它之后的内容要等到下一个反引号才能确定
+            end = buf.rfind("`")
+            self._buf = buf[end:]
+        # 落单的反引号只会让正则扫描一次到末尾，不会回溯
+        return _INLINE_CODE.sub("", buf[:end])
+
+
+class _Headings(_Stage):
+    """1~6 个 # 加空白直到行尾（含换行）删除；# 后紧跟换行时连同下一行一起删除"""
+
+    def __init__(self):
+        super().__init__()
+        self._wait = "#"  # 保留的后缀在等什么：更多的 #，还是标题行的换行
+
+    def _extends(self, text):
+        if self._wait == "#":
+            return not text.strip("#")
+        return "\n" not in text
+
+    def _process(self, buf, final):
+        out = []
+        pos = 0
+        i = 0
+        while True:
+            m = _HASH_RUN.search(buf, i)
+            if m is None:
+                break
+            s, e = m.span()
+            if e == len(buf):
+                if final:
+                    break
+                out.append(buf[pos:s])
+                self._buf = buf[s:]
+                self._wait = "#"
+                return "".join(out)
+            c = buf[e]
+            if not c.isspace():
+                i = e
+                continue
+            # 超过 6 个 # 时，只有最后 6 个属于标题
+            start = max(s, e - 6)
+            nl = buf.find("\n", e + 1 if c == "\n" else e)
+            if nl < 0:
+                if final:
+                    # 缺少结尾换行，本行及之后都不会再匹配
+                    break
+                out.append(buf[pos:s])
+                self._buf = buf[s:]
+                self._wait = "\n"
+                return "".join(out)
+            out.append(buf[pos:start])
+            pos = i = nl + 1
+        out.append(buf[pos:])
+        return "".join(out)
+
+
+class _Pairs(_Stage):
+    """同一行内成对的定界符（如 ** 或 _）连同其中内容删除"""
+
+    def __init__(self, delimiter: str):
+        super().__init__()
+        self.delimiter = delimiter
+        # 没有闭合时正则只扫描到行尾，同一行后面不会再有定界符，总耗时是线性的
+        self._pattern = re.compile(re.escape(delimiter) + ".*?" + re.escape(delimiter))
+
+    def _extends(self, text):
+        n = len(self.delimiter)
+        if len(self._buf) < n or "\n" in text:
+            # 只保留了半个定界符，或者这一行结束了
+            return False
+        # 保留的是未闭合的定界符及其后的内容；闭合的定界符可能跨在上一块的末尾
+        tail = self._tail(n - 1) if len(self._buf) > n or self._more else ""
+        return self.delimiter not in tail + text
+
+    def _process(self, buf, final):
+        if final:
+            return self._pattern.sub("", buf)
+        # 完整的行直接用正则；最后一行还没写完，落单的定界符要等到行尾才能确定
+        line = buf.rfind("\n") + 1
+        out = [self._pattern.sub("", buf[:line])]
+        pos = line
+        for m in self._pattern.finditer(buf, line):
+            out.append(buf[pos:m.start()])
+            pos = m.end()
+        d = self.delimiter
+        hold = buf.find(d, pos)
+        if hold < 0:
+            hold = len(buf)
+            if len(d) > 1 and hold > pos and buf.endswith(d[0]):
+                # 末尾的半个定界符可能与下一块拼成完整的定界符
+                hold -= 1
+        out.append(buf[pos:hold])
+        self._buf = buf[hold:]
+        return "".join(out)
+
+
+class _LineMarker(_Stage):
+    """行首标记（列表、编号、引用）连同其后的一个空白删除
+
+    与 ^\\s* 的行为一致：标记行之前紧挨着的空白行也一起删除。
+    """
+
+    def __init__(self, marker: str, partial: str):
+        super().__init__()
+        # 标记后的换行只用前瞻匹配，留给下一次匹配作为行首的换行符（删除时跳过它）
+        tail = r"(?:[^\S\n]|(?=\n))"
+        self._pattern = re.compile(r"[^\S\n]*" + marker + tail)
+        # 以换行符开头，finditer 可以直接跳到下一个换行处，不必在每个位置检查行首
+        self._next_line = re.compile(r"\n[^\S\n]*" + marker + tail)
+        # 行还没写完时，可能发展成标记行的前缀
+        self._partial = re.compile(r"[^\S\n]*" + partial + r"\Z")
+        self._line_start = True
+        self._wait = None  # 保留的最后一行只有空白（"blank"）或只有数字（"digits"）
+
+    def _reset(self):
+        super()._reset()
+        self._line_start = True
+
+    def _extends(self, text):
+        # 空白行之后还是空白、编号还没写到 "."：都还不可能成为标记行
+        if self._wait == "blank":
+            return text.isspace()
+        return self._wait == "digits" and text.isdecimal()
+
+    def _blank_run_start(self, buf, line_start, pos, pos_is_line_start):
+        """line_start 之前紧挨着的空白行从哪里开始（不早于 pos）"""
+        if line_start - 2 >= pos and not buf[line_start - 2].isspace():
+            # 上一行不是空白行，这是最常见的情况
+            return line_start
+        if line_start <= pos:
+            return line_start
+        # 往前找最后一个非空白字符，它所在行之后的行都是空白行
+        end = pos + len(buf[pos:line_start - 1].rstrip())
+        if end == pos and pos_is_line_start:
+            return pos
+        return buf.find("\n", end, line_start) + 1
+
+    @staticmethod
+    def _skip(buf, end):
+        """匹配结束后下一段从哪里开始，以及那里是否是行首"""
+        if buf[end - 1].isspace():
+            return end, False
+        # 标记后面是换行（只被前瞻匹配），连同换行一起删除
+        return end + 1, True
+
+    def _process(self, buf, final):
+        out = []
+        pos = 0
+        pos_is_line_start = self._line_start
+        search_from = 0 if pos_is_line_start else buf.find("\n")
+        if pos_is_line_start:
+            m = self._pattern.match(buf)
+            if m is not None:
+                pos, pos_is_line_start = self._skip(buf, m.end())
+                search_from = m.end()
+        if search_from >= 0:
+            for m in self._next_line.finditer(buf, search_from):
+                start = self._blank_run_start(buf, m.start() + 1, pos, pos_is_line_start)
+                out.append(buf[pos:start])
+                pos, pos_is_line_start = self._skip(buf, m.end())
+
+        if not final:
+            last = buf.rfind("\n", pos) + 1
+            if last == 0 or last < pos:
+                last = pos
+            eligible = last > pos or pos_is_line_start
+            if eligible and self._partial.match(buf, last):
+                hold = self._blank_run_start(buf, last, pos, pos_is_line_start)
+                out.append(buf[pos:hold])
+                self._buf = buf[hold:]
+                self._line_start = hold > pos or pos_is_line_start
+                rest = buf[last:].lstrip()
+                if not rest:
+                    self._wait = "blank" if self._line_start else None
+                else:
+                    self._wait = "digits" if rest.isdecimal() else None
+                return "".join(out)
+        out.append(buf[pos:])
+        self._line_start = buf.endswith("\n") if len(buf) > pos else pos_is_line_start
+        return "".join(out)
+
+
+class _Links(_Stage):
+    """[文字](地址) 替换为文字；image=True 时 ![文字](地址) 整体删除"""
+
+    def __init__(self, image: bool = False):
+        super().__init__()
+        self._open = "![" if image else "["
+        self._keep_text = not image
+        self._wait = None  # 保留的链接还缺少的 "]" 或 ")"
+
+    def _extends(self, text):
+        return self._wait is not None and self._wait not in text
+
+    def _process(self, buf, final):
+        opener = self._open
+        out = []
+        pos = 0
+        i = 0
+        while True:
+            j = buf.find(opener, i)
+            if j < 0:
+                break
+            k = buf.find("]", j + len(opener))
+            if k >= 0 and k + 1 < len(buf):
+                if buf[k + 1] != "(":
+                    # 中间其他的 [ 也会遇到同一个 ]，同样不匹配
+                    i = k + 1
+                    continue
+                e = buf.find(")", k + 2)
+                if e >= 0:
+                    out.append(buf[pos:j])
+                    if self._keep_text:
+                        out.append(buf[j + len(opener):k])
+                    pos = i = e + 1
+                    continue
+            if final:
+                if k >= 0 and k + 1 >= len(buf):
+                    i = k + 1
+                    continue
+                # 后面再也没有 ] 或 )，不会再有匹配
+                break
+            out.append(buf[pos:j])
+            self._buf = buf[j:]
+            if k < 0:
+                self._wait = "]"
+            else:
+                self._wait = ")" if k + 1 < len(buf) else None
+            return "".join(out)
+        end = len(buf)
+        self._wait = None
+        if not final and len(opener) > 1 and end > pos and buf.endswith(opener[0]):
+            end -= 1
+        out.append(buf[pos:end])
+        self._buf = buf[end:]
+        return "".join(out)
+
+
+class _LineRegex(_Stage):
+    """只在单行内匹配的规则：对完整的行套用原正则，未写完的行按 hold_from 保留可能匹配的部分
+
+    hold_from(partial) 返回未写完的行中需要保留的起始位置，None 表示整行都可以输出；
+    extends(text) 判断接在保留部分之后的 text 是否仍然让它无法确定。
+    anchored 为 True 时规则以 ^ 开头，已经输出过一部分的行不会再匹配。
+    """
+
+    def __init__(self, pattern: str, hold_from, extends, anchored: bool = False):
+        super().__init__()
+        self._pattern = re.compile(pattern, re.MULTILINE)
+        self._hold_from = hold_from
+        self._extends = extends
+        self._anchored = anchored
+        self._mid_line = False
+
+    def _reset(self):
+        super()._reset()
+        self._mid_line = False
+
+    def _process(self, buf, final):
+        out = []
+        pos = 0
+        if self._anchored and self._mid_line:
+            nl = buf.find("\n")
+            if nl < 0:
+                return buf
+            pos = nl + 1
+            out.append(buf[:pos])
+        end = len(buf) if final else buf.rfind("\n", pos) + 1
+        if end > pos:
+            out.append(self._pattern.sub("", buf[pos:end]))
+            pos = end
+        self._mid_line = False
+        if pos < len(buf):
+            hold = self._hold_from(buf[pos:])
+            if hold is None:
+                out.append(buf[pos:])
+                self._mid_line = True
+            else:
+                out.append(buf[pos:pos + hold])
+                self._buf = buf[pos + hold:]
+                self._mid_line = hold > 0
+        return "".join(out)
+
+
+def _hold_rule_line(partial):
+    # 只由 - 组成的行可能是分隔线
+    return 0 if not partial.strip("-") else None
+
+
+def _extends_rule_line(text):
+    return not text.strip("-")
+
+
+def _hold_table(partial):
+    index = partial.find("|")
+    return index if index >= 0 else None
+
+
+def _extends_table(text):
+    # 从 | 开始的部分要等到行尾才能确定
+    return "\n" not in text
+
+
+class _SetLines(_Stage):
+    """只含 - : | 和空白的连续多行合并为一个空行；位于文本末尾时整段删除"""
+
+    def __init__(self):
+        super().__init__()
+        self._in_run = False
+        self._mid_line = False
+
+    def _reset(self):
+        super()._reset()
+        self._in_run = False
+        self._mid_line = False
+
+    def _extends(self, text):
+        # 保留的是位于末尾的段的最后一行，只要这一行还没写完且仍然只含 - : | 和空白
+        return "\n" not in text and _SET_PARTIAL.match(text) is not None
+
+    def _process(self, buf, final):
+        out = []
+        pos = 0
+        if self._mid_line:
+            nl = buf.find("\n")
+            if nl < 0:
+                return buf
+            out.append(buf[:nl + 1])
+            pos = nl + 1
+            self._mid_line = False
+        carried = self._in_run
+        self._in_run = False
+        last = buf.rfind("\n") + 1
+        for m in _SET_RUN.finditer(buf, pos):
+            s, e = m.span()
+            if carried and s != pos:
+                # 上一块末尾的空白行段到此结束
+                out.append("\n")
+            if e == len(buf):
+                # 段一直延伸到末尾：最后一行可能还没写完，文本结束时整段删除
+                out.append(buf[pos:s])
+                if not final:
+                    self._buf = buf[last:]
+                    self._in_run = s < last or carried and s == pos
+                return "".join(out)
+            out.append(buf[pos:s])
+            pos = e
+            carried = False
+        if carried:
+            out.append("\n")
+        out.append(buf[pos:])
+        self._mid_line = not final
+        return "".join(out)
+
+
+class _BlankLines(_Stage):
+    """多个空行合并为一个，并去掉首尾空白"""
+
+    _PATTERN = re.compile(r"\n\s*\n")
+
+    def __init__(self):
+        super().__init__()
+        self._started = False
+
+    def _reset(self):
+        super()._reset()
+        self._started = False
+
+    def _extends(self, text):
+        # 保留的是末尾的空白
+        return text.isspace()
+
+    def _process(self, buf, final):
+        if not self._started:
+            buf = buf.lstrip()
+            if not buf:
+                return ""
+            self._started = True
+        end = len(buf.rstrip())
+        if not final:
+            self._buf = buf[end:]
+        return self._PATTERN.sub("\n\n", buf[:end])
+
+
+class MarkdownStripper:
+    """流式去除 Markdown 格式，feed() 返回已经可以确定的文本，全部输入后调用 flush()"""
+
+    def __init__(self):
+        self._stages = [
+            _FencedCode(),
+            _InlineCode(),
+            _Headings(),
+            _Pairs("**"),
+            _Pairs("*"),
+            _Pairs("__"),
+            _Pairs("_"),
+            _LineMarker(r"[-*+]", r"[-*+]?"),
+            _LineMarker(r"\d+\.", r"(?:\d+\.?)?"),
+            _Links(),
+            _Links(image=True),
+            _LineMarker(r">", r">?"),
+            _LineRegex(r"^-{3,}$", _hold_rule_line, _extends_rule_line, anchored=True),
+            _LineRegex(r"\|.*\|", _hold_table, _extends_table),
+            _SetLines(),
+            _BlankLines(),
+        ]
+
+    def feed(self, text: str) -> str:
+        for stage in self._stages:
+            if not text:
+                return ""
+            text = stage.feed(text)
+        return text
+
+    def flush(self) -> str:
+        """输出剩余内容并重置，之后可以处理下一段文本"""
+        text = ""
+        for stage in self._stages:
+            text = stage.feed(text) + stage.flush()
+        return text
+
+    def strip(self, text: str) -> str:
+        """一次处理完整文本，会重置正在进行的流式处理"""
+        for stage in self._stages:
+            text = stage.strip(text)
+        return text
+
+
+def strip_markdown(text: str) -> str:
+    """一次性去除 Markdown 格式"""
+    return MarkdownStripper().strip(text)
@@ -0,0 +1,135 @@
+import bisect
+import math
+import threading
+from collections import deque
+
+# 耗时类指标的累计直方图分桶（秒），供 Prometheus 导出
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Metrics:
+    """进程内的轻量指标：计数器、当前值、最近若干次观测值（用于计算分位数）及其累计直方图"""
+
+    def __init__(self, window: int = 1000, buckets: tuple = DEFAULT_BUCKETS):
+        self.window = window
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}    # (名称, 标签) -> 累计值
+        self._gauges = {}      # (名称, 标签) -> 当前值
+        self._samples = {}     # (名称, 标签) -> 最近的观测值
+        self._histograms = {}  # (名称, 标签) -> [各分桶计数, 总和, 次数]，从启动开始累计
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """计数器累加"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """设置当前值，例如队列深度"""
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def add_gauge(self, name: str, delta: float, **labels):
+        """当前值增减，例如进行中的请求数"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + delta
+
+    def gauge(self, name: str, **labels) -> float:
+        """读取当前值，不传标签时返回所有标签的合计"""
+        with self._lock:
+            if labels:
+                return self._gauges.get((name, _label_key(labels)), 0)
+            return sum(v for (n, _), v in self._gauges.items() if n == name)
+
+    def observe(self, name: str, value: float, **labels):
+        """记录一次观测值，例如耗时"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+                self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            samples.append(value)
+            histogram = self._histograms[key]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def counter(self, name: str, **labels) -> float:
+        """读取计数器，不传标签时返回所有标签的合计"""
+        with self._lock:
+            if labels:
+                return self._counters.get((name, _label_key(labels)), 0)
+            return sum(v for (n, _), v in self._counters.items() if n == name)
+
+    def samples(self, name: str, **labels) -> list:
+        """读取观测值，不传标签时合并所有标签"""
+        with self._lock:
+            if labels:
+                return list(self._samples.get((name, _label_key(labels)), ()))
+            result = []
+            for (n, _), values in self._samples.items():
+                if n == name:
+                    result.extend(values)
+            return result
+
+    def percentile(self, name: str, q: float, **labels):
+        """最近观测值的分位数（q 取 0~100），没有数据时返回 None"""
+        values = sorted(self.samples(name, **labels))
+        if not values:
+            return None
+        index = min(len(values) - 1, max(0, math.ceil(q / 100.0 * len(values)) - 1))
+        return values[index]
+
+    def snapshot(self) -> dict:
+        """导出全部指标，供展示和导出使用
+
+        直方图的 buckets 为 (上界, 累计次数) 列表，不含 +Inf（即 count）。
+        """
+        with self._lock:
+            histograms = []
+            for (name, labels), (counts, total, count) in self._histograms.items():
+                cumulative, running = [], 0
+                for bound, n in zip(self.buckets, counts):
+                    running += n
+                    cumulative.append((bound, running))
+                histograms.append({"name": name, "labels": dict(labels), "buckets": cumulative,
+                                   "sum": total, "count": count})
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self._counters.items()
+                ],
+                "gauges": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self._gauges.items()
+                ],
+                "samples": [
+                    {"name": name, "labels": dict(labels), "values": list(values)}
+                    for (name, labels), values in self._samples.items()
+                ],
+                "histograms": histograms,
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._samples.clear()
+            self._histograms.clear()
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """获取进程级共享的指标对象"""
+    return _metrics
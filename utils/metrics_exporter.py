@@ -0,0 +1,306 @@
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import psutil
+
+from services.rate_limiter import all_rate_limiters
+from services.response_cache import get_response_cache
+from utils.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "ai_assistant_"
+
+_process = psutil.Process()
+
+
+def _metric_name(name: str) -> str:
+    return PREFIX + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+def _format_value(value) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        return repr(value) if value == value else "NaN"
+    return str(value)
+
+
+class _Family:
+    """同名指标的一组时间序列"""
+
+    def __init__(self, name: str, kind: str, help_text: str = ""):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.lines = []
+
+    def add(self, value, suffix: str = "", **labels):
+        self.lines.append(f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+
+
+def _collect_process(families: list):
+    try:
+        memory = _process.memory_info()
+        cpu = _process.cpu_times()
+        threads = _process.num_threads()
+    except psutil.Error as e:
+        logger.debug("读取进程信息失败: %s", e)
+        return
+    family = _Family(_metric_name("process_resident_memory_bytes"), "gauge", "进程常驻内存")
+    family.add(memory.rss)
+    families.append(family)
+    family = _Family(_metric_name("process_cpu_seconds_total"), "counter", "进程累计CPU时间")
+    family.add(cpu.user + cpu.system)
+    families.append(family)
+    family = _Family(_metric_name("process_threads"), "gauge", "进程线程数")
+    family.add(threads)
+    families.append(family)
+
+
+def _call_on_loop(loop, func, timeout: float = 2.0):
+    """在事件循环线程中调用 func 并等待结果
+
+    限流器的队列只在事件循环中修改，导出线程直接遍历会遇到 "deque mutated during iteration"。
+    没有指定循环、循环未运行或本身就在循环线程中时直接调用。
+    """
+    if loop is None or not loop.is_running():
+        return func()
+    try:
+        if asyncio.get_running_loop() is loop:
+            return func()
+    except RuntimeError:
+        pass
+    future = concurrent.futures.Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(func())
+        except Exception as e:
+            future.set_exception(e)
+
+    loop.call_soon_threadsafe(run)
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise TimeoutError(f"事件循环 {timeout:.1f} 秒内没有响应")
+
+
+def _collect_rate_limiters(families: list, loop=None):
+    limiters = _call_on_loop(loop, lambda: [limiter.stats() for limiter in all_rate_limiters()])
+    if not limiters:
+        return
+    for field, kind, help_text in (
+        ("active", "gauge", "正在进行的请求数"),
+        ("queue_depth", "gauge", "排队等待的请求数"),
+        ("acquired", "counter", "累计放行的请求数"),
+        ("max_wait", "gauge", "最长排队时间（秒）"),
+    ):
+        name = _metric_name(f"rate_limiter_{field}")
+        if kind == "counter":
+            name += "_total"
+        family = _Family(name, kind, help_text)
+        for stats in limiters:
+            family.add(stats[field], provider=stats["provider"])
+        families.append(family)
+
+
+def _collect_response_cache(families: list):
+    stats = get_response_cache().stats()
+    for field, kind, help_text in (
+        ("hits", "counter", "响应缓存命中次数"),
+        ("misses", "counter", "响应缓存未命中次数"),
+        ("hit_ratio", "gauge", "响应缓存命中率"),
+        ("entries", "gauge", "内存中的缓存条数"),
+    ):
+        name = _metric_name(f"response_cache_{field}")
+        if kind == "counter":
+            name += "_total"
+        family = _Family(name, kind, help_text)
+        family.add(stats[field])
+        families.append(family)
+
+
+def render_prometheus(loop=None) -> str:
+    """以 Prometheus 文本格式导出当前全部指标
+
+    计数器统一加 _total 后缀，观测值按累计直方图导出；另外附带限流器、响应缓存和进程内存等即时数据。
+    从其他线程调用时传入事件循环，限流器的数据会在循环线程中读取。
+    """
+    snapshot = get_metrics().snapshot()
+    grouped = {}
+
+    def family(name, kind):
+        key = (name, kind)
+        if key not in grouped:
+            grouped[key] = _Family(name, kind)
+        return grouped[key]
+
+    for item in snapshot["counters"]:
+        name = _metric_name(item["name"])
+        if not name.endswith("_total"):
+            name += "_total"
+        family(name, "counter").add(item["value"], **item["labels"])
+    for item in snapshot["gauges"]:
+        family(_metric_name(item["name"]), "gauge").add(item["value"], **item["labels"])
+    for item in snapshot["histograms"]:
+        histogram = family(_metric_name(item["name"]), "histogram")
+        labels = item["labels"]
+        for bound, count in item["buckets"]:
+            histogram.add(count, "_bucket", le=_format_value(float(bound)), **labels)
+        histogram.add(item["count"], "_bucket", le="+Inf", **labels)
+        histogram.add(item["sum"], "_sum", **labels)
+        histogram.add(item["count"], "_count", **labels)
+
+    families = [grouped[key] for key in sorted(grouped)]
+    for collect in (functools.partial(_collect_rate_limiters, loop=loop), _collect_response_cache, _collect_process):
+        try:
+            collect(families)
+        except Exception as e:
+            logger.warning("收集指标失败 (%s): %s", getattr(collect, "func", collect).__name__, e)
+
+    lines = []
+    for item in families:
+        if item.help_text:
+            lines.append(f"# HELP {item.name} {item.help_text}")
+        lines.append(f"# TYPE {item.name} {item.kind}")
+        lines.extend(item.lines)
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus(self.server.loop).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("指标请求 %s: %s", self.address_string(), format % args)
+
+
+class MetricsExporter:
+    """对外暴露指标：仅监听本机的 HTTP /metrics，或定期写入 node_exporter 的 textfile 目录"""
+
+    def __init__(self):
+        self.port = 0
+        self.textfile_path = None
+        self.interval = 15.0
+        self.loop = None
+        self._server = None
+        self._server_thread = None
+        self._writer_thread = None
+        self._writer_stop = None
+
+    def set_loop(self, loop):
+        """指定限流器所在的事件循环，导出线程通过它读取限流器的数据"""
+        self.loop = loop
+        if self._server is not None:
+            self._server.loop = loop
+
+    def configure(self, port: int = 0, textfile_path: str = None, interval: float = 15.0):
+        """按配置启动或停止导出，port 为 0、textfile_path 为空时关闭对应方式"""
+        if port != self.port:
+            self._stop_server()
+            self.port = port
+            if port:
+                self._start_server(port)
+        if textfile_path != self.textfile_path or interval != self.interval:
+            self._stop_writer()
+            self.textfile_path = textfile_path
+            self.interval = max(1.0, interval)
+            if textfile_path:
+                self._start_writer()
+
+    def _start_server(self, port: int):
+        try:
+            self._server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsRequestHandler)
+        except OSError as e:
+            logger.error("指标端口 %s 监听失败: %s", port, e)
+            self._server = None
+            return
+        self._server.daemon_threads = True
+        self._server.loop = self.loop
+        self._server_thread = threading.Thread(target=self._server.serve_forever,
+                                               name="MetricsServer", daemon=True)
+        self._server_thread.start()
+        logger.info("指标已在 http://127.0.0.1:%s/metrics 提供", port)
+
+    def _stop_server(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server_thread.join(timeout=2)
+        self._server = None
+        self._server_thread = None
+
+    def _start_writer(self):
+        self._writer_stop = threading.Event()
+        self._writer_thread = threading.Thread(
+            target=self._write_loop, args=(self.textfile_path, self.interval, self._writer_stop),
+            name="MetricsTextfile", daemon=True
+        )
+        self._writer_thread.start()
+
+    def _stop_writer(self):
+        if self._writer_stop is not None:
+            self._writer_stop.set()
+            self._writer_thread.join(timeout=2)
+        self._writer_stop = None
+        self._writer_thread = None
+
+    @staticmethod
+    def write_textfile(path: str, loop=None):
+        """写入一次 textfile，先写临时文件再替换，避免 node_exporter 读到半个文件"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(render_prometheus(loop))
+        os.replace(temp_path, path)
+
+    def _write_loop(self, path, interval, stop):
+        while True:
+            try:
+                self.write_textfile(path, self.loop)
+            except OSError as e:
+                logger.error("写入指标文件失败: %s", e)
+            if stop.wait(interval):
+                return
+
+    def close(self):
+        self._stop_server()
+        self._stop_writer()
+
+
+_exporter = MetricsExporter()
+
+
+def get_metrics_exporter() -> MetricsExporter:
+    """获取进程级共享的指标导出器"""
+    return _exporter
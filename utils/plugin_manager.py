@@ -1,3 +1,4 @@
+import logging
 import os
 import sys
 import importlib
@@ -5,6 +6,8 @@ import inspect
 from typing import List, Type
 from plugins.base_plugin import BasePlugin
 
+logger = logging.getLogger(__name__)
+
 class PluginManager:
     def __init__(self):
         self.plugins = []
@@ -42,7 +45,7 @@ class PluginManager:
                             obj != BasePlugin):
                             self.plugins.append(obj())
                 except Exception as e:
-                    print(f"加载插件 {filename} 失败: {str(e)}")
+                    logger.error("加载插件 %s 失败: %s", filename, e)
     
     def get_plugins(self) -> List[BasePlugin]:
         """获取所有已加载的插件"""
@@ -1,9 +1,12 @@
+import logging
 from PySide6.QtWidgets import QWidget, QApplication
 from PySide6.QtCore import Qt, QPoint, QRect, Signal
 from PySide6.QtGui import QPainter, QColor, QPen, QPixmap, QScreen
 import os
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 class ScreenshotOverlay(QWidget):
     screenshot_taken = Signal(str)
     
@@ -163,4 +166,4 @@ class ScreenshotOverlay(QWidget):
                 self.screenshot_taken.emit(filename)
                 
         except Exception as e:
-            print(f"保存截图失败: {str(e)}")
\ No newline at end of file
+            logger.error("保存截图失败: %s", e)
\ No newline at end of file
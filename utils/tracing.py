@@ -0,0 +1,254 @@
+import contextvars
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+from services.rate_limiter import estimate_tokens
+from utils.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("request_trace", default=None)
+_ids = itertools.count(1)
+
+
+def current_trace():
+    """当前上下文中正在记录的请求，没有时返回 None"""
+    return _current.get()
+
+
+def percentile(values, q):
+    """最近值的分位数（q 取 0~100），没有数据时返回 None"""
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, -(-len(values) * q // 100) - 1))
+    return values[int(index)]
+
+
+class RequestTrace:
+    """一次AI请求的耗时记录
+
+    marks 保存各个时间点（time.monotonic）：hotkey_received、selection_captured、
+    request_sent、first_byte、first_chunk、end；另外记录相邻响应块之间的间隔和输出字数。
+    """
+
+    def __init__(self, entry: str, provider: str = None):
+        self.id = next(_ids)
+        self.entry = entry
+        self.provider = provider
+        self.started_at = time.time()
+        self.marks = {}
+        self.gaps = []
+        self.chars = 0
+        self.output = []
+        self.error = None
+        self._last_chunk = None
+
+    def mark(self, name: str, when: float = None):
+        """记录一个时间点，同名时间点只保留第一次"""
+        self.marks.setdefault(name, when if when is not None else time.monotonic())
+
+    def chunk(self, text: str):
+        """记录收到的一个响应块"""
+        now = time.monotonic()
+        if self._last_chunk is None:
+            self.mark("first_chunk", now)
+        else:
+            self.gaps.append(now - self._last_chunk)
+        self._last_chunk = now
+        self.chars += len(text)
+        self.output.append(text)
+
+    def finish(self, error: BaseException = None):
+        self.mark("end")
+        if error is not None:
+            self.error = type(error).__name__
+
+    def _span(self, start: str, end: str):
+        if start in self.marks and end in self.marks:
+            return self.marks[end] - self.marks[start]
+        return None
+
+    def to_dict(self) -> dict:
+        tokens = estimate_tokens("".join(self.output))
+        streaming = self._span("first_chunk", "end")
+        origin = min(self.marks.values()) if self.marks else 0.0
+        return {
+            "id": self.id,
+            "entry": self.entry,
+            "provider": self.provider,
+            "started_at": self.started_at,
+            "marks": {name: round(t - origin, 6) for name, t in sorted(self.marks.items(), key=lambda i: i[1])},
+            "ttft": self._span("request_sent", "first_chunk"),
+            "first_byte": self._span("request_sent", "first_byte"),
+            "hotkey_to_first_chunk": self._span("hotkey_received", "first_chunk"),
+            "total": self._span("request_sent", "end"),
+            "chunks": len(self.gaps) + (1 if self._last_chunk is not None else 0),
+            "chars": self.chars,
+            "tokens": tokens,
+            # 只有一个响应块时无法计算输出速度
+            "tokens_per_sec": tokens / streaming if streaming and self.gaps else None,
+            "max_gap": max(self.gaps) if self.gaps else None,
+            "p95_gap": percentile(self.gaps, 95),
+            "error": self.error,
+        }
+
+
+class Tracer:
+    """收集请求耗时记录：内存环形缓冲区 + 可选的 JSONL 文件（后台线程写入）"""
+
+    def __init__(self, capacity: int = 500):
+        self.enabled = True
+        self._records = deque(maxlen=capacity)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._jsonl_path = None
+        self._queue = None
+        self._writer = None
+
+    def configure(self, enabled: bool = True, capacity: int = 500, jsonl_path: str = None):
+        self.enabled = enabled
+        with self._lock:
+            if capacity != self._records.maxlen:
+                self._records = deque(self._records, maxlen=capacity)
+        if jsonl_path != self._jsonl_path:
+            self._stop_writer()
+            self._jsonl_path = jsonl_path
+            if jsonl_path:
+                self._start_writer()
+
+    def mark_pending(self, entry: str, name: str):
+        """记录发生在请求开始之前的时间点（如热键按下），由同一入口的下一次请求接收"""
+        self._pending.setdefault(entry, {})[name] = time.monotonic()
+
+    def clear_pending(self, entry: str):
+        """丢弃某个入口尚未被接收的时间点，例如划词没有取到文本时"""
+        self._pending.pop(entry, None)
+
+    def start(self, entry: str, provider: str = None, pending_max_age: float = 30.0) -> RequestTrace:
+        trace = RequestTrace(entry, provider)
+        now = time.monotonic()
+        for name, when in self._pending.pop(entry, {}).items():
+            if now - when <= pending_max_age:
+                trace.mark(name, when)
+        return trace
+
+    def record(self, trace: RequestTrace):
+        """保存一条已结束的记录，同时累计到指标中"""
+        data = trace.to_dict()
+        with self._lock:
+            self._records.append(data)
+        if self._queue is not None:
+            self._queue.put(data)
+
+        metrics = get_metrics()
+        labels = {"entry": data["entry"], "provider": data["provider"] or "-"}
+        metrics.increment("ai_requests", **labels)
+        if data["error"]:
+            metrics.increment("ai_request_errors", error=data["error"], **labels)
+        if data["ttft"] is not None:
+            metrics.observe("ai_request_ttft_seconds", data["ttft"], **labels)
+        if data["total"] is not None:
+            metrics.observe("ai_request_duration_seconds", data["total"], **labels)
+
+    def records(self, entry: str = None, provider: str = None) -> list:
+        with self._lock:
+            return [r for r in self._records
+                    if (entry is None or r["entry"] == entry) and (provider is None or r["provider"] == provider)]
+
+    def summary(self) -> list:
+        """按服务地址和入口汇总 p50/p95/p99"""
+        groups = {}
+        for record in self.records():
+            groups.setdefault((record["provider"] or "-", record["entry"]), []).append(record)
+        rows = []
+        for (provider, entry), records in sorted(groups.items()):
+            row = {"provider": provider, "entry": entry, "count": len(records),
+                   "errors": sum(1 for r in records if r["error"])}
+            for field in ("ttft", "total", "tokens_per_sec", "max_gap"):
+                values = [r[field] for r in records]
+                for q in (50, 95, 99):
+                    row[f"{field}_p{q}"] = percentile(values, q)
+            rows.append(row)
+        return rows
+
+    def _start_writer(self):
+        directory = os.path.dirname(self._jsonl_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._queue = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._write_loop, args=(self._jsonl_path, self._queue),
+                                        name="TraceWriter", daemon=True)
+        self._writer.start()
+
+    def _stop_writer(self):
+        if self._queue is not None:
+            self._queue.put(None)
+            self._writer.join(timeout=2)
+        self._queue = None
+        self._writer = None
+
+    @staticmethod
+    def _write_loop(path, records):
+        while True:
+            data = records.get()
+            if data is None:
+                return
+            try:
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(data, ensure_ascii=False) + "\n")
+            except OSError as e:
+                logger.error("写入请求耗时记录失败: %s", e)
+
+    def close(self):
+        self._stop_writer()
+
+
+async def traced(entry: str, source, provider: str = None):
+    """包装一个响应流，记录本次请求的各个时间点和每个响应块
+
+    客户端在同一上下文中通过 current_trace() 补充 request_sent、first_byte 等网络层时间点。
+    """
+    tracer = get_tracer()
+    metrics = get_metrics()
+    metrics.add_gauge("ai_active_streams", 1, entry=entry)
+    try:
+        if not tracer.enabled:
+            async for text in source:
+                yield text
+            return
+
+        trace = tracer.start(entry, provider)
+        token = _current.set(trace)
+        error = None
+        try:
+            async for text in source:
+                trace.chunk(text)
+                yield text
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            trace.finish(None if isinstance(error, GeneratorExit) else error)
+            try:
+                _current.reset(token)
+            except ValueError:
+                # 生成器在其他上下文中被关闭（例如垃圾回收），此时无需恢复
+                pass
+            tracer.record(trace)
+    finally:
+        metrics.add_gauge("ai_active_streams", -1, entry=entry)
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """获取进程级共享的请求耗时记录器"""
+    return _tracer